@@ -1,11 +1,26 @@
 # API 端点 - 合同类型
 
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Optional
-from models.contract_type import ContractType, ContractTypeDAO
+import asyncio
+import codecs
+import csv
+import io
+import json
+import tempfile
+import psycopg
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError, field_validator
+from typing import AsyncIterator, Optional
+from config import Config
+from models.contract_type import COLUMNS, ContractType, AsyncContractTypeDAO, TableVersion
+from models.contract_type_cache import contract_type_cache
+from utils.admission import PRIORITY_HEAVY, PRIORITY_READ, PRIORITY_WRITE, admission
 from utils.logger import get_logger
-from utils.database import db_transaction
+from utils.database import async_db_transaction
+from utils.metrics import track_cache
+from utils.http_cache import cache_headers, is_not_modified, make_etag, not_modified
+from utils.pagination import decode_cursor, encode_cursor, parse_fields
+from utils.responses import NDJSONResponse, RawJSONResponse, ResponseSnapshots, ndjson_chunks
 
 logger = get_logger(__name__)
 
@@ -27,103 +42,511 @@ class ContractTypeCreate(BaseModel):
     default_workflow: str = "standard_contract_processing"
 
 
+class ContractTypeUpdate(BaseModel):
+    """部分更新合同类型请求（只包含要修改的字段）"""
+    type_code: Optional[str] = Field(default=None, min_length=1, max_length=50)
+    type_name: Optional[str] = Field(default=None, min_length=1, max_length=100)
+    description: Optional[str] = None
+    default_workflow: Optional[str] = Field(default=None, max_length=100)
+    is_active: Optional[bool] = None
+    sort_order: Optional[int] = None
+    
+    @field_validator('type_code', 'type_name', 'is_active', 'sort_order')
+    @classmethod
+    def _not_null(cls, value):
+        # 显式传 null 时才会调用（未传的字段不校验）
+        if value is None:
+            raise ValueError("may not be null")
+        return value
+
+
+class ContractTypeImportRow(BaseModel):
+    """导入的一行数据（id / 时间戳等多余字段会被忽略）"""
+    type_code: str = Field(min_length=1, max_length=50)
+    type_name: str = Field(min_length=1, max_length=100)
+    description: Optional[str] = None
+    default_workflow: str = Field(default="standard_contract_processing", max_length=100)  # 与 ContractTypeCreate 一致
+    is_active: bool = True
+    sort_order: int = 0
+
+
+# ============================================
+# 导入 / 导出辅助函数
+# ============================================
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+# 字典数据的响应体缓存（缓存数据未变化时直接复用编码后的字节）
+response_snapshots = ResponseSnapshots()
+track_cache('response_snapshots', response_snapshots.stats)
+
+_MAX_REPORTED_ERRORS = 1000    # 导入时最多返回的错误明细条数
+_SPOOL_READ_SIZE = 64 * 1024    # 从临时文件读取请求体的块大小
+
+
+async def _spool_upload(request: Request, max_bytes: int, timeout: float):
+    """
+    把请求体完整读入临时文件（小于 IMPORT_SPOOL_MEMORY 时留在内存）
+    
+    Raises:
+        HTTPException: 413（超过 max_bytes）、408（timeout 秒内没有读完）
+    """
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Import body exceeds {max_bytes} bytes")
+    
+    spool = tempfile.SpooledTemporaryFile(max_size=Config.IMPORT_SPOOL_MEMORY)
+    
+    async def receive() -> None:
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(status_code=413, detail=f"Import body exceeds {max_bytes} bytes")
+            spool.write(chunk)
+    
+    try:
+        await asyncio.wait_for(receive(), timeout)
+    except asyncio.TimeoutError:
+        spool.close()
+        raise HTTPException(status_code=408, detail=f"Import upload not completed within {timeout:g}s")
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+async def _iter_spool(spool) -> AsyncIterator[bytes]:
+    """按块读取已落地的请求体"""
+    while chunk := spool.read(_SPOOL_READ_SIZE):
+        yield chunk
+
+
+async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """把字节流切分为文本行（增量 UTF-8 解码，兼容 BOM）"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def _iter_ndjson_records(lines: AsyncIterator[str]) -> AsyncIterator[tuple]:
+    """NDJSON：产出 (行号, dict 或错误信息)"""
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_no, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line_no, "Each line must be a JSON object"
+            continue
+        yield line_no, record
+
+
+async def _iter_csv_records(lines: AsyncIterator[str]) -> AsyncIterator[tuple]:
+    """CSV（首行为表头）：产出 (起始行号, dict 或错误信息)，支持引号内换行"""
+    header = None
+    buffer = []
+    start = line_no = 0
+    async for line in lines:
+        line_no += 1
+        if not buffer:
+            start = line_no
+        buffer.append(line)
+        # 引号数为奇数说明字段内含换行，记录尚未结束
+        if sum(part.count('"') for part in buffer) % 2:
+            continue
+        text = "\n".join(buffer).rstrip("\r")
+        buffer = []
+        if not text.strip():
+            continue
+        try:
+            values = next(csv.reader(io.StringIO(text)))
+        except csv.Error as e:
+            yield start, f"Invalid CSV: {e}"
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield start, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        # CSV 中的空值视为未提供
+        yield start, {k: v for k, v in zip(header, values) if v != ""}
+    if buffer:
+        yield start, "Invalid CSV: unterminated quoted field"
+
+
+def _parse_import_record(record: dict) -> ContractType:
+    """校验一行数据并转换为 ContractType"""
+    row = ContractTypeImportRow.model_validate(record)
+    return ContractType(**row.model_dump())
+
+
+def _format_validation_error(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+    )
+
+
+def _version_headers(version: Optional[TableVersion]) -> dict:
+    """由表版本号生成 ETag / Last-Modified（版本号不可用时为空）"""
+    if version is None:
+        return {}
+    return cache_headers(make_etag("contract-types", version.version), version.changed_at)
+
+
+def _all_body(contract_types: list[ContractType]) -> bytes:
+    """/all 的响应体（数据对象未变化时复用上次编码的字节）"""
+    return response_snapshots.get_or_encode(("all", True), contract_types, lambda: {
+        "success": True,
+        "data": [t.to_dict() for t in contract_types],
+        "count": len(contract_types)
+    })
+
+
+async def warm_up() -> None:
+    """启动预热：加载合同类型字典和表版本号，并预先编码 /all 的响应体"""
+    await contract_type_cache.get_version()
+    await contract_type_cache.get_all(active_only=False)
+    _all_body(await contract_type_cache.get_all())
+
+
 # ============================================
 # API 端点
 # ============================================
 
 @router.get("/all")
-async def get_all_contract_types():
+@admission.limit(PRIORITY_READ)
+async def get_all_contract_types(request: Request):
     """
     获取所有合同类型
     
     - 查询操作，不需要事务控制
-    - 使用默认的 auto_commit=True
+    - 先读进程内缓存，未命中时才查库（只读事务，配置了副本时读副本）
+    - 支持 If-None-Match / If-Modified-Since，数据未变化时返回 304
+    - 数据对象未变化时复用上次编码的响应体；未命中时并发的相同请求只查一次库（由缓存按代次合并）
     """
     try:
-        with db_transaction() as conn:
-            dao = ContractTypeDAO(conn)  # ← 查询用默认值
-            contract_types = dao.get_all()
-            
-            return {
-                "success": True,
-                "data": [t.to_dict() for t in contract_types],
-                "count": len(contract_types)
-            }
+        # 先取版本号再取数据：期间发生修改时 ETag 偏旧，客户端下次会重新下载
+        version = await contract_type_cache.get_version()
+        headers = _version_headers(version)
+        if headers and is_not_modified(request, headers["ETag"], version.changed_at):
+            return not_modified(headers)
+        
+        return RawJSONResponse(_all_body(await contract_type_cache.get_all()), headers=headers)
     
     except Exception as e:
-        logger.error(f"Failed to get contract types: {e}")
+        logger.error("Failed to get contract types: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/list")
+@admission.limit(PRIORITY_HEAVY)
+async def list_contract_types(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    workflow: Optional[str] = None,
+    active: Optional[bool] = None,
+    name_prefix: Optional[str] = Query(None, max_length=100),
+    fields: Optional[str] = None,
+):
+    """
+    分页获取合同类型（键集分页，按 sort_order, type_code 排序）
+    
+    - cursor: 上一页返回的 next_cursor，不传表示第一页；任意页的代价与第一页相同
+    - workflow / active / name_prefix: 服务端过滤
+    - fields: 逗号分隔的字段列表（例如 fields=type_code,type_name），只返回这些字段
+    """
+    try:
+        after = decode_cursor(cursor, (int, str)) if cursor else None
+        selected = parse_fields(fields, COLUMNS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        async with async_db_transaction(readonly=True) as conn:
+            dao = AsyncContractTypeDAO(conn)
+            page = await dao.get_page(
+                limit=limit,
+                after=after,
+                workflow=workflow,
+                active=active,
+                name_prefix=name_prefix,
+                fields=selected,
+            )
+    except Exception as e:
+        logger.error("Failed to list contract types: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    data = page.items if selected else [t.to_dict() for t in page.items]
+    return {
+        "success": True,
+        "data": data,
+        "count": len(data),
+        "next_cursor": encode_cursor(page.next_after) if page.next_after else None,
+    }
+
+
+@router.get("/export")
+@admission.limit(PRIORITY_HEAVY)
+async def export_contract_types(
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    active_only: bool = False,
+):
+    """
+    流式导出合同类型（NDJSON 或 CSV）
+    
+    - NDJSON：通过服务端游标分批读取，每批编码为一块发送，内存占用与行数无关
+    - CSV：通过 COPY TO STDOUT 原样转发数据库输出，带表头，格式与导入接口兼容
+    """
+    async def ndjson_body() -> AsyncIterator[bytes]:
+        async with async_db_transaction(readonly=True) as conn:
+            dao = AsyncContractTypeDAO(conn)
+            async for chunk in ndjson_chunks(dao.iter_batches(active_only), ContractType.to_dict):
+                yield chunk
+    
+    async def csv_body() -> AsyncIterator[bytes]:
+        async with async_db_transaction(readonly=True) as conn:
+            dao = AsyncContractTypeDAO(conn)
+            async for chunk in dao.copy_out_csv(active_only):
+                yield chunk
+    
+    headers = {"Content-Disposition": f'attachment; filename="contract_types.{fmt}"'}
+    if fmt == "ndjson":
+        return NDJSONResponse(ndjson_body(), headers=headers)
+    return StreamingResponse(csv_body(), media_type=EXPORT_MEDIA_TYPES[fmt], headers=headers)
+
+
+@router.post("/import")
+@admission.limit(PRIORITY_HEAVY)
+async def import_contract_types(
+    request: Request,
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    upsert: bool = False,
+):
+    """
+    流式导入合同类型（NDJSON 或 CSV）
+    
+    - 请求体先完整读入临时文件（上限 IMPORT_MAX_BYTES / IMPORT_UPLOAD_TIMEOUT，超过返回 413 / 408），
+      读完后才借连接开事务，上传慢的客户端不会占住连接和事务
+    - 从临时文件逐行校验，合法的行通过 COPY FROM STDIN 写入
+    - upsert=False 时已存在的 type_code 跳过并报告；True 时更新
+    - 所有行在同一事务中落表，错误明细在最后统一返回
+    """
+    errors = []
+    error_count = 0
+    received = 0
+    
+    def report(line_no: int, message: str, type_code: Optional[str] = None):
+        nonlocal error_count
+        error_count += 1
+        if len(errors) < _MAX_REPORTED_ERRORS:
+            errors.append({"line": line_no, "type_code": type_code, "error": message})
+    
+    async def valid_rows(spool) -> AsyncIterator[tuple]:
+        nonlocal received
+        seen_codes = set()
+        parse = _iter_csv_records if fmt == "csv" else _iter_ndjson_records
+        async for line_no, record in parse(_iter_lines(_iter_spool(spool))):
+            received += 1
+            if isinstance(record, str):
+                report(line_no, record)
+                continue
+            try:
+                contract_type = _parse_import_record(record)
+            except ValidationError as e:
+                report(line_no, _format_validation_error(e), record.get("type_code"))
+                continue
+            if contract_type.type_code in seen_codes:
+                report(line_no, "Duplicate type_code in import", contract_type.type_code)
+                continue
+            seen_codes.add(contract_type.type_code)
+            yield line_no, contract_type
+    
+    spool = await _spool_upload(request, Config.IMPORT_MAX_BYTES, Config.IMPORT_UPLOAD_TIMEOUT)
+    try:
+        async with async_db_transaction() as conn:
+            dao = AsyncContractTypeDAO(conn, auto_commit=False)
+            result = await dao.copy_in(valid_rows(spool), upsert=upsert)
+    except Exception as e:
+        logger.error("Failed to import contract types: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        spool.close()
+    
+    for line_no, type_code in result["conflicts"]:
+        report(line_no, f"Contract type '{type_code}' already exists", type_code)
+    
+    logger.info(
+        "Imported contract types: received=%d written=%d errors=%d",
+        received, result["written"], error_count,
+    )
+    
+    return {
+        "success": True,
+        "data": {
+            "received": received,
+            "imported": result["written"],
+            "error_count": error_count,
+            "errors": sorted(errors, key=lambda err: err["line"]),
+            "errors_truncated": error_count > len(errors),
+        }
+    }
+
+
 @router.get("/{type_code}")
-async def get_contract_type(type_code: str):
+@admission.limit(PRIORITY_READ)
+async def get_contract_type(type_code: str, request: Request):
     """
     根据代码获取合同类型
     
-    - 查询操作
+    - 查询操作，先读进程内缓存（未命中时只读事务查库，并发的相同请求只查一次）
+    - 支持 If-None-Match / If-Modified-Since，数据未变化时返回 304
     """
     try:
-        with db_transaction() as conn:
-            dao = ContractTypeDAO(conn)
-            contract_type = dao.get_by_code(type_code)
-            
-            if not contract_type:
-                raise HTTPException(
-                    status_code=404, 
-                    detail=f"Contract type '{type_code}' not found"
-                )
-            
-            return {
-                "success": True,
-                "data": contract_type.to_dict()
-            }
+        version = await contract_type_cache.get_version()
+        headers = _version_headers(version)
+        if headers and is_not_modified(request, headers["ETag"], version.changed_at):
+            return not_modified(headers)
+        
+        contract_type = await contract_type_cache.get_by_code(type_code)
+        
+        if contract_type is None:
+            raise HTTPException(
+                status_code=404, 
+                detail=f"Contract type '{type_code}' not found"
+            )
+        
+        body = response_snapshots.get_or_encode(("code", type_code), contract_type, lambda: {
+            "success": True,
+            "data": contract_type.to_dict()
+        })
+        return RawJSONResponse(body, headers=headers)
     
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Failed to get contract type: {e}")
+        logger.error("Failed to get contract type: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/")
+@admission.limit(PRIORITY_WRITE)
 async def create_contract_type(data: ContractTypeCreate):
     """
     创建合同类型
     
-    - 写入操作，需要事务控制
-    - 使用 auto_commit=False，让上下文管理器控制提交
+    - INSERT ... ON CONFLICT DO NOTHING：检查和写入在一条语句中完成，
+      并发创建同一代码时只有一个成功，其余返回 400
     """
     try:
-        with db_transaction() as conn:
-            dao = ContractTypeDAO(conn, auto_commit=False)  # ← 写入用 False
-            
-            # 检查是否已存在
-            existing = dao.get_by_code(data.type_code)
-            if existing:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Contract type '{data.type_code}' already exists"
-                )
+        async with async_db_transaction() as conn:
+            dao = AsyncContractTypeDAO(conn, auto_commit=False)  # ← 写入用 False
             
-            # 创建新类型
-            new_type = ContractType(
+            created = await dao.create_if_absent(ContractType(
                 type_code=data.type_code,
                 type_name=data.type_name,
                 description=data.description,
                 default_workflow=data.default_workflow
+            ))
+        
+        if created is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Contract type '{data.type_code}' already exists"
             )
-            
-            created = dao.create(new_type)
-            logger.info(f"Created contract type: {created.type_code}")
-            
-            return {
-                "success": True,
-                "message": "Contract type created successfully",
-                "data": created.to_dict()
-            }
+        
+        logger.info("Created contract type: %s", created.type_code)
+        
+        return {
+            "success": True,
+            "message": "Contract type created successfully",
+            "data": created.to_dict()
+        }
     
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Failed to create contract type: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        logger.error("Failed to create contract type: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.patch("/{type_code}")
+@admission.limit(PRIORITY_WRITE)
+async def update_contract_type(type_code: str, data: ContractTypeUpdate):
+    """
+    部分更新合同类型
+    
+    - 只写请求中出现的字段，UPDATE ... RETURNING 直接返回更新后的数据（一次往返）
+    - 修改 type_code 时新代码已存在返回 400
+    """
+    changes = data.model_dump(exclude_unset=True)
+    if not changes:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    
+    try:
+        async with async_db_transaction() as conn:
+            dao = AsyncContractTypeDAO(conn, auto_commit=False)
+            updated = await dao.patch_by_code(type_code, changes)
+    except psycopg.errors.UniqueViolation:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Contract type '{changes.get('type_code')}' already exists"
+        )
+    except Exception as e:
+        logger.error("Failed to update contract type: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if updated is None:
+        raise HTTPException(status_code=404, detail=f"Contract type '{type_code}' not found")
+    
+    logger.info("Updated contract type %s: %s", type_code, list(changes))
+    
+    return {
+        "success": True,
+        "message": "Contract type updated successfully",
+        "data": updated.to_dict()
+    }
+
+
+@router.post("/{type_code}/deactivate")
+@admission.limit(PRIORITY_WRITE)
+async def deactivate_contract_type(type_code: str):
+    """
+    停用合同类型（软删除，可重复调用）
+    
+    - UPDATE ... RETURNING 直接返回停用后的数据（一次往返）
+    """
+    try:
+        async with async_db_transaction() as conn:
+            dao = AsyncContractTypeDAO(conn, auto_commit=False)
+            deactivated = await dao.deactivate_by_code(type_code)
+    except Exception as e:
+        logger.error("Failed to deactivate contract type: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if deactivated is None:
+        raise HTTPException(status_code=404, detail=f"Contract type '{type_code}' not found")
+    
+    logger.info("Deactivated contract type: %s", type_code)
+    
+    return {
+        "success": True,
+        "message": "Contract type deactivated successfully",
+        "data": deactivated.to_dict()
+    }
@@ -40,7 +40,68 @@ class Config:
             'user': cls.POSTGRES_USER,
             'password': cls.POSTGRES_PASSWORD
         }
-    
+
+    # 只读副本（可选，未设置 POSTGRES_REPLICA_HOST 时所有查询走主库）
+    POSTGRES_REPLICA_HOST: Optional[str] = os.getenv('POSTGRES_REPLICA_HOST') or None
+    POSTGRES_REPLICA_PORT: int = int(os.getenv('POSTGRES_REPLICA_PORT', str(POSTGRES_PORT)))
+    REPLICA_MAX_LAG_SECONDS: float = float(os.getenv('REPLICA_MAX_LAG_SECONDS', '5'))        # 复制延迟超过该值时读主库
+    REPLICA_LAG_CHECK_INTERVAL: float = float(os.getenv('REPLICA_LAG_CHECK_INTERVAL', '2'))  # 复制延迟的测量间隔（秒）
+
+    @classmethod
+    def has_replica(cls) -> bool:
+        """是否配置了只读副本"""
+        return bool(cls.POSTGRES_REPLICA_HOST)
+
+    @classmethod
+    def get_replica_database_config(cls) -> dict:
+        """获取只读副本连接配置（数据库名和账号与主库相同）"""
+        config = cls.get_database_config()
+        config['host'] = cls.POSTGRES_REPLICA_HOST
+        config['port'] = cls.POSTGRES_REPLICA_PORT
+        return config
+
+    # 连接池
+    DB_POOL_MIN_SIZE: int = int(os.getenv('DB_POOL_MIN_SIZE', '2'))
+    DB_POOL_MAX_SIZE: int = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+    DB_POOL_TIMEOUT: float = float(os.getenv('DB_POOL_TIMEOUT', '5'))                  # 借出连接最长等待（秒）
+    DB_POOL_MAX_LIFETIME: float = float(os.getenv('DB_POOL_MAX_LIFETIME', '1800'))     # 连接最长存活时间，超过后回收（秒）
+    DB_POOL_MAX_IDLE: float = float(os.getenv('DB_POOL_MAX_IDLE', '300'))              # 多余空闲连接的最长保留时间（秒）
+    DB_POOL_VALIDATE_AFTER: float = float(os.getenv('DB_POOL_VALIDATE_AFTER', '30'))   # 空闲超过该时间，借出前先校验（秒）
+    DB_POOL_LEAK_THRESHOLD: float = float(os.getenv('DB_POOL_LEAK_THRESHOLD', '60'))   # 借出超过该时间未归还视为泄漏（秒）
+    DB_POOL_TRACE_LEAKS: bool = os.getenv('DB_POOL_TRACE_LEAKS', 'False').lower() == 'true'  # 记录借出时的调用栈（调试用）
+    # 多 worker 部署（python main.py serve）时所有 worker 合计可用的连接数，应小于 PostgreSQL 的 max_connections
+    DB_MAX_CONNECTIONS: int = int(os.getenv('DB_MAX_CONNECTIONS', '90'))
+
+    # 变更通知（LISTEN / NOTIFY，需先执行 database/002_contract_types_notify.sql）
+    DB_CHANGE_FEED_ENABLED: bool = os.getenv('DB_CHANGE_FEED_ENABLED', 'True').lower() == 'true'
+    DB_CHANGE_FEED_RETRY_INTERVAL: float = float(os.getenv('DB_CHANGE_FEED_RETRY_INTERVAL', '5'))  # 断线后重连间隔（秒）
+
+    # 批量写入
+    DB_BULK_PAGE_SIZE: int = int(os.getenv('DB_BULK_PAGE_SIZE', '1000'))            # 多行 VALUES 每条语句的行数
+    DB_BULK_COPY_THRESHOLD: int = int(os.getenv('DB_BULK_COPY_THRESHOLD', '5000'))  # 超过该行数改用 COPY
+
+    # 流式查询（服务端游标）
+    DB_STREAM_BATCH_SIZE: int = int(os.getenv('DB_STREAM_BATCH_SIZE', '1000'))      # 每次 FETCH 的行数
+
+    # 导入：请求体先完整读入临时文件再开事务，慢客户端不会占住连接
+    IMPORT_MAX_BYTES: int = int(os.getenv('IMPORT_MAX_BYTES', str(20 * 1024 * 1024)))     # 请求体上限，超过返回 413
+    IMPORT_UPLOAD_TIMEOUT: float = float(os.getenv('IMPORT_UPLOAD_TIMEOUT', '60'))        # 读取请求体的最长时间（秒），超过返回 408
+    IMPORT_SPOOL_MEMORY: int = int(os.getenv('IMPORT_SPOOL_MEMORY', str(1024 * 1024)))    # 超过该字节数的请求体写入磁盘临时文件
+
+    @classmethod
+    def get_pool_config(cls) -> dict:
+        """获取连接池配置"""
+        return {
+            'min_size': cls.DB_POOL_MIN_SIZE,
+            'max_size': cls.DB_POOL_MAX_SIZE,
+            'timeout': cls.DB_POOL_TIMEOUT,
+            'max_lifetime': cls.DB_POOL_MAX_LIFETIME,
+            'max_idle': cls.DB_POOL_MAX_IDLE,
+            'validate_after': cls.DB_POOL_VALIDATE_AFTER,
+            'leak_threshold': cls.DB_POOL_LEAK_THRESHOLD,
+            'trace_leaks': cls.DB_POOL_TRACE_LEAKS,
+        }
+
     # ============================================
     # 缓存配置 - Redis
     # ============================================
@@ -61,18 +122,92 @@ class Config:
         if cls.REDIS_PASSWORD:
             config['password'] = cls.REDIS_PASSWORD
         return config
-    
+
+    REDIS_CACHE_ENABLED: bool = os.getenv('REDIS_CACHE_ENABLED', 'True').lower() == 'true'    # 是否启用 Redis 共享缓存
+    REDIS_SOCKET_TIMEOUT: float = float(os.getenv('REDIS_SOCKET_TIMEOUT', '0.5'))             # 命令超时（秒），超时即回退到数据库
+    REDIS_RETRY_INTERVAL: float = float(os.getenv('REDIS_RETRY_INTERVAL', '5'))               # 失败后多久再尝试连接（秒）
+
+    # 进程内缓存（合同类型字典）
+    CONTRACT_TYPE_CACHE_TTL: float = float(os.getenv('CONTRACT_TYPE_CACHE_TTL', '3600'))         # 缓存有效期（秒），0 表示关闭；关闭变更通知时应调小
+    CONTRACT_TYPE_CACHE_MAX_SIZE: int = int(os.getenv('CONTRACT_TYPE_CACHE_MAX_SIZE', '1000'))   # 最多缓存的条目数
+    CONTRACT_TYPE_REDIS_TTL: float = float(os.getenv('CONTRACT_TYPE_REDIS_TTL', '3600'))         # Redis 共享缓存有效期（秒）
+
     # ============================================
     # 应用配置
     # ============================================
     ENVIRONMENT: str = os.getenv('ENVIRONMENT', 'development')
     LOG_LEVEL: str = os.getenv('LOG_LEVEL', 'INFO')
     
+    # 日志文件（按日期命名，超过大小后轮转）
+    LOG_FILE_MAX_BYTES: int = int(os.getenv('LOG_FILE_MAX_BYTES', str(10 * 1024 * 1024)))   # 单个文件最大字节数
+    LOG_FILE_BACKUP_COUNT: int = int(os.getenv('LOG_FILE_BACKUP_COUNT', '5'))                 # 每天最多保留的轮转文件数
+    LOG_FILE_COMPRESS: bool = os.getenv('LOG_FILE_COMPRESS', 'False').lower() == 'true'       # 轮转后 gzip 压缩
+    # 采样（只作用于 WARNING 以下的记录），例如 "workflow=0.1,database=0.5"
+    LOG_SAMPLING: str = os.getenv('LOG_SAMPLING', '')
+    
+    # 多进程部署：worker 把日志发送给单独的收集进程，由它统一写文件和轮转
+    LOG_COLLECTOR_ENABLED: bool = os.getenv('LOG_COLLECTOR_ENABLED', 'False').lower() == 'true'
+    LOG_COLLECTOR_HOST: str = os.getenv('LOG_COLLECTOR_HOST', '127.0.0.1')                    # 只应监听本机地址
+    LOG_COLLECTOR_PORT: int = int(os.getenv('LOG_COLLECTOR_PORT', '9020'))
+    
+    @classmethod
+    def get_log_sampling(cls) -> dict:
+        """解析 LOG_SAMPLING 为 {logger 名称: 保留比例}"""
+        rates = {}
+        for item in cls.LOG_SAMPLING.split(','):
+            if '=' in item:
+                name, rate = item.split('=', 1)
+                rates[name.strip()] = float(rate)
+        return rates
+    
     # API 服务
     API_HOST: str = os.getenv('API_HOST', '0.0.0.0')
     API_PORT: int = int(os.getenv('API_PORT', '8001'))  # 默认 8001 端口
     API_DEBUG: bool = os.getenv('API_DEBUG', 'True').lower() == 'true'
     
+    # 生产模式（python main.py serve）
+    API_WORKERS: int = int(os.getenv('API_WORKERS', '0'))                             # worker 进程数，0 表示 CPU 核数
+    API_GRACEFUL_TIMEOUT: float = float(os.getenv('API_GRACEFUL_TIMEOUT', '30'))      # SIGTERM 后等待进行中请求完成的最长时间（秒）
+    
+    # 启动预热（连接池、预编译语句、字典缓存），完成后 /health/ready 才返回 200
+    WARMUP_ENABLED: bool = os.getenv('WARMUP_ENABLED', 'True').lower() == 'true'
+    WARMUP_TIMEOUT: float = float(os.getenv('WARMUP_TIMEOUT', '10'))                  # 每个预热步骤的最长时间（秒）
+    WARMUP_RETRY_INTERVAL: float = float(os.getenv('WARMUP_RETRY_INTERVAL', '5'))     # 预热失败后的重试间隔（秒）
+    
+    # 健康检查（后台定期执行，/health 只返回缓存的结果）
+    HEALTH_CHECK_INTERVAL: float = float(os.getenv('HEALTH_CHECK_INTERVAL', '10'))    # 检查间隔（秒）
+    HEALTH_CHECK_TIMEOUT: float = float(os.getenv('HEALTH_CHECK_TIMEOUT', '2'))       # 单项检查的最长时间（秒）
+    HEALTH_MIN_FREE_DISK_MB: int = int(os.getenv('HEALTH_MIN_FREE_DISK_MB', '500'))   # 上传目录所在磁盘的最低剩余空间（MB）
+    
+    # 准入控制：限制受限路由的并发，超出时排队，队列满或等待超时返回 503 + Retry-After
+    ADMISSION_ENABLED: bool = os.getenv('ADMISSION_ENABLED', 'True').lower() == 'true'
+    ADMISSION_MAX_CONCURRENT: int = int(os.getenv('ADMISSION_MAX_CONCURRENT', '0'))      # 合计并发上限，0 表示 DB_POOL_MAX_SIZE 的 2 倍
+    ADMISSION_HEAVY_LIMIT: int = int(os.getenv('ADMISSION_HEAVY_LIMIT', '2'))            # 列表 / 导出 / 导入每个路由的默认并发上限
+    ADMISSION_QUEUE_SIZE: int = int(os.getenv('ADMISSION_QUEUE_SIZE', '50'))             # 每个路由最多排队的请求数
+    ADMISSION_QUEUE_TIMEOUT: float = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', '2'))    # 最长排队时间（秒）
+    ADMISSION_RETRY_AFTER: int = int(os.getenv('ADMISSION_RETRY_AFTER', '1'))            # 503 响应的 Retry-After（秒）
+    # 按路由名（端点函数名）覆盖并发上限，例如 "export_contract_types=1,list_contract_types=4"（0 表示不单独限制）
+    ADMISSION_ROUTE_LIMITS: str = os.getenv('ADMISSION_ROUTE_LIMITS', '')
+    
+    @classmethod
+    def get_admission_route_limits(cls) -> dict:
+        """解析 ADMISSION_ROUTE_LIMITS 为 {路由名: 并发上限}"""
+        limits = {}
+        for item in cls.ADMISSION_ROUTE_LIMITS.split(','):
+            if '=' in item:
+                name, limit = item.split('=', 1)
+                limits[name.strip()] = int(limit)
+        return limits
+    
+    # 合同文件上传目录
+    UPLOAD_DIR: str = os.getenv('UPLOAD_DIR', 'uploads')
+    
+    # 指标：/metrics 以 Prometheus 文本格式输出请求耗时、连接池和缓存指标
+    METRICS_ENABLED: bool = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+    # 分阶段计时：Server-Timing 响应头（连接池借出 / 查询 / 编码耗时），可选写入访问日志
+    SERVER_TIMING_ENABLED: bool = os.getenv('SERVER_TIMING_ENABLED', 'True').lower() == 'true'
+    ACCESS_LOG_TIMINGS: bool = os.getenv('ACCESS_LOG_TIMINGS', 'False').lower() == 'true'
+    
     # ============================================
     # 安全配置
     # ============================================
@@ -117,7 +252,12 @@ class Config:
         # 检查必需的配置项
         if not cls.POSTGRES_PASSWORD:
             errors.append("POSTGRES_PASSWORD 未设置")
-        
+
+        if cls.DB_POOL_MIN_SIZE < 0 or cls.DB_POOL_MAX_SIZE < 1:
+            errors.append("DB_POOL_MIN_SIZE 不能为负数，DB_POOL_MAX_SIZE 至少为 1")
+        elif cls.DB_POOL_MIN_SIZE > cls.DB_POOL_MAX_SIZE:
+            errors.append("DB_POOL_MIN_SIZE 不能大于 DB_POOL_MAX_SIZE")
+
         if cls.is_production():
             if cls.SECRET_KEY == 'dev-secret-key-change-me':
                 errors.append("生产环境必须设置安全的 SECRET_KEY")
@@ -145,10 +285,14 @@ class Config:
             print(f"  - Password: {cls.POSTGRES_PASSWORD}")
         else:
             print(f"  - Password: {'*' * len(cls.POSTGRES_PASSWORD)}")
-        
+        print(f"  - Pool: {cls.DB_POOL_MIN_SIZE}~{cls.DB_POOL_MAX_SIZE} (timeout {cls.DB_POOL_TIMEOUT}s)")
+        if cls.has_replica():
+            print(f"  - Replica: {cls.POSTGRES_REPLICA_HOST}:{cls.POSTGRES_REPLICA_PORT} (max lag {cls.REPLICA_MAX_LAG_SECONDS}s)")
+
         print(f"\n⚡ Redis:")
         print(f"  - Host: {cls.REDIS_HOST}:{cls.REDIS_PORT}")
         print(f"  - DB: {cls.REDIS_DB}")
+        print(f"  - Shared cache: {'enabled' if cls.REDIS_CACHE_ENABLED else 'disabled'}")
         
         print(f"\n🚀 API 服务:")
         print(f"  - Host: {cls.API_HOST}:{cls.API_PORT}")
@@ -0,0 +1,109 @@
+-- 智能合同处理系统 - 合同类型变更通知
+-- 说明: 每条修改 contract_types 的语句通过一次 NOTIFY 广播受影响的行，
+--       API 进程 LISTEN 该频道并精确失效缓存（包括直接用 SQL 修改的数据）
+-- 执行: psql -U <user> -d contract_forge < database/002_contract_types_notify.sql
+--       （可重复执行）
+
+-- ============================================
+-- 通知函数
+-- ============================================
+-- 语句级触发器：COPY 导入、批量插入等一条语句只发一条通知，行号和代码在载荷中汇总。
+-- 载荷示例:
+--   {"op": "update", "ids": [3], "codes": ["SVC", "SERVICE"], "txid": 1234}
+--   {"op": "insert", "everything": true, "txid": 1235}     （载荷超过上限时，监听方整体失效）
+--   {"op": "truncate", "txid": 1236}
+-- 没有修改任何行的语句不发通知。NOTIFY 载荷上限为 8000 字节，汇总后超过
+-- 7900 字节时改为 everything，与 TRUNCATE 的处理相同。
+-- 同一事务内内容相同的通知会被 PostgreSQL 合并，提交后才送达，回滚的事务不发通知
+CREATE OR REPLACE FUNCTION notify_contract_types_change() RETURNS trigger AS $$
+DECLARE
+    changed_ids json;
+    changed_codes json;
+    payload text;
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        PERFORM pg_notify('contract_types_changed', json_build_object(
+            'op', 'truncate',
+            'txid', txid_current()
+        )::text);
+        RETURN NULL;
+    END IF;
+
+    -- 转换表只在对应的事件中存在，按操作分别汇总（UPDATE 同时包含改名前的代码）
+    IF TG_OP = 'INSERT' THEN
+        SELECT json_agg(DISTINCT id), json_agg(DISTINCT type_code)
+        INTO changed_ids, changed_codes
+        FROM new_rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT json_agg(DISTINCT id), json_agg(DISTINCT type_code)
+        INTO changed_ids, changed_codes
+        FROM old_rows;
+    ELSE
+        SELECT json_agg(DISTINCT id), json_agg(DISTINCT type_code)
+        INTO changed_ids, changed_codes
+        FROM (
+            SELECT id, type_code FROM new_rows
+            UNION ALL
+            SELECT id, type_code FROM old_rows
+        ) AS changed;
+    END IF;
+
+    IF changed_ids IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    payload := json_build_object(
+        'op', lower(TG_OP),
+        'ids', changed_ids,
+        'codes', changed_codes,
+        'txid', txid_current()
+    )::text;
+    IF octet_length(payload) > 7900 THEN
+        payload := json_build_object(
+            'op', lower(TG_OP),
+            'everything', true,
+            'txid', txid_current()
+        )::text;
+    END IF;
+
+    PERFORM pg_notify('contract_types_changed', payload);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================
+-- 触发器
+-- ============================================
+-- 转换表只能用于单一事件的触发器，INSERT / UPDATE / DELETE 各建一个
+DROP TRIGGER IF EXISTS contract_types_notify_row ON contract_types;
+
+DROP TRIGGER IF EXISTS contract_types_notify_insert ON contract_types;
+CREATE TRIGGER contract_types_notify_insert
+    AFTER INSERT ON contract_types
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_contract_types_change();
+
+DROP TRIGGER IF EXISTS contract_types_notify_update ON contract_types;
+CREATE TRIGGER contract_types_notify_update
+    AFTER UPDATE ON contract_types
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_contract_types_change();
+
+DROP TRIGGER IF EXISTS contract_types_notify_delete ON contract_types;
+CREATE TRIGGER contract_types_notify_delete
+    AFTER DELETE ON contract_types
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_contract_types_change();
+
+DROP TRIGGER IF EXISTS contract_types_notify_truncate ON contract_types;
+CREATE TRIGGER contract_types_notify_truncate
+    AFTER TRUNCATE ON contract_types
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_contract_types_change();
+
+-- ============================================
+-- 完成提示
+-- ============================================
+DO $$
+BEGIN
+    RAISE NOTICE '✅ 已创建 contract_types 变更通知触发器（频道: contract_types_changed）';
+END $$;
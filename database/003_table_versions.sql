@@ -0,0 +1,79 @@
+-- 智能合同处理系统 - 表版本号
+-- 说明: 每条实际修改了 contract_types 的语句都会递增 table_versions 中的版本号，
+--       API 用它生成 ETag / Last-Modified，客户端数据未变化时直接返回 304，
+--       不需要查询和序列化整张表
+-- 执行: psql -U <user> -d contract_forge < database/003_table_versions.sql
+--       （可重复执行）
+
+-- ============================================
+-- 版本号表
+-- ============================================
+CREATE TABLE IF NOT EXISTS table_versions (
+    table_name VARCHAR(63) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    changed_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp()
+);
+
+INSERT INTO table_versions (table_name) VALUES ('contract_types')
+ON CONFLICT (table_name) DO NOTHING;
+
+-- ============================================
+-- 递增版本号（语句级触发器，批量修改也只递增一次）
+-- ============================================
+-- 只在语句实际修改了行时递增：ON CONFLICT DO NOTHING 的重复插入、更新 / 删除不存在的
+-- 代码等 0 行语句不改变 ETag，也不会在版本行上排队加锁。
+-- 影响的行由转换表（REFERENCING ... TABLE）给出，转换表只能用于单一事件的触发器，
+-- 因此 INSERT / UPDATE / DELETE 各建一个触发器，共用同一个函数。
+-- 使用 clock_timestamp() 而不是事务开始时间，保证后提交的修改时间不早于先提交的
+CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        IF NOT EXISTS (SELECT 1 FROM old_rows) THEN
+            RETURN NULL;
+        END IF;
+    ELSIF TG_OP IN ('INSERT', 'UPDATE') THEN
+        IF NOT EXISTS (SELECT 1 FROM new_rows) THEN
+            RETURN NULL;
+        END IF;
+    END IF;
+
+    UPDATE table_versions
+    SET version = version + 1,
+        changed_at = clock_timestamp()
+    WHERE table_name = TG_TABLE_NAME;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS contract_types_bump_version ON contract_types;
+
+DROP TRIGGER IF EXISTS contract_types_bump_version_insert ON contract_types;
+CREATE TRIGGER contract_types_bump_version_insert
+    AFTER INSERT ON contract_types
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+
+DROP TRIGGER IF EXISTS contract_types_bump_version_update ON contract_types;
+CREATE TRIGGER contract_types_bump_version_update
+    AFTER UPDATE ON contract_types
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+
+DROP TRIGGER IF EXISTS contract_types_bump_version_delete ON contract_types;
+CREATE TRIGGER contract_types_bump_version_delete
+    AFTER DELETE ON contract_types
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+
+DROP TRIGGER IF EXISTS contract_types_bump_version_truncate ON contract_types;
+CREATE TRIGGER contract_types_bump_version_truncate
+    AFTER TRUNCATE ON contract_types
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+
+-- ============================================
+-- 完成提示
+-- ============================================
+DO $$
+BEGIN
+    RAISE NOTICE '✅ 已创建 table_versions 表和 contract_types 版本号触发器';
+END $$;
@@ -0,0 +1,29 @@
+-- 智能合同处理系统 - 合同类型分页索引
+-- 说明: 列表接口按 (sort_order, type_code) 做键集分页，
+--       WHERE (sort_order, type_code) > (游标) ORDER BY sort_order, type_code LIMIT n
+--       需要对应的复合索引，且排序列不能为 NULL（NULL 无法参与行值比较）
+-- 执行: psql -U <user> -d contract_forge < database/004_contract_types_keyset.sql
+--       （可重复执行）
+
+-- ============================================
+-- sort_order 不允许为 NULL
+-- ============================================
+UPDATE contract_types SET sort_order = 0 WHERE sort_order IS NULL;
+ALTER TABLE contract_types ALTER COLUMN sort_order SET NOT NULL;
+
+-- ============================================
+-- 索引
+-- ============================================
+-- 分页排序键
+CREATE INDEX IF NOT EXISTS idx_contract_types_sort ON contract_types(sort_order, type_code);
+
+-- 名称前缀过滤（LIKE 'xxx%'，不受数据库排序规则影响）
+CREATE INDEX IF NOT EXISTS idx_contract_types_name_prefix ON contract_types(type_name text_pattern_ops);
+
+-- ============================================
+-- 完成提示
+-- ============================================
+DO $$
+BEGIN
+    RAISE NOTICE '✅ 已创建 contract_types 分页索引';
+END $$;
@@ -83,7 +83,7 @@ def test_postgres():
         
     except Exception as e:
         print(f"❌ PostgreSQL 连接失败: {e}\n")
-        logger.error(f"PostgreSQL 连接失败: {e}")
+        logger.error("PostgreSQL 连接失败: %s", e)
         print("请检查：")
         print("  1. Docker 容器是否正在运行: docker-compose ps")
         print("  2. 端口是否正确: 5432")
@@ -146,7 +146,7 @@ def test_redis():
         
     except Exception as e:
         print(f"❌ Redis 连接失败: {e}\n")
-        logger.error(f"Redis 连接失败: {e}")
+        logger.error("Redis 连接失败: %s", e)
         return False
 
 
@@ -0,0 +1,127 @@
+"""
+合同类型行映射基准测试
+Contract Type Row Mapping Benchmark
+
+比较原来的 from_db_row / to_dict（普通 dataclass，逐列 len() 判断）与：
+- ContractType（__slots__）+ 按列布局生成的映射函数
+- ContractTypeRecord（NamedTuple，查询行直接构造）
+
+不需要数据库，使用构造的查询行。
+
+运行:
+    python examples/contract_type_benchmark.py [行数]
+"""
+
+import sys
+import timeit
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from models.contract_type import (
+    COLUMNS,
+    ContractType,
+    ContractTypeRecord,
+    _map_rows,
+)
+
+
+# ============================================
+# 改动前的实现（作为对照）
+# ============================================
+@dataclass
+class LegacyContractType:
+    type_code: str
+    type_name: str
+    id: Optional[int] = None
+    description: Optional[str] = None
+    default_workflow: Optional[str] = None
+    is_active: bool = True
+    sort_order: int = 0
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    @classmethod
+    def from_db_row(cls, row: tuple) -> 'LegacyContractType':
+        return cls(
+            id=row[0],
+            type_code=row[1],
+            type_name=row[2],
+            description=row[3] if len(row) > 3 else None,
+            default_workflow=row[4] if len(row) > 4 else None,
+            is_active=row[5] if len(row) > 5 else True,
+            sort_order=row[6] if len(row) > 6 else 0,
+            created_at=row[7] if len(row) > 7 else None,
+            updated_at=row[8] if len(row) > 8 else None,
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'type_code': self.type_code,
+            'type_name': self.type_name,
+            'description': self.description,
+            'default_workflow': self.default_workflow,
+            'is_active': self.is_active,
+            'sort_order': self.sort_order,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+
+def make_rows(count: int) -> list[tuple]:
+    now = datetime(2025, 12, 4, 8, 30, 15)
+    return [
+        (i, f'TYPE_{i}', f'合同类型 {i}', '描述', 'standard_contract_processing', True, i, now, now)
+        for i in range(count)
+    ]
+
+
+def measure_memory(build) -> float:
+    """构造全部对象占用的内存（字节 / 行）"""
+    tracemalloc.start()
+    objects = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / len(objects)
+
+
+def main(count: int = 100_000) -> None:
+    rows = make_rows(count)
+    assert len(rows[0]) == len(COLUMNS)
+
+    cases = {
+        '改动前 from_db_row': lambda: [LegacyContractType.from_db_row(r) for r in rows],
+        'ContractType.from_db_row': lambda: [ContractType.from_db_row(r) for r in rows],
+        'ContractType 映射函数': lambda: _map_rows(rows),
+        'ContractTypeRecord': lambda: _map_rows(rows, ContractTypeRecord),
+    }
+
+    print(f"\n🧪 行映射基准测试（{count} 行，取 5 次最好成绩）")
+    print("=" * 70)
+    print(f"{'实现':<28}{'映射 (ms)':>12}{'映射+to_dict (ms)':>20}{'内存 (B/行)':>12}")
+
+    baseline = None
+    for name, build in cases.items():
+        objects = build()
+        map_time = min(timeit.repeat(build, number=1, repeat=5)) * 1000
+        dict_time = min(timeit.repeat(
+            lambda: [o.to_dict() for o in build()], number=1, repeat=5
+        )) * 1000
+        memory = measure_memory(build)
+        assert objects[0].to_dict() == LegacyContractType.from_db_row(rows[0]).to_dict()
+
+        baseline = baseline or map_time
+        print(f"{name:<28}{map_time:>12.1f}{dict_time:>20.1f}{memory:>12.0f}"
+              f"   ({baseline / map_time:.2f}x)")
+
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
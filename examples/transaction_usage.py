@@ -33,26 +33,25 @@ def batch_create_contract_types(types_data: list[dict]) -> list[ContractType]:
     """
     批量创建合同类型（保证事务一致性）
     要么全部成功，要么全部失败
+    
+    使用 create_many 一次写入：多行 VALUES，数据量大时自动改用 COPY，
+    而不是逐行调用 create()（每行一次往返）
     """
-    created_types = []
+    new_types = [
+        ContractType(
+            type_code=data['code'],
+            type_name=data['name'],
+            description=data.get('description')
+        )
+        for data in types_data
+    ]
     
     with db_transaction() as conn:
         dao = ContractTypeDAO(conn, auto_commit=False)
         
-        for data in types_data:
-            new_type = ContractType(
-                type_code=data['code'],
-                type_name=data['name'],
-                description=data.get('description')
-            )
-            
-            created = dao.create(new_type)
-            created_types.append(created)
-        
-        # 如果循环中任何一个失败，整个事务回滚
-        # 如果全部成功，退出时自动 commit
-    
-    return created_types
+        # 任何一行失败，整个事务回滚
+        # 全部成功，退出时自动 commit
+        return dao.create_many(new_types)
 
 
 # ============================================
@@ -25,6 +25,33 @@ export interface ContractTypeCreate {
   default_workflow?: string
 }
 
+/**
+ * 部分更新合同类型请求（只传要修改的字段）
+ */
+export type ContractTypeUpdate = Partial<
+  Pick<ContractType, 'type_code' | 'type_name' | 'description' | 'default_workflow' | 'is_active' | 'sort_order'>
+>
+
+/**
+ * 分页查询参数（键集分页）
+ */
+export interface ContractTypeListParams {
+  limit?: number
+  cursor?: string | null
+  workflow?: string
+  active?: boolean
+  name_prefix?: string
+  fields?: (keyof ContractType)[]
+}
+
+/**
+ * 一页合同类型
+ */
+export interface ContractTypePage {
+  items: Partial<ContractType>[]
+  nextCursor: string | null
+}
+
 /**
  * API 响应格式
  */
@@ -33,6 +60,7 @@ interface ApiResponse<T> {
   data?: T
   message?: string
   error?: string
+  next_cursor?: string | null
 }
 
 /**
@@ -54,6 +82,29 @@ export const contractTypeService = {
     throw new Error(response.error || 'Failed to fetch contract types')
   },
 
+  /**
+   * 分页获取合同类型（把返回的 nextCursor 作为下一页的 cursor）
+   */
+  listTypes: async (params: ContractTypeListParams = {}): Promise<ContractTypePage> => {
+    const { fields, cursor, ...rest } = params
+    const response = await api.get<any, ApiResponse<Partial<ContractType>[]>>(
+      '/contract-type/list',
+      {
+        params: {
+          ...rest,
+          ...(cursor ? { cursor } : {}),
+          ...(fields?.length ? { fields: fields.join(',') } : {}),
+        },
+      }
+    )
+    
+    if (response.success && response.data) {
+      return { items: response.data, nextCursor: response.next_cursor ?? null }
+    }
+    
+    throw new Error(response.error || 'Failed to list contract types')
+  },
+
   /**
    * 根据代码获取合同类型
    */
@@ -84,6 +135,37 @@ export const contractTypeService = {
     
     throw new Error(response.error || 'Failed to create contract type')
   },
+
+  /**
+   * 部分更新合同类型，返回更新后的数据
+   */
+  updateType: async (typeCode: string, changes: ContractTypeUpdate): Promise<ContractType> => {
+    const response = await api.patch<any, ApiResponse<ContractType>>(
+      `/contract-type/${typeCode}`,
+      changes
+    )
+    
+    if (response.success && response.data) {
+      return response.data
+    }
+    
+    throw new Error(response.error || 'Failed to update contract type')
+  },
+
+  /**
+   * 停用合同类型，返回停用后的数据
+   */
+  deactivateType: async (typeCode: string): Promise<ContractType> => {
+    const response = await api.post<any, ApiResponse<ContractType>>(
+      `/contract-type/${typeCode}/deactivate`
+    )
+    
+    if (response.success && response.data) {
+      return response.data
+    }
+    
+    throw new Error(response.error || 'Failed to deactivate contract type')
+  },
 }
 
 export default contractTypeService
@@ -6,24 +6,63 @@ Contract Forge - 后端 API 服务
     uvicorn main:app --reload --port 8001
     
 或使用:
-    python main.py
+    python main.py          # 开发模式
+    python main.py serve    # 生产模式（多 worker，见 utils/prefork.py）
 """
 
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
+import time
 import uvicorn
 from datetime import datetime
 
-from apis.contract_type import router as contract_type_router
+from apis.contract_type import (
+    router as contract_type_router,
+    response_snapshots,
+    warm_up as warm_up_contract_types,
+)
+from models.contract_type import prepare_hot_statements
+from models.contract_type_cache import contract_type_cache, contract_type_change_feed
 from utils.logger import get_logger
+from utils.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, metrics
+from utils.timing import begin_request, end_request
+from utils.warmup import warm_up
+from utils.health import STATUS_DEGRADED, STATUS_HEALTHY, health_monitor
+from utils.admission import admission
+from utils.database import (
+    AsyncDatabasePool,
+    AsyncReplicaPool,
+    ConnectionPool,
+    ReplicaConnectionPool,
+    prepared_statements,
+)
+from utils.redis_client import RedisClient
+from utils.responses import ORJSONResponse
 from config import Config
 
 # 创建日志记录器
 logger = get_logger(__name__)
 
 
+# ============================================
+# 启动预热步骤（按注册顺序执行，全部完成后 /health/ready 返回 200）
+# ============================================
+@warm_up.step("db_pool")
+async def warm_up_db_pool():
+    """连接池建立到最小连接数，并在每个连接上预编译常用读语句"""
+    await AsyncDatabasePool.warm_up(prepare_hot_statements)
+    if Config.has_replica():
+        await AsyncReplicaPool.warm_up(prepare_hot_statements)
+
+
+@warm_up.step("contract_types")
+async def warm_up_dictionaries():
+    """加载合同类型字典（含各类型的默认工作流）并预先编码 /all 响应"""
+    await warm_up_contract_types()
+
+
 # ============================================
 # 生命周期事件处理（新版本）
 # ============================================
@@ -34,14 +73,33 @@ async def lifespan(app: FastAPI):
     logger.info("=" * 70)
     logger.info("🚀 Contract Forge API 启动中...")
     logger.info("=" * 70)
-    logger.info(f"📦 环境: {Config.ENVIRONMENT}")
-    logger.info(f"🔧 调试模式: {Config.API_DEBUG}")
-    logger.info(f"📡 API 地址: http://{Config.API_HOST}:{Config.API_PORT}")
-    logger.info(f"📚 API 文档: http://{Config.API_HOST}:{Config.API_PORT}/docs")
+    logger.info("📦 环境: %s", Config.ENVIRONMENT)
+    logger.info("🔧 调试模式: %s", Config.API_DEBUG)
+    logger.info("📡 API 地址: http://%s:%s", Config.API_HOST, Config.API_PORT)
+    logger.info("📚 API 文档: http://%s:%s/docs", Config.API_HOST, Config.API_PORT)
     logger.info("=" * 70)
     
-    # TODO: 初始化连接池等资源
-    # ConnectionPool.initialize()
+    # 初始化连接池（所有请求都从池中借用连接）
+    await AsyncDatabasePool.open()  # 异步端点使用
+    ConnectionPool.initialize()     # 同步工具 / 脚本使用
+    if Config.has_replica():
+        await AsyncReplicaPool.open()
+        ReplicaConnectionPool.initialize()
+    
+    # 订阅 Redis 缓存失效频道（Redis 不可用时后台重试，读请求直接查库）
+    await contract_type_cache.start()
+    # 监听数据库触发器的变更通知（直接用 SQL 修改数据时也能失效缓存）
+    if Config.DB_CHANGE_FEED_ENABLED:
+        await contract_type_change_feed.start()
+    
+    # 依赖健康检查在后台定期执行，/health 只返回缓存的结果
+    await health_monitor.start()
+    
+    # 预热完成后才开始接收请求；失败时照常启动，/health/ready 保持 503 并在后台重试
+    if Config.WARMUP_ENABLED:
+        await warm_up.run()
+    else:
+        warm_up.ready = True
     
     yield  # 应用运行中...
     
@@ -50,8 +108,17 @@ async def lifespan(app: FastAPI):
     logger.info("🛑 Contract Forge API 关闭中...")
     logger.info("=" * 70)
     
-    # TODO: 清理资源
-    # ConnectionPool.close_all()
+    await warm_up.stop()  # 先摘除就绪状态
+    await health_monitor.stop()
+    await contract_type_change_feed.stop()
+    await contract_type_cache.stop()
+    await RedisClient.close()
+    
+    # 关闭连接池
+    await AsyncReplicaPool.close()
+    await AsyncDatabasePool.close()
+    ReplicaConnectionPool.close_all()
+    ConnectionPool.close_all()
 
 
 # 创建 FastAPI 应用
@@ -62,6 +129,7 @@ app = FastAPI(
     docs_url="/docs",  # Swagger UI: http://localhost:8001/docs
     redoc_url="/redoc",  # ReDoc: http://localhost:8001/redoc
     lifespan=lifespan,  # 使用新的生命周期管理
+    default_response_class=ORJSONResponse,  # orjson 编码，比标准库 json 快
 )
 
 # ============================================
@@ -77,31 +145,61 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # 允许所有 HTTP 方法
     allow_headers=["*"],  # 允许所有 HTTP 头
+    expose_headers=["ETag", "Last-Modified", "Server-Timing"],  # 允许前端读取缓存验证头和分阶段耗时
 )
 
 
 # ============================================
-# 请求日志中间件
+# 请求日志 / 指标中间件
 # ============================================
+http_requests = metrics.counter(
+    'http_requests_total', 'HTTP requests', ('method', 'route', 'status'),
+)
+http_request_duration = metrics.histogram(
+    'http_request_duration_seconds', 'HTTP request latency', ('method', 'route'),
+)
+http_requests_in_flight = metrics.gauge('http_requests_in_flight', 'HTTP requests being processed')
+
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    """记录所有请求"""
-    start_time = datetime.now()
+    """
+    记录所有请求（每个请求完成后一行日志，并按路由模板记录指标）
     
-    # 记录请求
-    logger.info(f"📨 {request.method} {request.url.path}")
+    开启 SERVER_TIMING_ENABLED 时返回 Server-Timing 响应头（各阶段耗时见 utils/timing.py），
+    开启 ACCESS_LOG_TIMINGS 时同时写入访问日志。
+    """
+    timings, token = begin_request()
+    if Config.METRICS_ENABLED:
+        http_requests_in_flight.inc()
     
     # 处理请求
-    response = await call_next(request)
-    
-    # 计算处理时间
-    duration = (datetime.now() - start_time).total_seconds()
+    try:
+        response = await call_next(request)
+    finally:
+        end_request(token)
+        if Config.METRICS_ENABLED:
+            http_requests_in_flight.dec()
+    elapsed = timings.finish()
     
-    # 记录响应
-    logger.info(
-        f"📤 {request.method} {request.url.path} "
-        f"- {response.status_code} - {duration:.3f}s"
-    )
+    if Config.SERVER_TIMING_ENABLED:
+        response.headers["Server-Timing"] = timings.server_timing()
+    if Config.ACCESS_LOG_TIMINGS:
+        logger.info(
+            "📤 %s %s - %d - %.3fs [%s]",
+            request.method, request.url.path, response.status_code, elapsed, timings.summary(),
+        )
+    else:
+        logger.info(
+            "📤 %s %s - %d - %.3fs",
+            request.method, request.url.path, response.status_code, elapsed,
+        )
+    if Config.METRICS_ENABLED:
+        # 用路由模板（/api/contract-type/{type_code}）而不是实际路径，避免标签数量无限增长
+        route = request.scope.get("route")
+        template = route.path if route is not None else "unmatched"
+        http_request_duration.labels(request.method, template).observe(elapsed)
+        http_requests.labels(request.method, template, response.status_code).inc()
     
     return response
 
@@ -113,29 +211,30 @@ async def log_requests(request: Request, call_next):
 async def http_exception_handler(request: Request, exc: HTTPException):
     """
     HTTPException 异常处理
-    将 FastAPI 标准格式转换为统一的 API 响应格式
+    将 FastAPI 标准格式转换为统一的 API 响应格式（保留异常中的响应头，例如 503 的 Retry-After）
     """
     logger.warning(
-        f"⚠️  HTTPException: {exc.status_code} - {exc.detail} "
-        f"- {request.method} {request.url.path}"
+        "⚠️  HTTPException: %s - %s - %s %s",
+        exc.status_code, exc.detail, request.method, request.url.path,
     )
     
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={
             "success": False,
             "error": exc.detail,
             "status_code": exc.status_code
-        }
+        },
+        headers=exc.headers,
     )
 
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """全局异常处理"""
-    logger.error(f"❌ Unhandled exception: {exc}", exc_info=True)
+    logger.error("❌ Unhandled exception: %s", exc, exc_info=True)
     
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "success": False,
@@ -165,24 +264,46 @@ async def root():
 # 健康检查
 @app.get("/health")
 async def health_check():
-    """健康检查端点"""
-    try:
-        # 可以添加数据库连接检查等
-        return {
-            "status": "healthy",
+    """
+    健康检查端点
+    
+    返回后台任务缓存的 PostgreSQL / Redis / 磁盘检查结果及其时间（见 utils/health.py），
+    不做任何 I/O；关键依赖异常时返回 503，仅 Redis 异常时为 degraded（200）。
+    """
+    report = health_monitor.report()
+    postgres_ok = health_monitor.is_ok("postgres")
+    return ORJSONResponse(
+        status_code=200 if report["status"] in (STATUS_HEALTHY, STATUS_DEGRADED) else 503,
+        content={
+            "status": report["status"],
             "timestamp": datetime.now().isoformat(),
             "service": "Contract Forge API",
-            "database": "connected",  # TODO: 实际检查数据库连接
-        }
-    except Exception as e:
-        logger.error(f"Health check failed: {e}")
-        return JSONResponse(
-            status_code=503,
-            content={
-                "status": "unhealthy",
-                "error": str(e)
-            }
-        )
+            "database": "unknown" if postgres_ok is None else ("connected" if postgres_ok else "disconnected"),
+            "checks": report["checks"],
+        },
+    )
+
+
+@app.get("/health/live")
+async def liveness_check():
+    """存活检查：进程能响应即返回 200（不检查依赖，失败时应重启进程）"""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def readiness_check():
+    """就绪检查：启动预热完成后返回 200；预热未完成或正在关闭时返回 503（不应分配流量）"""
+    status = warm_up.status()
+    return ORJSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+
+# 指标
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Prometheus 文本格式的进程内指标"""
+    if not Config.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics disabled")
+    return PlainTextResponse(metrics.render(), media_type=METRICS_CONTENT_TYPE)
 
 
 # API 信息
@@ -197,7 +318,17 @@ async def api_info():
             "contract_types": "/api/contract-type",
             "contracts": "/api/contracts",
             "workflows": "/api/workflows",
-        }
+        },
+        "database": {
+            "pool": AsyncDatabasePool.stats(),
+            "prepared_statements": prepared_statements.stats(),
+        },
+        "cache": {
+            "contract_types": contract_type_cache.stats(),
+            "change_feed": contract_type_change_feed.stats(),
+            "response_snapshots": response_snapshots.stats(),
+        },
+        "admission": admission.stats(),
     }
 
 
@@ -211,6 +342,10 @@ app.include_router(
 # app.include_router(contract_router, prefix="/api")
 # app.include_router(workflow_router, prefix="/api")
 
+# 准入控制（在注册全部路由之后；只作用于用 admission.limit 标记过的端点）
+if Config.ADMISSION_ENABLED:
+    admission.install(app)
+
 
 # ============================================
 # 主程序入口
@@ -220,11 +355,26 @@ if __name__ == "__main__":
     直接运行此文件启动服务器
     
     使用方法：
-        python main.py
+        python main.py                      # 开发模式（单进程，API_DEBUG 时自动重载）
+        python main.py serve [--workers N]  # 生产模式（多 worker，见 utils/prefork.py）
     
     或使用 uvicorn 命令：
         uvicorn main:app --reload --port 8001
     """
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Contract Forge API")
+    subcommands = parser.add_subparsers(dest="command")
+    serve_parser = subcommands.add_parser("serve", help="生产模式：prefork 多 worker，SIGTERM 时平滑退出")
+    serve_parser.add_argument("--workers", type=int, default=None, help="worker 数量（默认 API_WORKERS，0 为 CPU 核数）")
+    serve_parser.add_argument("--host", default=None, help="监听地址（默认 API_HOST）")
+    serve_parser.add_argument("--port", type=int, default=None, help="监听端口（默认 API_PORT）")
+    args = parser.parse_args()
+    
+    if args.command == "serve":
+        from utils.prefork import serve
+        serve("main:app", workers=args.workers, host=args.host, port=args.port)
+        raise SystemExit(0)
     
     # 打印启动信息
     print("\n" + "=" * 70)
@@ -246,4 +396,3 @@ if __name__ == "__main__":
         reload=Config.API_DEBUG,  # 开发模式自动重载
         log_level="info"
     )
-
@@ -5,11 +5,26 @@ Contract Type Model
 对应数据库表: contract_types
 """
 
+import io
+import json
 from datetime import datetime
-from typing import Optional
-from dataclasses import dataclass
+from functools import lru_cache
+from operator import itemgetter
+from typing import AsyncIterator, Callable, Iterable, Iterator, NamedTuple, Optional
+from dataclasses import dataclass, fields
 from enum import Enum
 
+from psycopg2.extras import execute_values
+
+from config import Config
+from utils.database import after_commit, astream_batches, db_query_duration, prepared_statements, stream_batches
+from utils.metrics import instrument_methods
+from utils.timing import PHASE_DB
+from utils.pagination import escape_like
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
 
 class DefaultWorkflow(str, Enum):
     """默认工作流类型"""
@@ -18,10 +33,10 @@ class DefaultWorkflow(str, Enum):
     STRICT = "strict_approval"                 # 严格审批流程
 
 
-@dataclass
+@dataclass(slots=True)
 class ContractType:
     """
-    合同类型数据类
+    合同类型数据类（__slots__，没有每个实例的 __dict__）
     
     Attributes:
         id: 主键ID
@@ -50,22 +65,16 @@ class ContractType:
         从数据库查询结果创建实例
         
         Args:
-            row: 数据库查询返回的元组 (id, type_code, type_name, ...)
+            row: 数据库查询返回的元组 (id, type_code, type_name, ...)，
+                 列顺序与 COLUMNS 一致，可以只包含前几列
             
         Returns:
             ContractType 实例
+        
+        批量转换请用 mapper_for_width() 取得映射函数后逐行调用，
+        只在第一行检查一次列布局。
         """
-        return cls(
-            id=row[0],
-            type_code=row[1],
-            type_name=row[2],
-            description=row[3] if len(row) > 3 else None,
-            default_workflow=row[4] if len(row) > 4 else None,
-            is_active=row[5] if len(row) > 5 else True,
-            sort_order=row[6] if len(row) > 6 else 0,
-            created_at=row[7] if len(row) > 7 else None,
-            updated_at=row[8] if len(row) > 8 else None,
-        )
+        return mapper_for_width(len(row), cls)(row)
     
     def to_dict(self) -> dict:
         """
@@ -91,9 +100,574 @@ class ContractType:
         return f"ContractType(id={self.id}, code='{self.type_code}', name='{self.type_name}')"
 
 
+@dataclass(frozen=True)
+class TableVersion:
+    """
+    contract_types 表的版本号（由 database/003_table_versions.sql 的触发器维护）
+    
+    每条修改该表的语句都会递增 version，用于生成 ETag / Last-Modified。
+    """
+    version: int
+    changed_at: datetime
+
+
+class ContractTypeRecord(NamedTuple):
+    """
+    只读的合同类型记录（基于元组）
+    
+    字段顺序与查询列（COLUMNS）一致，查询结果可以直接构造，没有逐字段赋值的开销，
+    适合批量报表等只读场景；需要修改时用 to_contract_type() 转换。
+    """
+    id: Optional[int]
+    type_code: str
+    type_name: str
+    description: Optional[str] = None
+    default_workflow: Optional[str] = None
+    is_active: bool = True
+    sort_order: int = 0
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    
+    def to_dict(self) -> dict:
+        """转换为字典格式（与 ContractType.to_dict 一致）"""
+        created_at, updated_at = self.created_at, self.updated_at
+        return {
+            'id': self.id,
+            'type_code': self.type_code,
+            'type_name': self.type_name,
+            'description': self.description,
+            'default_workflow': self.default_workflow,
+            'is_active': self.is_active,
+            'sort_order': self.sort_order,
+            'created_at': created_at.isoformat() if created_at else None,
+            'updated_at': updated_at.isoformat() if updated_at else None,
+        }
+    
+    def to_contract_type(self) -> ContractType:
+        """转换为可修改的 ContractType"""
+        return ContractType(**self._asdict())
+
+
+# ============================================
+# 行映射（每种列布局只生成一次映射函数）
+# ============================================
+# 查询返回的列顺序（SELECT_COLUMNS）
+COLUMNS = (
+    'id', 'type_code', 'type_name', 'description', 'default_workflow',
+    'is_active', 'sort_order', 'created_at', 'updated_at',
+)
+
+
+@lru_cache(maxsize=None)
+def row_mapper(columns: tuple, cls: type = ContractType) -> Callable[[tuple], object]:
+    """
+    生成把查询行转换为 cls 实例的函数
+    
+    列布局在这里检查一次，返回的函数对每一行只做位置取值和构造。
+    
+    Args:
+        columns: 查询返回的列名（例如 tuple(d.name for d in cursor.description)）
+        cls: ContractType 或 ContractTypeRecord
+    """
+    unknown = set(columns) - set(COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown contract type columns: {sorted(unknown)}")
+    
+    field_names = cls._fields if cls is ContractTypeRecord else tuple(f.name for f in fields(cls))
+    present = [name for name in field_names if name in columns]
+    
+    if columns == field_names:
+        # 列顺序与字段顺序完全一致（ContractTypeRecord + 完整查询）
+        return cls._make if cls is ContractTypeRecord else (lambda row: cls(*row))
+    
+    if tuple(present) == field_names[:len(present)]:
+        # 查询的列是字段的前缀（顺序可以不同）：按位置重排后构造
+        if len(present) == 1:
+            index = columns.index(present[0])
+            return lambda row: cls(row[index])
+        getter = itemgetter(*(columns.index(name) for name in present))
+        return lambda row: cls(*getter(row))
+    
+    return lambda row: cls(**dict(zip(columns, row)))
+
+
+def mapper_for_width(width: int, cls: type = ContractType) -> Callable[[tuple], object]:
+    """取前 width 列（按 COLUMNS 顺序）时的行映射函数"""
+    return row_mapper(COLUMNS[:width], cls)
+
+
+def _map_rows(rows: list, cls: type = ContractType) -> list:
+    """批量转换查询结果（只检查一次列布局）"""
+    if not rows:
+        return []
+    return list(map(mapper_for_width(len(rows[0]), cls), rows))
+
+
+# ============================================
+# 变更通知（缓存失效等）
+# ============================================
+@dataclass(frozen=True)
+class ContractTypeChange:
+    """
+    合同类型变更（在事务提交后通知监听者）
+    
+    Attributes:
+        op: 操作类型（create / update / delete / deactivate / upsert / import）
+        ids: 受影响的ID
+        codes: 受影响的类型代码
+        everything: 受影响的行未知（例如批量导入），监听者应整体失效
+        txid: 数据库事务ID（仅来自 NOTIFY 的变更）
+    """
+    op: str
+    ids: tuple = ()
+    codes: tuple = ()
+    everything: bool = False
+    txid: Optional[int] = None
+    
+    @classmethod
+    def from_notification(cls, payload: str) -> 'ContractTypeChange':
+        """
+        解析触发器发出的通知载荷（见 database/002_contract_types_notify.sql）
+        
+        每条语句一条通知，ids / codes 为该语句影响的全部行；
+        载荷带 everything、没有行信息（TRUNCATE）或无法解析时返回 everything=True 的变更。
+        """
+        try:
+            row = json.loads(payload)
+            op = row['op']
+        except (ValueError, TypeError, KeyError):
+            return cls('unknown', everything=True)
+        
+        txid = row.get('txid')
+        if row.get('everything'):
+            return cls(op, everything=True, txid=txid)
+        if row.get('ids'):
+            ids = tuple(row['ids'])
+            codes = row.get('codes') or ()
+        elif row.get('id') is not None:
+            # 逐行触发器的载荷（新迁移执行之前）
+            ids = (row['id'],)
+            codes = (row.get('type_code'), row.get('old_type_code'))
+        else:
+            return cls(op, everything=True, txid=txid)
+        return cls(op, ids=ids, codes=tuple(dict.fromkeys(code for code in codes if code)), txid=txid)
+
+
+# 触发器通知的频道名
+CHANGE_CHANNEL = 'contract_types_changed'
+
+
+_change_listeners: list[Callable[[ContractTypeChange], None]] = []
+
+
+def add_change_listener(listener: Callable[[ContractTypeChange], None]) -> None:
+    """注册变更监听者（写操作提交后调用）"""
+    if listener not in _change_listeners:
+        _change_listeners.append(listener)
+
+
+def remove_change_listener(listener: Callable[[ContractTypeChange], None]) -> None:
+    """移除变更监听者"""
+    if listener in _change_listeners:
+        _change_listeners.remove(listener)
+
+
+def _notify_change(change: ContractTypeChange) -> None:
+    for listener in list(_change_listeners):
+        try:
+            listener(change)
+        except Exception:
+            logger.exception("Contract type change listener failed")
+
+
+def _publish_change(conn, auto_commit: bool, change: ContractTypeChange) -> None:
+    """DAO 已自行提交时立即通知，否则等外层事务提交后再通知"""
+    if auto_commit:
+        _notify_change(change)
+    else:
+        after_commit(conn, lambda: _notify_change(change))
+
+
+# ============================================
+# SQL 语句（同步 / 异步 DAO 共用）
+# ============================================
+SELECT_COLUMNS = """
+    SELECT id, type_code, type_name, description, 
+           default_workflow, is_active, sort_order, 
+           created_at, updated_at
+    FROM contract_types
+"""
+
+GET_BY_CODE_SQL = SELECT_COLUMNS + " WHERE type_code = %s"
+
+GET_BY_ID_SQL = SELECT_COLUMNS + " WHERE id = %s"
+
+# 多键查询：一次往返取回一组代码 / ID（参数为列表，适配为数组）
+GET_BY_CODES_SQL = SELECT_COLUMNS + " WHERE type_code = ANY(%s)"
+
+GET_BY_IDS_SQL = SELECT_COLUMNS + " WHERE id = ANY(%s)"
+
+INSERT_SQL = """
+    INSERT INTO contract_types 
+    (type_code, type_name, description, default_workflow, 
+     is_active, sort_order)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    RETURNING id, created_at, updated_at
+"""
+
+# type_code 已存在时不写入、不返回行（一次往返，并发创建也不会竞争）
+INSERT_IF_ABSENT_SQL = """
+    INSERT INTO contract_types 
+    (type_code, type_name, description, default_workflow, 
+     is_active, sort_order)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    ON CONFLICT (type_code) DO NOTHING
+    RETURNING id, created_at, updated_at
+"""
+
+UPDATE_SQL = """
+    UPDATE contract_types
+    SET type_code = %s,
+        type_name = %s,
+        description = %s,
+        default_workflow = %s,
+        is_active = %s,
+        sort_order = %s,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = %s
+"""
+
+DELETE_SQL = "DELETE FROM contract_types WHERE id = %s"
+
+DEACTIVATE_SQL = """
+    UPDATE contract_types
+    SET is_active = FALSE,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = %s
+"""
+
+DEACTIVATE_BY_CODE_SQL = f"""
+    UPDATE contract_types
+    SET is_active = FALSE,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE type_code = %s
+    RETURNING {', '.join(COLUMNS)}
+"""
+
+TABLE_VERSION_SQL = "SELECT version, changed_at FROM table_versions WHERE table_name = 'contract_types'"
+
+
+def _get_all_sql(active_only: bool) -> str:
+    """构造 get_all 查询语句"""
+    query = SELECT_COLUMNS
+    if active_only:
+        query += " WHERE is_active = TRUE"
+    return query + " ORDER BY sort_order, type_code"
+
+
+def _insert_params(contract_type: 'ContractType') -> tuple:
+    return (
+        contract_type.type_code,
+        contract_type.type_name,
+        contract_type.description,
+        contract_type.default_workflow,
+        contract_type.is_active,
+        contract_type.sort_order,
+    )
+
+
+def _update_params(contract_type: 'ContractType') -> tuple:
+    return _insert_params(contract_type) + (contract_type.id,)
+
+
+# 热点语句注册为服务端预编译语句（每个连接只解析/规划一次）
+STMT_GET_ALL = prepared_statements.register('contract_types_get_all', _get_all_sql(False))
+STMT_GET_ALL_ACTIVE = prepared_statements.register('contract_types_get_all_active', _get_all_sql(True))
+STMT_GET_BY_CODE = prepared_statements.register('contract_types_get_by_code', GET_BY_CODE_SQL)
+STMT_GET_BY_ID = prepared_statements.register('contract_types_get_by_id', GET_BY_ID_SQL)
+STMT_GET_BY_CODES = prepared_statements.register('contract_types_get_by_codes', GET_BY_CODES_SQL)
+STMT_GET_BY_IDS = prepared_statements.register('contract_types_get_by_ids', GET_BY_IDS_SQL)
+STMT_INSERT = prepared_statements.register('contract_types_insert', INSERT_SQL)
+STMT_INSERT_IF_ABSENT = prepared_statements.register('contract_types_insert_if_absent', INSERT_IF_ABSENT_SQL)
+STMT_UPDATE = prepared_statements.register('contract_types_update', UPDATE_SQL)
+STMT_DELETE = prepared_statements.register('contract_types_delete', DELETE_SQL)
+STMT_DEACTIVATE = prepared_statements.register('contract_types_deactivate', DEACTIVATE_SQL)
+STMT_DEACTIVATE_BY_CODE = prepared_statements.register('contract_types_deactivate_by_code', DEACTIVATE_BY_CODE_SQL)
+STMT_VERSION = prepared_statements.register('contract_types_version', TABLE_VERSION_SQL)
+
+# 启动预热时在每个连接上预编译的读语句（参数只用于触发 PREPARE，不会命中数据）
+# 驱动按 SQL + 参数类型缓存预编译语句，参数类型必须与运行时 DAO 传入的一致：
+# 整数由 aexecute 统一按 int8 / int8[] 传递，因此 ID 列表不能为空（空列表没有元素类型）
+HOT_STATEMENTS = (
+    (STMT_GET_ALL_ACTIVE, ()),
+    (STMT_GET_ALL, ()),
+    (STMT_GET_BY_CODE, ('',)),
+    (STMT_GET_BY_ID, (0,)),
+    (STMT_GET_BY_CODES, ([''],)),
+    (STMT_GET_BY_IDS, ([0],)),
+)
+
+
+async def prepare_hot_statements(conn) -> None:
+    """在异步连接上预编译常用读语句（供 AsyncDatabasePool.warm_up 使用）"""
+    async with conn.cursor() as cursor:
+        for name, params in HOT_STATEMENTS:
+            await prepared_statements.aexecute(cursor, name, params)
+
+
+def _get_all_stmt(active_only: bool) -> str:
+    return STMT_GET_ALL_ACTIVE if active_only else STMT_GET_ALL
+
+
+# ============================================
+# 部分更新（只写修改的列，RETURNING 更新后的行）
+# ============================================
+PATCHABLE_COLUMNS = (
+    'type_code', 'type_name', 'description', 'default_workflow', 'is_active', 'sort_order',
+)
+
+
+@lru_cache(maxsize=None)
+def _patch_sql(columns: tuple, key_column: str) -> str:
+    """
+    部分更新语句（每种列组合只拼接一次）
+    
+    子查询锁定目标行并带出更新前的 type_code，改名时据此失效旧代码的缓存；
+    RETURNING 第一列为旧 type_code，其后为 COLUMNS。
+    """
+    assignments = ", ".join(f"{name} = %s" for name in columns)
+    returning = ", ".join(f"t.{name}" for name in COLUMNS)
+    return (
+        f"UPDATE contract_types AS t SET {assignments}, updated_at = CURRENT_TIMESTAMP"
+        f" FROM (SELECT id, type_code FROM contract_types WHERE {key_column} = %s FOR UPDATE) AS old"
+        f" WHERE t.id = old.id"
+        f" RETURNING old.type_code, {returning}"
+    )
+
+
+def _patch_query(key_column: str, key, changes: dict) -> tuple:
+    """
+    构造部分更新的 (SQL, 参数)
+    
+    Raises:
+        ValueError: 没有要修改的字段，或包含不可修改的字段
+    """
+    unknown = set(changes) - set(PATCHABLE_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    columns = tuple(name for name in PATCHABLE_COLUMNS if name in changes)
+    if not columns:
+        raise ValueError("No fields to update")
+    return _patch_sql(columns, key_column), tuple(changes[name] for name in columns) + (key,)
+
+
+# ============================================
+# 键集分页
+# ============================================
+# 分页的排序键（与 get_all 的排序一致，需要 004_contract_types_keyset.sql 中的索引）
+PAGE_KEY = ('sort_order', 'type_code')
+
+
+@dataclass
+class ContractTypePage:
+    """
+    一页查询结果
+    
+    Attributes:
+        items: 指定 fields 时为只含这些字段的字典，否则为 ContractType
+        next_after: 下一页的起始位置（本页最后一行的排序键），没有下一页时为 None
+    """
+    items: list
+    next_after: Optional[tuple] = None
+
+
+def _page_query(
+    limit: int,
+    after: Optional[tuple],
+    workflow: Optional[str],
+    active: Optional[bool],
+    name_prefix: Optional[str],
+    fields: Optional[tuple],
+) -> tuple[str, list, tuple]:
+    """构造分页查询，返回 (SQL, 参数, 查询的列)"""
+    columns = COLUMNS if fields is None else tuple(
+        name for name in COLUMNS if name in fields or name in PAGE_KEY
+    )
+    conditions, params = [], []
+    
+    if active is not None:
+        conditions.append("is_active = %s")
+        params.append(active)
+    if workflow is not None:
+        conditions.append("default_workflow = %s")
+        params.append(workflow)
+    if name_prefix:
+        conditions.append("type_name LIKE %s ESCAPE '\\'")
+        params.append(escape_like(name_prefix) + '%')
+    if after is not None:
+        # 行值比较可以直接使用 (sort_order, type_code) 索引定位
+        conditions.append("(sort_order, type_code) > (%s, %s)")
+        params.extend(after)
+    
+    query = f"SELECT {', '.join(columns)} FROM contract_types"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY sort_order, type_code LIMIT %s"
+    params.append(limit + 1)  # 多取一行判断是否还有下一页
+    
+    return query, params, columns
+
+
+def _build_page(rows: list, columns: tuple, limit: int, fields: Optional[tuple]) -> ContractTypePage:
+    next_after = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_after = tuple(last[columns.index(name)] for name in PAGE_KEY)
+    
+    if fields is None:
+        items = list(map(row_mapper(columns), rows))
+    else:
+        getter = itemgetter(*(columns.index(name) for name in fields))
+        if len(fields) == 1:
+            items = [{fields[0]: getter(row)} for row in rows]
+        else:
+            items = [dict(zip(fields, getter(row))) for row in rows]
+    
+    return ContractTypePage(items, next_after)
+
+
+# ============================================
+# 批量写入 SQL
+# ============================================
+_BULK_COLUMNS = "type_code, type_name, description, default_workflow, is_active, sort_order"
+
+# 多行 VALUES 模板：显式类型，避免整列为 NULL 时类型推断失败
+_BULK_ROW_TEMPLATE = "(%s::int, %s, %s, %s::text, %s::text, %s::boolean, %s::int)"
+
+BULK_INSERT_SQL = f"""
+    INSERT INTO contract_types ({_BULK_COLUMNS})
+    SELECT {_BULK_COLUMNS} FROM (VALUES %s)
+        AS v(ord, {_BULK_COLUMNS})
+    ORDER BY ord
+    RETURNING id, type_code, created_at, updated_at
+"""
+
+BULK_UPSERT_SQL = f"""
+    INSERT INTO contract_types ({_BULK_COLUMNS})
+    SELECT {_BULK_COLUMNS} FROM (VALUES %s)
+        AS v(ord, {_BULK_COLUMNS})
+    ORDER BY ord
+    ON CONFLICT (type_code) DO UPDATE
+    SET type_name = EXCLUDED.type_name,
+        description = EXCLUDED.description,
+        default_workflow = EXCLUDED.default_workflow,
+        is_active = EXCLUDED.is_active,
+        sort_order = EXCLUDED.sort_order,
+        updated_at = CURRENT_TIMESTAMP
+    RETURNING id, type_code, created_at, updated_at
+"""
+
+BULK_UPDATE_SQL = f"""
+    UPDATE contract_types AS t
+    SET type_code = v.type_code,
+        type_name = v.type_name,
+        description = v.description,
+        default_workflow = v.default_workflow,
+        is_active = v.is_active,
+        sort_order = v.sort_order,
+        updated_at = CURRENT_TIMESTAMP
+    FROM (VALUES %s) AS v(id, {_BULK_COLUMNS})
+    WHERE t.id = v.id
+    RETURNING t.id, t.created_at, t.updated_at
+"""
+
+# COPY 路径：先写入会话级临时表，再用一条语句落表
+_STAGE_TABLE = "contract_types_stage"
+
+_CREATE_STAGE_SQL = f"""
+    CREATE TEMP TABLE IF NOT EXISTS {_STAGE_TABLE} (
+        ord INTEGER,
+        type_code VARCHAR(50),
+        type_name VARCHAR(100),
+        description TEXT,
+        default_workflow VARCHAR(100),
+        is_active BOOLEAN,
+        sort_order INTEGER
+    ) ON COMMIT DELETE ROWS
+"""
+
+_COPY_STAGE_SQL = f"COPY {_STAGE_TABLE} (ord, {_BULK_COLUMNS}) FROM STDIN"
+
+
+# 导入 / 导出（COPY 流式）
+_EXPORT_QUERY = SELECT_COLUMNS.strip()
+
+_COPY_OUT_TYPES = ["int4", "varchar", "varchar", "text", "varchar", "bool", "int4", "timestamp", "timestamp"]
+
+_STAGE_CONFLICTS_SQL = f"""
+    SELECT s.ord, s.type_code
+    FROM {_STAGE_TABLE} s
+    JOIN contract_types c ON c.type_code = s.type_code
+    ORDER BY s.ord
+"""
+
+_STAGE_INSERT_SQL = f"""
+    INSERT INTO contract_types ({_BULK_COLUMNS})
+    SELECT {_BULK_COLUMNS} FROM {_STAGE_TABLE}
+    ORDER BY ord
+    ON CONFLICT (type_code) DO NOTHING
+"""
+
+_STAGE_UPSERT_SQL = f"""
+    INSERT INTO contract_types ({_BULK_COLUMNS})
+    SELECT {_BULK_COLUMNS} FROM {_STAGE_TABLE}
+    ORDER BY ord
+    ON CONFLICT (type_code) DO UPDATE
+    SET type_name = EXCLUDED.type_name,
+        description = EXCLUDED.description,
+        default_workflow = EXCLUDED.default_workflow,
+        is_active = EXCLUDED.is_active,
+        sort_order = EXCLUDED.sort_order,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+
+def _export_sql(active_only: bool, copy_format: str = "") -> str:
+    """COPY (SELECT ...) TO STDOUT 语句"""
+    query = _EXPORT_QUERY
+    if active_only:
+        query += " WHERE is_active = TRUE"
+    query += " ORDER BY sort_order, type_code"
+    return f"COPY ({query}) TO STDOUT {copy_format}".rstrip()
+
+
+def _bulk_row(key, contract_type: 'ContractType') -> tuple:
+    """批量语句的一行：(排序键或ID, 各列...)"""
+    return (key,) + _insert_params(contract_type)
+
+
+def _copy_text_value(value) -> str:
+    """转换为 COPY text 格式的字段值"""
+    if value is None:
+        return '\\N'
+    if value is True:
+        return 't'
+    if value is False:
+        return 'f'
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace('\t', '\\t')
+        .replace('\n', '\\n')
+        .replace('\r', '\\r')
+    )
+
+
 # ============================================
 # 数据访问层（DAO）
 # ============================================
+@instrument_methods(db_query_duration, phase=PHASE_DB)
 class ContractTypeDAO:
     """
     合同类型数据访问对象
@@ -111,6 +685,10 @@ class ContractTypeDAO:
         self.conn = db_connection
         self.auto_commit = auto_commit
     
+    def _changed(self, op: str, **keys) -> None:
+        """通知变更（auto_commit=False 时等外层事务提交后再通知）"""
+        _publish_change(self.conn, self.auto_commit, ContractTypeChange(op, **keys))
+    
     def get_all(self, active_only: bool = True) -> list[ContractType]:
         """
         获取所有合同类型
@@ -122,24 +700,69 @@ class ContractTypeDAO:
             合同类型列表
         """
         cursor = self.conn.cursor()
+        prepared_statements.execute(cursor, _get_all_stmt(active_only))
+        rows = cursor.fetchall()
+        cursor.close()
         
-        query = """
-            SELECT id, type_code, type_name, description, 
-                   default_workflow, is_active, sort_order, 
-                   created_at, updated_at
-            FROM contract_types
+        return _map_rows(rows)
+    
+    def get_page(
+        self,
+        limit: int = 50,
+        after: Optional[tuple] = None,
+        workflow: Optional[str] = None,
+        active: Optional[bool] = None,
+        name_prefix: Optional[str] = None,
+        fields: Optional[tuple] = None,
+    ) -> ContractTypePage:
         """
+        键集分页查询（按 sort_order, type_code 排序）
         
-        if active_only:
-            query += " WHERE is_active = TRUE"
+        Args:
+            limit: 每页行数
+            after: 上一页返回的 next_after，None 表示第一页
+            workflow: 只返回该默认工作流的类型
+            active: 只返回启用 / 停用的类型，None 表示不过滤
+            name_prefix: 类型名称前缀
+            fields: 只查询这些列（稀疏字段），None 表示全部
+            
+        Returns:
+            ContractTypePage
+        """
+        query, params, columns = _page_query(limit, after, workflow, active, name_prefix, fields)
+        cursor = self.conn.cursor()
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        cursor.close()
         
-        query += " ORDER BY sort_order, type_code"
+        return _build_page(rows, columns, limit, fields)
+    
+    def get_all_records(self, active_only: bool = True) -> list[ContractTypeRecord]:
+        """
+        获取所有合同类型的只读记录（批量报表等只读场景，构造开销最小）
         
-        cursor.execute(query)
+        Args:
+            active_only: 是否只返回启用的类型
+        """
+        cursor = self.conn.cursor()
+        prepared_statements.execute(cursor, _get_all_stmt(active_only))
         rows = cursor.fetchall()
         cursor.close()
         
-        return [ContractType.from_db_row(row) for row in rows]
+        return _map_rows(rows, ContractTypeRecord)
+    
+    def iter_batches(
+        self, active_only: bool = False, batch_size: Optional[int] = None
+    ) -> Iterator[list[ContractType]]:
+        """
+        通过服务端游标分批读取合同类型（内存占用与总行数无关，需在事务中调用）
+        
+        Args:
+            active_only: 是否只返回启用的类型
+            batch_size: 每批行数（默认 Config.DB_STREAM_BATCH_SIZE）
+        """
+        for rows in stream_batches(self.conn, _get_all_sql(active_only), batch_size=batch_size):
+            yield _map_rows(rows)
     
     def get_by_code(self, type_code: str) -> Optional[ContractType]:
         """
@@ -152,16 +775,7 @@ class ContractTypeDAO:
             合同类型对象，如果不存在返回 None
         """
         cursor = self.conn.cursor()
-        
-        query = """
-            SELECT id, type_code, type_name, description, 
-                   default_workflow, is_active, sort_order, 
-                   created_at, updated_at
-            FROM contract_types
-            WHERE type_code = %s
-        """
-        
-        cursor.execute(query, (type_code,))
+        prepared_statements.execute(cursor, STMT_GET_BY_CODE, (type_code,))
         row = cursor.fetchone()
         cursor.close()
         
@@ -178,20 +792,65 @@ class ContractTypeDAO:
             合同类型对象，如果不存在返回 None
         """
         cursor = self.conn.cursor()
+        prepared_statements.execute(cursor, STMT_GET_BY_ID, (id,))
+        row = cursor.fetchone()
+        cursor.close()
+        
+        return ContractType.from_db_row(row) if row else None
+    
+    def get_by_codes(self, type_codes: Iterable[str]) -> dict[str, ContractType]:
+        """
+        批量按类型代码获取（一条 = ANY(%s) 查询）
+        
+        Args:
+            type_codes: 合同类型代码（可重复）
+            
+        Returns:
+            {type_code: 合同类型}，不存在的代码不在结果中
+        """
+        codes = list(dict.fromkeys(type_codes))
+        if not codes:
+            return {}
+        cursor = self.conn.cursor()
+        prepared_statements.execute(cursor, STMT_GET_BY_CODES, (codes,))
+        rows = cursor.fetchall()
+        cursor.close()
+        
+        return {t.type_code: t for t in _map_rows(rows)}
+    
+    def get_by_ids(self, ids: Iterable[int]) -> dict[int, ContractType]:
+        """
+        批量按ID获取（一条 = ANY(%s) 查询）
+        
+        Args:
+            ids: 合同类型ID（可重复）
+            
+        Returns:
+            {id: 合同类型}，不存在的ID不在结果中
+        """
+        unique_ids = list(dict.fromkeys(ids))
+        if not unique_ids:
+            return {}
+        cursor = self.conn.cursor()
+        prepared_statements.execute(cursor, STMT_GET_BY_IDS, (unique_ids,))
+        rows = cursor.fetchall()
+        cursor.close()
         
-        query = """
-            SELECT id, type_code, type_name, description, 
-                   default_workflow, is_active, sort_order, 
-                   created_at, updated_at
-            FROM contract_types
-            WHERE id = %s
+        return {t.id: t for t in _map_rows(rows)}
+    
+    def get_version(self) -> Optional[TableVersion]:
         """
+        获取表版本号
         
-        cursor.execute(query, (id,))
+        Returns:
+            TableVersion，未执行 003_table_versions.sql 时版本行不存在，返回 None
+        """
+        cursor = self.conn.cursor()
+        prepared_statements.execute(cursor, STMT_VERSION)
         row = cursor.fetchone()
         cursor.close()
         
-        return ContractType.from_db_row(row) if row else None
+        return TableVersion(*row) if row else None
     
     def create(self, contract_type: ContractType) -> ContractType:
         """
@@ -204,23 +863,7 @@ class ContractTypeDAO:
             创建后的合同类型对象（包含ID）
         """
         cursor = self.conn.cursor()
-        
-        query = """
-            INSERT INTO contract_types 
-            (type_code, type_name, description, default_workflow, 
-             is_active, sort_order)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            RETURNING id, created_at, updated_at
-        """
-        
-        cursor.execute(query, (
-            contract_type.type_code,
-            contract_type.type_name,
-            contract_type.description,
-            contract_type.default_workflow,
-            contract_type.is_active,
-            contract_type.sort_order,
-        ))
+        prepared_statements.execute(cursor, STMT_INSERT, _insert_params(contract_type))
         
         id, created_at, updated_at = cursor.fetchone()
         
@@ -233,6 +876,8 @@ class ContractTypeDAO:
         contract_type.created_at = created_at
         contract_type.updated_at = updated_at
         
+        self._changed("create", ids=(id,), codes=(contract_type.type_code,))
+        
         return contract_type
     
     def update(self, contract_type: ContractType) -> bool:
@@ -249,28 +894,7 @@ class ContractTypeDAO:
             raise ValueError("Contract type ID is required for update")
         
         cursor = self.conn.cursor()
-        
-        query = """
-            UPDATE contract_types
-            SET type_code = %s,
-                type_name = %s,
-                description = %s,
-                default_workflow = %s,
-                is_active = %s,
-                sort_order = %s,
-                updated_at = CURRENT_TIMESTAMP
-            WHERE id = %s
-        """
-        
-        cursor.execute(query, (
-            contract_type.type_code,
-            contract_type.type_name,
-            contract_type.description,
-            contract_type.default_workflow,
-            contract_type.is_active,
-            contract_type.sort_order,
-            contract_type.id,
-        ))
+        prepared_statements.execute(cursor, STMT_UPDATE, _update_params(contract_type))
         
         rows_affected = cursor.rowcount
         
@@ -279,8 +903,77 @@ class ContractTypeDAO:
         
         cursor.close()
         
+        if rows_affected:
+            self._changed("update", ids=(contract_type.id,), codes=(contract_type.type_code,))
+        
         return rows_affected > 0
     
+    def create_if_absent(self, contract_type: ContractType) -> Optional[ContractType]:
+        """
+        创建合同类型；type_code 已存在时不写入
+        
+        INSERT ... ON CONFLICT DO NOTHING 一次往返完成检查和写入，
+        并发创建同一代码时只有一个成功，不需要先查询。
+        
+        Args:
+            contract_type: 合同类型对象
+            
+        Returns:
+            填充了 ID 和时间戳的同一对象；已存在时返回 None
+        """
+        cursor = self.conn.cursor()
+        prepared_statements.execute(cursor, STMT_INSERT_IF_ABSENT, _insert_params(contract_type))
+        row = cursor.fetchone()
+        
+        if self.auto_commit:
+            self.conn.commit()
+        
+        cursor.close()
+        
+        if row is None:
+            return None
+        
+        contract_type.id, contract_type.created_at, contract_type.updated_at = row
+        self._changed("create", ids=(contract_type.id,), codes=(contract_type.type_code,))
+        
+        return contract_type
+    
+    def patch(self, id: int, changes: dict) -> Optional[ContractType]:
+        """
+        部分更新合同类型（只写 changes 中的列）
+        
+        Args:
+            id: 合同类型ID
+            changes: {列名: 新值}，列名见 PATCHABLE_COLUMNS
+            
+        Returns:
+            更新后的合同类型（RETURNING，无需再查询）；不存在返回 None
+        """
+        return self._patch('id', id, changes)
+    
+    def patch_by_code(self, type_code: str, changes: dict) -> Optional[ContractType]:
+        """按类型代码部分更新（参数见 patch）"""
+        return self._patch('type_code', type_code, changes)
+    
+    def _patch(self, key_column: str, key, changes: dict) -> Optional[ContractType]:
+        query, params = _patch_query(key_column, key, changes)
+        cursor = self.conn.cursor()
+        cursor.execute(query, params)
+        row = cursor.fetchone()
+        
+        if self.auto_commit:
+            self.conn.commit()
+        
+        cursor.close()
+        
+        if row is None:
+            return None
+        
+        old_code, updated = row[0], ContractType.from_db_row(row[1:])
+        self._changed("update", ids=(updated.id,), codes=tuple(dict.fromkeys((old_code, updated.type_code))))
+        
+        return updated
+    
     def delete(self, id: int) -> bool:
         """
         删除合同类型（物理删除）
@@ -292,9 +985,7 @@ class ContractTypeDAO:
             是否删除成功
         """
         cursor = self.conn.cursor()
-        
-        query = "DELETE FROM contract_types WHERE id = %s"
-        cursor.execute(query, (id,))
+        prepared_statements.execute(cursor, STMT_DELETE, (id,))
         
         rows_affected = cursor.rowcount
         
@@ -303,6 +994,9 @@ class ContractTypeDAO:
         
         cursor.close()
         
+        if rows_affected:
+            self._changed("delete", ids=(id,))
+        
         return rows_affected > 0
     
     def deactivate(self, id: int) -> bool:
@@ -316,23 +1010,471 @@ class ContractTypeDAO:
             是否操作成功
         """
         cursor = self.conn.cursor()
+        prepared_statements.execute(cursor, STMT_DEACTIVATE, (id,))
+        rows_affected = cursor.rowcount
         
-        query = """
-            UPDATE contract_types
-            SET is_active = FALSE,
-                updated_at = CURRENT_TIMESTAMP
-            WHERE id = %s
+        if self.auto_commit:
+            self.conn.commit()
+        
+        cursor.close()
+        
+        if rows_affected:
+            self._changed("deactivate", ids=(id,))
+        
+        return rows_affected > 0
+    
+    def deactivate_by_code(self, type_code: str) -> Optional[ContractType]:
         """
+        按类型代码停用合同类型（软删除）
         
-        cursor.execute(query, (id,))
-        rows_affected = cursor.rowcount
+        Returns:
+            停用后的合同类型（RETURNING）；不存在返回 None
+        """
+        cursor = self.conn.cursor()
+        prepared_statements.execute(cursor, STMT_DEACTIVATE_BY_CODE, (type_code,))
+        row = cursor.fetchone()
         
         if self.auto_commit:
             self.conn.commit()
         
         cursor.close()
         
+        if row is None:
+            return None
+        
+        deactivated = ContractType.from_db_row(row)
+        self._changed("deactivate", ids=(deactivated.id,), codes=(type_code,))
+        
+        return deactivated
+
+    
+    # ============================================
+    # 批量写入
+    # ============================================
+    def create_many(self, contract_types: list[ContractType]) -> list[ContractType]:
+        """
+        批量创建合同类型
+        
+        少量数据使用多行 VALUES（每 DB_BULK_PAGE_SIZE 行一条语句），
+        超过 DB_BULK_COPY_THRESHOLD 行时改用 COPY 写入临时表后一次性插入。
+        
+        Args:
+            contract_types: 合同类型列表（type_code 不能重复）
+            
+        Returns:
+            同一批对象（按输入顺序），已填充 ID 和时间戳
+        """
+        if not contract_types:
+            return []
+        
+        rows = [_bulk_row(i, t) for i, t in enumerate(contract_types)]
+        returned = self._bulk_write(BULK_INSERT_SQL, rows, "INSERT")
+        
+        self._changed("create", ids=tuple(r[0] for r in returned), codes=tuple(r[1] for r in returned))
+        
+        return self._apply_returned(contract_types, returned)
+    
+    def upsert_many(self, contract_types: list[ContractType]) -> list[ContractType]:
+        """
+        批量插入或更新（按 type_code 冲突时更新其余字段）
+        
+        Args:
+            contract_types: 合同类型列表（type_code 不能重复）
+            
+        Returns:
+            同一批对象（按输入顺序），已填充 ID 和时间戳
+        """
+        if not contract_types:
+            return []
+        
+        rows = [_bulk_row(i, t) for i, t in enumerate(contract_types)]
+        returned = self._bulk_write(BULK_UPSERT_SQL, rows, "UPSERT")
+        
+        self._changed("upsert", ids=tuple(r[0] for r in returned), codes=tuple(r[1] for r in returned))
+        
+        return self._apply_returned(contract_types, returned)
+    
+    def update_many(self, contract_types: list[ContractType]) -> list[bool]:
+        """
+        批量更新合同类型（按 ID 匹配）
+        
+        Args:
+            contract_types: 合同类型列表（必须都包含ID）
+            
+        Returns:
+            按输入顺序的更新结果；成功更新的对象会刷新 updated_at
+        """
+        if not contract_types:
+            return []
+        if any(not t.id for t in contract_types):
+            raise ValueError("Contract type ID is required for update")
+        
+        rows = [_bulk_row(t.id, t) for t in contract_types]
+        returned = self._bulk_write(BULK_UPDATE_SQL, rows, "UPDATE")
+        
+        if returned:
+            self._changed("update", ids=tuple(r[0] for r in returned),
+                          codes=tuple(t.type_code for t in contract_types))
+        
+        by_id = {id: (created_at, updated_at) for id, created_at, updated_at in returned}
+        results = []
+        for contract_type in contract_types:
+            timestamps = by_id.get(contract_type.id)
+            if timestamps:
+                contract_type.created_at, contract_type.updated_at = timestamps
+            results.append(timestamps is not None)
+        
+        return results
+    
+    def _bulk_write(self, sql: str, rows: list[tuple], operation: str) -> list[tuple]:
+        """执行批量语句并返回 RETURNING 结果（自动选择 VALUES 或 COPY）"""
+        if operation != "UPDATE":
+            codes = [row[1] for row in rows]
+            if len(set(codes)) != len(codes):
+                raise ValueError("Duplicate type_code in bulk input")
+        
+        cursor = self.conn.cursor()
+        
+        if len(rows) >= Config.DB_BULK_COPY_THRESHOLD:
+            self._copy_to_stage(cursor, rows)
+            # 把 VALUES 换成临时表，其余语句不变
+            staged_sql = sql.replace("(VALUES %s)", f"(SELECT * FROM {_STAGE_TABLE})")
+            cursor.execute(staged_sql)
+            returned = cursor.fetchall()
+        else:
+            returned = execute_values(
+                cursor, sql, rows,
+                template=_BULK_ROW_TEMPLATE,
+                page_size=Config.DB_BULK_PAGE_SIZE,
+                fetch=True,
+            )
+        
+        if self.auto_commit:
+            self.conn.commit()
+        
+        cursor.close()
+        
+        return returned
+    
+    @staticmethod
+    def _copy_to_stage(cursor, rows: list[tuple]) -> None:
+        """通过 COPY 把数据写入临时表"""
+        cursor.execute(_CREATE_STAGE_SQL)
+        cursor.execute(f"TRUNCATE {_STAGE_TABLE}")
+        
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write('\t'.join(_copy_text_value(v) for v in row))
+            buffer.write('\n')
+        buffer.seek(0)
+        
+        cursor.copy_expert(_COPY_STAGE_SQL, buffer)
+    
+    @staticmethod
+    def _apply_returned(contract_types: list[ContractType], returned: list[tuple]) -> list[ContractType]:
+        """按 type_code 把 RETURNING 结果回填到输入对象（不依赖返回顺序）"""
+        by_code = {code: (id, created_at, updated_at) for id, code, created_at, updated_at in returned}
+        for contract_type in contract_types:
+            contract_type.id, contract_type.created_at, contract_type.updated_at = by_code[contract_type.type_code]
+        return contract_types
+
+
+@instrument_methods(db_query_duration, phase=PHASE_DB)
+class AsyncContractTypeDAO:
+    """
+    合同类型数据访问对象（异步版本）
+    基于 psycopg 3 的 AsyncConnection，方法与 ContractTypeDAO 一一对应
+    """
+    
+    def __init__(self, db_connection, auto_commit: bool = True):
+        """
+        初始化 DAO
+        
+        Args:
+            db_connection: psycopg AsyncConnection 对象
+            auto_commit: 是否自动提交事务（由上下文管理器控制时设为 False）
+        """
+        self.conn = db_connection
+        self.auto_commit = auto_commit
+    
+    def _changed(self, op: str, **keys) -> None:
+        """通知变更（auto_commit=False 时等外层事务提交后再通知）"""
+        _publish_change(self.conn, self.auto_commit, ContractTypeChange(op, **keys))
+    
+    async def get_all(self, active_only: bool = True) -> list[ContractType]:
+        """获取所有合同类型"""
+        async with self.conn.cursor() as cursor:
+            await prepared_statements.aexecute(cursor, _get_all_stmt(active_only))
+            rows = await cursor.fetchall()
+        
+        return _map_rows(rows)
+    
+    async def get_page(
+        self,
+        limit: int = 50,
+        after: Optional[tuple] = None,
+        workflow: Optional[str] = None,
+        active: Optional[bool] = None,
+        name_prefix: Optional[str] = None,
+        fields: Optional[tuple] = None,
+    ) -> ContractTypePage:
+        """键集分页查询（参数见 ContractTypeDAO.get_page）"""
+        query, params, columns = _page_query(limit, after, workflow, active, name_prefix, fields)
+        async with self.conn.cursor() as cursor:
+            await cursor.execute(query, params)
+            rows = await cursor.fetchall()
+        
+        return _build_page(rows, columns, limit, fields)
+    
+    async def get_all_records(self, active_only: bool = True) -> list[ContractTypeRecord]:
+        """获取所有合同类型的只读记录"""
+        async with self.conn.cursor() as cursor:
+            await prepared_statements.aexecute(cursor, _get_all_stmt(active_only))
+            rows = await cursor.fetchall()
+        
+        return _map_rows(rows, ContractTypeRecord)
+    
+    async def iter_batches(
+        self, active_only: bool = False, batch_size: Optional[int] = None
+    ) -> AsyncIterator[list[ContractType]]:
+        """通过服务端游标分批读取合同类型（参数见 ContractTypeDAO.iter_batches）"""
+        async for rows in astream_batches(self.conn, _get_all_sql(active_only), batch_size=batch_size):
+            yield _map_rows(rows)
+    
+    async def get_by_code(self, type_code: str) -> Optional[ContractType]:
+        """根据类型代码获取合同类型，不存在返回 None"""
+        async with self.conn.cursor() as cursor:
+            await prepared_statements.aexecute(cursor, STMT_GET_BY_CODE, (type_code,))
+            row = await cursor.fetchone()
+        
+        return ContractType.from_db_row(row) if row else None
+    
+    async def get_by_id(self, id: int) -> Optional[ContractType]:
+        """根据ID获取合同类型，不存在返回 None"""
+        async with self.conn.cursor() as cursor:
+            await prepared_statements.aexecute(cursor, STMT_GET_BY_ID, (id,))
+            row = await cursor.fetchone()
+        
+        return ContractType.from_db_row(row) if row else None
+    
+    async def get_by_codes(self, type_codes: Iterable[str]) -> dict[str, ContractType]:
+        """批量按类型代码获取，返回 {type_code: 合同类型}"""
+        codes = list(dict.fromkeys(type_codes))
+        if not codes:
+            return {}
+        async with self.conn.cursor() as cursor:
+            await prepared_statements.aexecute(cursor, STMT_GET_BY_CODES, (codes,))
+            rows = await cursor.fetchall()
+        
+        return {t.type_code: t for t in _map_rows(rows)}
+    
+    async def get_by_ids(self, ids: Iterable[int]) -> dict[int, ContractType]:
+        """批量按ID获取，返回 {id: 合同类型}"""
+        unique_ids = list(dict.fromkeys(ids))
+        if not unique_ids:
+            return {}
+        async with self.conn.cursor() as cursor:
+            await prepared_statements.aexecute(cursor, STMT_GET_BY_IDS, (unique_ids,))
+            rows = await cursor.fetchall()
+        
+        return {t.id: t for t in _map_rows(rows)}
+    
+    async def get_version(self) -> Optional[TableVersion]:
+        """获取表版本号，版本行不存在返回 None"""
+        async with self.conn.cursor() as cursor:
+            await prepared_statements.aexecute(cursor, STMT_VERSION)
+            row = await cursor.fetchone()
+        
+        return TableVersion(*row) if row else None
+    
+    async def create(self, contract_type: ContractType) -> ContractType:
+        """创建新的合同类型，返回包含ID的对象"""
+        async with self.conn.cursor() as cursor:
+            await prepared_statements.aexecute(cursor, STMT_INSERT, _insert_params(contract_type))
+            id, created_at, updated_at = await cursor.fetchone()
+        
+        if self.auto_commit:
+            await self.conn.commit()
+        
+        contract_type.id = id
+        contract_type.created_at = created_at
+        contract_type.updated_at = updated_at
+        
+        self._changed("create", ids=(id,), codes=(contract_type.type_code,))
+        
+        return contract_type
+    
+    async def update(self, contract_type: ContractType) -> bool:
+        """更新合同类型（必须包含ID），返回是否更新成功"""
+        if not contract_type.id:
+            raise ValueError("Contract type ID is required for update")
+        
+        async with self.conn.cursor() as cursor:
+            await prepared_statements.aexecute(cursor, STMT_UPDATE, _update_params(contract_type))
+            rows_affected = cursor.rowcount
+        
+        if self.auto_commit:
+            await self.conn.commit()
+        
+        if rows_affected:
+            self._changed("update", ids=(contract_type.id,), codes=(contract_type.type_code,))
+        
+        return rows_affected > 0
+    
+    async def create_if_absent(self, contract_type: ContractType) -> Optional[ContractType]:
+        """创建合同类型；type_code 已存在时不写入并返回 None（见 ContractTypeDAO.create_if_absent）"""
+        async with self.conn.cursor() as cursor:
+            await prepared_statements.aexecute(cursor, STMT_INSERT_IF_ABSENT, _insert_params(contract_type))
+            row = await cursor.fetchone()
+        
+        if self.auto_commit:
+            await self.conn.commit()
+        
+        if row is None:
+            return None
+        
+        contract_type.id, contract_type.created_at, contract_type.updated_at = row
+        self._changed("create", ids=(contract_type.id,), codes=(contract_type.type_code,))
+        
+        return contract_type
+    
+    async def patch(self, id: int, changes: dict) -> Optional[ContractType]:
+        """部分更新合同类型，返回更新后的对象；不存在返回 None"""
+        return await self._patch('id', id, changes)
+    
+    async def patch_by_code(self, type_code: str, changes: dict) -> Optional[ContractType]:
+        """按类型代码部分更新，返回更新后的对象；不存在返回 None"""
+        return await self._patch('type_code', type_code, changes)
+    
+    async def _patch(self, key_column: str, key, changes: dict) -> Optional[ContractType]:
+        query, params = _patch_query(key_column, key, changes)
+        async with self.conn.cursor() as cursor:
+            await cursor.execute(query, params)
+            row = await cursor.fetchone()
+        
+        if self.auto_commit:
+            await self.conn.commit()
+        
+        if row is None:
+            return None
+        
+        old_code, updated = row[0], ContractType.from_db_row(row[1:])
+        self._changed("update", ids=(updated.id,), codes=tuple(dict.fromkeys((old_code, updated.type_code))))
+        
+        return updated
+    
+    async def delete(self, id: int) -> bool:
+        """删除合同类型（物理删除），返回是否删除成功"""
+        async with self.conn.cursor() as cursor:
+            await prepared_statements.aexecute(cursor, STMT_DELETE, (id,))
+            rows_affected = cursor.rowcount
+        
+        if self.auto_commit:
+            await self.conn.commit()
+        
+        if rows_affected:
+            self._changed("delete", ids=(id,))
+        
+        return rows_affected > 0
+    
+    async def deactivate(self, id: int) -> bool:
+        """停用合同类型（软删除），返回是否操作成功"""
+        async with self.conn.cursor() as cursor:
+            await prepared_statements.aexecute(cursor, STMT_DEACTIVATE, (id,))
+            rows_affected = cursor.rowcount
+        
+        if self.auto_commit:
+            await self.conn.commit()
+        
+        if rows_affected:
+            self._changed("deactivate", ids=(id,))
+        
         return rows_affected > 0
+    
+    async def deactivate_by_code(self, type_code: str) -> Optional[ContractType]:
+        """按类型代码停用，返回停用后的对象；不存在返回 None"""
+        async with self.conn.cursor() as cursor:
+            await prepared_statements.aexecute(cursor, STMT_DEACTIVATE_BY_CODE, (type_code,))
+            row = await cursor.fetchone()
+        
+        if self.auto_commit:
+            await self.conn.commit()
+        
+        if row is None:
+            return None
+        
+        deactivated = ContractType.from_db_row(row)
+        self._changed("deactivate", ids=(deactivated.id,), codes=(type_code,))
+        
+        return deactivated
+    
+    # ============================================
+    # 流式导入 / 导出（COPY）
+    # ============================================
+    async def copy_out(self, active_only: bool = False) -> AsyncIterator[ContractType]:
+        """
+        通过 COPY TO STDOUT 逐行读取合同类型（内存占用与总行数无关）
+        
+        Args:
+            active_only: 是否只导出启用的类型
+        """
+        async with self.conn.cursor() as cursor:
+            async with cursor.copy(_export_sql(active_only)) as copy:
+                copy.set_types(_COPY_OUT_TYPES)
+                to_contract_type = mapper_for_width(len(_COPY_OUT_TYPES))
+                async for row in copy.rows():
+                    yield to_contract_type(row)
+    
+    async def copy_out_csv(self, active_only: bool = False) -> AsyncIterator[bytes]:
+        """
+        通过 COPY TO STDOUT 直接读取 CSV（带表头），原样转发数据库输出
+        
+        Args:
+            active_only: 是否只导出启用的类型
+        """
+        async with self.conn.cursor() as cursor:
+            async with cursor.copy(_export_sql(active_only, "WITH (FORMAT csv, HEADER)")) as copy:
+                while data := await copy.read():
+                    yield bytes(data)
+    
+    async def copy_in(self, rows: AsyncIterator[tuple], upsert: bool = False) -> dict:
+        """
+        通过 COPY FROM STDIN 流式写入临时表，再一次性落表
+        
+        Args:
+            rows: 异步产出 (行号, ContractType) 的迭代器
+            upsert: True 时已存在的 type_code 更新；False 时跳过并报告冲突
+            
+        Returns:
+            {"staged": 写入临时表的行数, "written": 落表行数,
+             "conflicts": [(行号, type_code), ...]（仅 upsert=False）}
+        """
+        staged = 0
+        
+        async with self.conn.cursor() as cursor:
+            await cursor.execute(_CREATE_STAGE_SQL)
+            await cursor.execute(f"TRUNCATE {_STAGE_TABLE}")
+            
+            async with cursor.copy(_COPY_STAGE_SQL) as copy:
+                async for line_no, contract_type in rows:
+                    await copy.write_row(_bulk_row(line_no, contract_type))
+                    staged += 1
+            
+            conflicts = []
+            if not upsert:
+                await cursor.execute(_STAGE_CONFLICTS_SQL)
+                conflicts = await cursor.fetchall()
+            
+            await cursor.execute(_STAGE_UPSERT_SQL if upsert else _STAGE_INSERT_SQL)
+            written = cursor.rowcount
+        
+        if self.auto_commit:
+            await self.conn.commit()
+        
+        if written:
+            self._changed("import", everything=True)
+        
+        return {"staged": staged, "written": written, "conflicts": conflicts}
 
 
 # ============================================
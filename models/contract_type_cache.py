@@ -0,0 +1,410 @@
+"""
+合同类型缓存
+Contract Type Read-Through Cache
+
+合同类型是读多写少的字典数据，API 读取时依次查：
+进程内缓存 → Redis 共享缓存（可选）→ 数据库。
+- 单条数据同时按 type_code 和 id 建索引，列表查询的结果也会回填单条索引
+- 写操作提交后通过 DAO 的变更通知失效相关条目（回滚不会失效），
+  并通过 Redis pub/sub 通知其他 worker / 主机
+- 不存在的 type_code 也会缓存（负缓存），避免反复查库
+- 按代码 / ID 的未命中经 BatchLoader 合并：同一轮事件循环中的多个查询只执行
+  一条 = ANY(%s) 语句
+- 同一个键的未命中经 SingleFlight 合并：失效或冷启动后的一批相同请求只查一次库
+- Redis 不可用时跳过共享层，直接查库
+- 直接用 SQL 修改的数据由数据库触发器 NOTIFY（每条语句一条），contract_type_change_feed 收到后精确失效
+"""
+
+import asyncio
+import hashlib
+from datetime import datetime
+from typing import Awaitable, Callable, Hashable, Iterable, Optional
+
+import psycopg
+
+from config import Config
+from models.contract_type import (
+    CHANGE_CHANNEL,
+    AsyncContractTypeDAO,
+    ContractType,
+    ContractTypeChange,
+    TableVersion,
+    add_change_listener,
+)
+from utils.batch_loader import BatchLoader
+from utils.single_flight import SingleFlight
+from utils.cache import MISSING, LocalCache, RedisCache
+from utils.database import NotificationListener, async_db_transaction
+from utils.logger import get_logger
+from utils.metrics import track_cache
+
+logger = get_logger(__name__)
+
+REDIS_NAMESPACE = 'contract_forge:contract_types'
+
+
+def _all_key(active_only: bool) -> tuple:
+    return ('all', active_only)
+
+
+def _code_key(type_code: str) -> tuple:
+    return ('code', type_code)
+
+
+def _id_key(id: int) -> tuple:
+    return ('id', id)
+
+
+_VERSION_KEY = ('version',)
+
+
+def _shared_key(key: tuple) -> str:
+    return ':'.join(str(part) for part in key)
+
+
+# ============================================
+# Redis 中的序列化格式（与 to_dict 一致）
+# ============================================
+def _encode(value):
+    if isinstance(value, TableVersion):
+        return {'version': value.version, 'changed_at': value.changed_at.isoformat()}
+    if isinstance(value, list):
+        return [t.to_dict() for t in value]
+    return value.to_dict() if value is not None else None
+
+
+def _from_dict(data: dict) -> ContractType:
+    data = dict(data)
+    for field in ('created_at', 'updated_at'):
+        if data.get(field):
+            data[field] = datetime.fromisoformat(data[field])
+    return ContractType(**data)
+
+
+def _decode(key: tuple, data):
+    if key == _VERSION_KEY:
+        return TableVersion(data['version'], datetime.fromisoformat(data['changed_at'])) if data else None
+    if key[0] == 'all':
+        return [_from_dict(item) for item in data]
+    return _from_dict(data) if data is not None else None
+
+
+class ContractTypeCache:
+    """
+    合同类型的读穿透缓存
+
+    用法:
+        contract_types = await contract_type_cache.get_all()
+        contract_type = await contract_type_cache.get_by_code('purchase')
+
+    注意：返回的对象由所有请求共享，调用方不要修改。
+    """
+
+    def __init__(self, ttl: float = None, max_size: int = None, shared: Optional[RedisCache] = None):
+        """
+        Args:
+            ttl: 缓存有效期（秒），0 表示关闭缓存，默认读取配置
+            max_size: 最多缓存的条目数，默认读取配置
+            shared: Redis 共享缓存层，None 表示只用进程内缓存
+        """
+        ttl = Config.CONTRACT_TYPE_CACHE_TTL if ttl is None else ttl
+        max_size = Config.CONTRACT_TYPE_CACHE_MAX_SIZE if max_size is None else max_size
+
+        self.enabled = ttl > 0
+        self.shared = shared
+        self._cache = LocalCache(ttl=ttl, max_size=max_size)
+        self._listener: Optional[asyncio.Task] = None
+        # 进行中的失效广播（递增 Redis 版本号）
+        self._pending: set[asyncio.Task] = set()
+        self._feed_connected = False
+        self._versioning_unavailable = False
+        # id → 最近一次看到的 type_code（改名后用来失效旧代码的条目）
+        self._codes_by_id: dict[int, str] = {}
+        # 每次失效递增；查库期间发生过失效则不回填，避免把旧数据写回缓存
+        self._generation = 0
+        # 单条未命中合并为批量查询（跨并发请求）
+        self._code_loader = BatchLoader(self._load_by_codes)
+        self._id_loader = BatchLoader(self._load_by_ids)
+        # 同一个键进行中的未命中加载（Redis + 查库）由并发请求共享
+        self._flights = SingleFlight('contract_types')
+
+    # ============================================
+    # 读取
+    # ============================================
+    async def get_all(self, active_only: bool = True) -> list[ContractType]:
+        """获取所有合同类型（按 sort_order 排序）"""
+        return await self._read_through(
+            _all_key(active_only),
+            lambda: self._load(lambda dao: dao.get_all(active_only)),
+            self._store_list,
+        )
+
+    async def get_by_code(self, type_code: str) -> Optional[ContractType]:
+        """根据类型代码获取"""
+        return await self._read_through(
+            _code_key(type_code),
+            lambda: self._code_loader.load(type_code),
+            lambda key, value: self._store_item(value, key),
+        )
+
+    async def get_by_id(self, id: int) -> Optional[ContractType]:
+        """根据ID获取"""
+        return await self._read_through(
+            _id_key(id),
+            lambda: self._id_loader.load(id),
+            lambda key, value: self._store_item(value, key),
+        )
+
+    async def get_many_by_code(self, type_codes: Iterable[str]) -> dict[str, Optional[ContractType]]:
+        """批量按类型代码获取（未命中的代码合并为一次查询），不存在的代码对应 None"""
+        codes = list(dict.fromkeys(type_codes))
+        values = await asyncio.gather(*(self.get_by_code(code) for code in codes))
+        return dict(zip(codes, values))
+
+    async def get_many_by_id(self, ids: Iterable[int]) -> dict[int, Optional[ContractType]]:
+        """批量按ID获取（未命中的ID合并为一次查询），不存在的ID对应 None"""
+        unique_ids = list(dict.fromkeys(ids))
+        values = await asyncio.gather(*(self.get_by_id(id) for id in unique_ids))
+        return dict(zip(unique_ids, values))
+
+    async def get_version(self) -> Optional[TableVersion]:
+        """
+        获取表版本号（用于 ETag / Last-Modified）
+        
+        未执行 database/003_table_versions.sql 时返回 None（调用方不做条件请求处理）。
+        """
+        if self._versioning_unavailable:
+            return None
+        try:
+            return await self._read_through(
+                _VERSION_KEY,
+                lambda: self._load(lambda dao: dao.get_version()),
+                self._cache.set,
+            )
+        except psycopg.errors.UndefinedTable:
+            logger.warning(
+                "table_versions not found, conditional GET disabled "
+                "(run database/003_table_versions.sql)"
+            )
+            self._versioning_unavailable = True
+            return None
+
+    async def _read_through(
+        self,
+        key: Hashable,
+        load: Callable[[], Awaitable],
+        store: Callable[[Hashable, object], None],
+    ):
+        if not self.enabled:
+            return await self._flights.do((self._generation, key), load)
+
+        value = self._cache.get(key)
+        if value is not MISSING:
+            return value
+
+        # 键带上失效版本号：失效之后到达的请求不会等待失效之前开始的加载
+        return await self._flights.do(
+            (self._generation, key), lambda: self._fill(key, load, store),
+        )
+
+    async def _fill(
+        self,
+        key: Hashable,
+        load: Callable[[], Awaitable],
+        store: Callable[[Hashable, object], None],
+    ):
+        """未命中时依次读 Redis 共享层、查库，并回填缓存"""
+        value = MISSING
+        generation = self._generation
+        shared_generation = self.shared.generation if self.shared else None
+        # 本 worker 的失效广播还没递增 Redis 版本号时，共享层里仍是旧版本的数据
+        # （自己发出的广播不会再通知本地），这段时间跳过共享层直接查库
+        shared = self.shared if not self._pending else None
+
+        if shared:
+            data = await shared.get(_shared_key(key))
+            if data is not MISSING:
+                value = _decode(key, data)
+
+        if value is MISSING:
+            value = await load()
+            if shared:
+                # 用查库前的版本号写入，期间有写入时这份数据写在旧版本下，不会被读到
+                await shared.set(_shared_key(key), _encode(value), generation=shared_generation)
+
+        if generation == self._generation:
+            store(key, value)
+        return value
+
+    async def _load(self, query: Callable[[AsyncContractTypeDAO], Awaitable]):
+        """未命中时才借连接查库"""
+        async with async_db_transaction(readonly=True) as conn:
+            return await query(AsyncContractTypeDAO(conn))
+
+    async def _load_by_codes(self, codes: list[str]) -> dict[str, ContractType]:
+        return await self._load(lambda dao: dao.get_by_codes(codes))
+
+    async def _load_by_ids(self, ids: list[int]) -> dict[int, ContractType]:
+        return await self._load(lambda dao: dao.get_by_ids(ids))
+
+    def _store_list(self, key: Hashable, contract_types: list[ContractType]) -> None:
+        self._cache.set(key, contract_types)
+        for contract_type in contract_types:
+            self._store_item(contract_type)
+
+    def _store_item(self, contract_type: Optional[ContractType], key: Hashable = None) -> None:
+        if contract_type is None:
+            self._cache.set(key, None)  # 负缓存
+            return
+        self._cache.set(_code_key(contract_type.type_code), contract_type)
+        if contract_type.id is not None:
+            self._cache.set(_id_key(contract_type.id), contract_type)
+            self._codes_by_id[contract_type.id] = contract_type.type_code
+
+    # ============================================
+    # 失效
+    # ============================================
+    def invalidate(self, change: ContractTypeChange) -> None:
+        """按变更失效相关条目并通知其他 worker（作为 DAO 变更监听者注册）"""
+        self._invalidate_local(change.op, change.ids, change.codes, change.everything)
+        if self.shared:
+            self._broadcast(self._message(change))
+
+    @staticmethod
+    def _message(change: ContractTypeChange) -> dict:
+        return {
+            'op': change.op,
+            'ids': list(change.ids),
+            'codes': list(change.codes),
+            'everything': change.everything,
+        }
+
+    def apply_notification(self, payload: str) -> None:
+        """
+        处理数据库触发器的变更通知
+        
+        每个 worker 都会收到同一条通知，各自失效进程内缓存；
+        Redis 层只由第一个认领该通知的 worker 递增版本号并广播。
+        """
+        change = ContractTypeChange.from_notification(payload)
+        self._invalidate_local(change.op, change.ids, change.codes, change.everything)
+        if self.shared:
+            claim = None
+            if change.txid is not None:
+                # 一条批量语句的 ids 可能很长，认领键只保存摘要
+                ids = hashlib.blake2b(','.join(map(str, change.ids)).encode(), digest_size=8).hexdigest()
+                claim = f"notify:{change.txid}:{change.op}:{ids}"
+            self._broadcast(self._message(change), claim)
+
+    def resync(self) -> None:
+        """
+        变更通知（重新）连接成功后调用
+        
+        断线期间可能错过了通知，清空进程内缓存；重连（而非首次连接）时
+        同时递增 Redis 版本号，让其他 worker 也丢弃可能过期的数据。
+        """
+        if self._feed_connected:
+            self.invalidate(ContractTypeChange('resync', everything=True))
+        else:
+            self.clear()
+        self._feed_connected = True
+
+    def _on_remote_invalidation(self, message: dict) -> None:
+        """收到其他 worker 的失效消息（共享层已由对方递增版本号）"""
+        self._invalidate_local(
+            message.get('op', 'remote'),
+            message.get('ids', ()),
+            message.get('codes', ()),
+            message.get('everything', False),
+        )
+
+    def _invalidate_local(self, op: str, ids, codes, everything: bool) -> None:
+        self._generation += 1
+
+        if everything:
+            self.clear()
+            return
+
+        keys = [_all_key(True), _all_key(False), _VERSION_KEY]
+        for id in ids:
+            keys.append(_id_key(id))
+            old_code = self._codes_by_id.pop(id, None)
+            if old_code is not None:
+                keys.append(_code_key(old_code))
+        for type_code in codes:
+            keys.append(_code_key(type_code))
+
+        removed = self._cache.delete(*keys)
+        logger.debug("Contract type cache invalidated: op=%s removed=%d", op, removed)
+
+    def _broadcast(self, message: dict, claim: Optional[str] = None) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.shared.invalidate_sync(message)  # 脚本中的同步 DAO
+            return
+        if claim is not None:
+            task = loop.create_task(self.shared.invalidate_once(claim, message))
+        else:
+            task = loop.create_task(self.shared.invalidate(message))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    def clear(self) -> None:
+        """清空进程内缓存"""
+        self._generation += 1
+        self._cache.clear()
+        self._codes_by_id.clear()
+
+    # ============================================
+    # 生命周期
+    # ============================================
+    async def start(self) -> None:
+        """启动失效频道的订阅（应用启动时调用）"""
+        if self.shared and self._listener is None:
+            self._listener = asyncio.create_task(
+                self.shared.listen(self._on_remote_invalidation),
+                name="contract-type-cache-invalidation",
+            )
+
+    async def stop(self) -> None:
+        """停止订阅，等待未完成的失效广播（应用关闭时调用）"""
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    def stats(self) -> dict:
+        """命中 / 未命中 / 淘汰统计"""
+        return {
+            'enabled': self.enabled,
+            **self._cache.stats(),
+            'batch_loads': {
+                'code': self._code_loader.stats(),
+                'id': self._id_loader.stats(),
+            },
+            'single_flight': self._flights.stats(),
+            'shared': self.shared.stats() if self.shared else None,
+        }
+
+
+# 全局缓存实例，写操作提交后自动失效
+contract_type_cache = ContractTypeCache(
+    shared=RedisCache(REDIS_NAMESPACE, Config.CONTRACT_TYPE_REDIS_TTL)
+    if Config.REDIS_CACHE_ENABLED else None,
+)
+add_change_listener(contract_type_cache.invalidate)
+track_cache('contract_types', contract_type_cache.stats)
+track_cache('contract_types_redis', lambda: contract_type_cache.stats()['shared'])
+
+# 数据库触发器的变更通知（在 main.py 的 lifespan 中启动）
+contract_type_change_feed = NotificationListener(
+    CHANGE_CHANNEL,
+    contract_type_cache.apply_notification,
+    on_connect=contract_type_cache.resync,
+)
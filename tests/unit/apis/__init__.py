@@ -0,0 +1,3 @@
+"""
+API 层单元测试
+"""
@@ -0,0 +1,86 @@
+"""
+合同类型条件请求测试
+Test Conditional GET on Contract Type Endpoints
+"""
+
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from apis import contract_type as contract_type_api
+from models.contract_type import ContractType, TableVersion
+
+
+class FakeCache:
+    """替代 contract_type_cache，记录数据查询次数"""
+    
+    def __init__(self, version):
+        self.version = version
+        self.queries = 0
+        self.rows = [ContractType(id=1, type_code='SALES', type_name='销售合同')]
+    
+    async def get_version(self):
+        return self.version
+    
+    async def get_all(self):
+        self.queries += 1
+        return self.rows
+    
+    async def get_by_code(self, type_code):
+        self.queries += 1
+        return next((t for t in self.rows if t.type_code == type_code), None)
+
+
+@pytest.fixture
+def fake_cache(monkeypatch):
+    cache = FakeCache(TableVersion(7, datetime(2025, 12, 4, 8, 30, tzinfo=timezone.utc)))
+    monkeypatch.setattr(contract_type_api, 'contract_type_cache', cache)
+    return cache
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(contract_type_api.router, prefix="/api")
+    return TestClient(app)
+
+
+class TestConditionalGet:
+    """测试 /all 和 /{type_code} 的 304"""
+    
+    def test_etag_returned(self, client, fake_cache):
+        """测试 200 响应带 ETag / Last-Modified"""
+        response = client.get("/api/contract-type/all")
+        
+        assert response.status_code == 200
+        assert response.headers['etag'] == '"contract-types-7"'
+        assert response.headers['last-modified'] == 'Thu, 04 Dec 2025 08:30:00 GMT'
+    
+    def test_not_modified_skips_query(self, client, fake_cache):
+        """测试 ETag 未变化时返回 304 且不查询数据"""
+        for path in ("/api/contract-type/all", "/api/contract-type/SALES"):
+            response = client.get(path, headers={"If-None-Match": '"contract-types-7"'})
+            
+            assert response.status_code == 304
+            assert response.content == b""
+            assert response.headers['etag'] == '"contract-types-7"'
+        
+        assert fake_cache.queries == 0
+    
+    def test_modified(self, client, fake_cache):
+        """测试版本号变化后返回完整数据"""
+        response = client.get("/api/contract-type/SALES", headers={"If-None-Match": '"contract-types-6"'})
+        
+        assert response.status_code == 200
+        assert response.json()['data']['type_code'] == 'SALES'
+    
+    def test_without_version_table(self, client, fake_cache):
+        """测试版本号不可用时不做条件请求处理"""
+        fake_cache.version = None
+        
+        response = client.get("/api/contract-type/all", headers={"If-None-Match": '*'})
+        
+        assert response.status_code == 200
+        assert 'etag' not in response.headers
@@ -0,0 +1,190 @@
+"""
+合同类型导入解析测试
+Test Contract Type Import Parsing
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+
+from apis import contract_type as contract_type_api
+from apis.contract_type import (
+    ContractTypeCreate,
+    _iter_csv_records,
+    _iter_lines,
+    _iter_ndjson_records,
+    _iter_spool,
+    _parse_import_record,
+    _spool_upload,
+)
+
+
+async def _chunks(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+def parse(parser, *parts: bytes) -> list:
+    """把字节块依次送入解析器，收集所有 (行号, 记录)"""
+    async def collect():
+        return [item async for item in parser(_iter_lines(_chunks(*parts)))]
+    return asyncio.run(collect())
+
+
+class TestIterLines:
+    """测试字节流切分"""
+
+    def test_split_across_chunks(self):
+        """测试跨块的行和多字节字符"""
+        data = "第一行\nsecond\n".encode()
+
+        lines = parse(lambda lines: lines, data[:4], data[4:10], data[10:])
+
+        assert lines == ["第一行", "second"]
+
+    def test_last_line_without_newline(self):
+        """测试最后一行没有换行符"""
+        assert parse(lambda lines: lines, b"a\nb") == ["a", "b"]
+
+
+class TestNdjsonRecords:
+    """测试 NDJSON 解析"""
+
+    def test_records_and_errors(self):
+        """测试合法行、空行和非法行"""
+        records = parse(
+            _iter_ndjson_records,
+            b'{"type_code": "A", "type_name": "a"}\n\n[1]\nnot json\n',
+        )
+
+        assert records[0] == (1, {"type_code": "A", "type_name": "a"})
+        assert records[1] == (3, "Each line must be a JSON object")
+        assert records[2][0] == 4
+        assert records[2][1].startswith("Invalid JSON")
+
+
+class TestCsvRecords:
+    """测试 CSV 解析"""
+
+    def test_header_and_rows(self):
+        """测试表头映射和空值忽略"""
+        records = parse(
+            _iter_csv_records,
+            b"type_code,type_name,description\r\nA,a,\r\nB,b,desc\r\n",
+        )
+
+        assert records == [
+            (2, {"type_code": "A", "type_name": "a"}),
+            (3, {"type_code": "B", "type_name": "b", "description": "desc"}),
+        ]
+
+    def test_quoted_newline(self):
+        """测试引号内的换行"""
+        records = parse(
+            _iter_csv_records,
+            b'type_code,type_name,description\nA,a,"line1\nline2"\nB,b,x\n',
+        )
+
+        assert records[0] == (2, {"type_code": "A", "type_name": "a", "description": "line1\nline2"})
+        assert records[1][0] == 4
+
+    def test_column_count_mismatch(self):
+        """测试列数不一致"""
+        records = parse(_iter_csv_records, b"type_code,type_name\nA\n")
+
+        assert records == [(2, "Expected 2 columns, got 1")]
+
+
+class TestParseImportRecord:
+    """测试单行校验"""
+
+    def test_coerces_csv_strings(self):
+        """测试 CSV 字符串转换为布尔和整数"""
+        ct = _parse_import_record({
+            "id": "7", "type_code": "A", "type_name": "a", "is_active": "false", "sort_order": "3",
+        })
+
+        assert ct.id is None  # 导入时忽略 id
+        assert ct.is_active is False
+        assert ct.sort_order == 3
+
+    def test_default_workflow_matches_create(self):
+        """测试未提供工作流（或 CSV 中为空）时与单条创建接口使用相同的默认值"""
+        ct = _parse_import_record({"type_code": "A", "type_name": "a"})
+
+        assert ct.default_workflow == ContractTypeCreate.model_fields['default_workflow'].default
+        assert ct.default_workflow == "standard_contract_processing"
+
+    def test_missing_required(self):
+        """测试缺少必填字段"""
+        with pytest.raises(ValidationError):
+            _parse_import_record({"type_code": "A"})
+
+
+class FakeRequest:
+    """只模拟 headers 和 stream()；delay 为每块之间的间隔（秒）"""
+
+    def __init__(self, *parts: bytes, headers=None, delay: float = 0):
+        self.parts = parts
+        self.headers = headers or {}
+        self.delay = delay
+
+    async def stream(self):
+        for part in self.parts:
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield part
+
+
+class TestSpoolUpload:
+    """测试请求体先落地再导入（大小上限和读取时限）"""
+
+    def test_round_trip(self):
+        """测试读入临时文件后按块原样读出"""
+        async def scenario():
+            spool = await _spool_upload(FakeRequest(b"a\n", b"b\n"), max_bytes=100, timeout=1)
+            return b"".join([chunk async for chunk in _iter_spool(spool)])
+
+        assert asyncio.run(scenario()) == b"a\nb\n"
+
+    def test_too_large(self):
+        """测试超过上限返回 413（按实际读取的字节数，也按 Content-Length 提前拒绝）"""
+        for request in (
+            FakeRequest(b"x" * 60, b"x" * 60),
+            FakeRequest(headers={"content-length": "1000"}),
+        ):
+            with pytest.raises(HTTPException) as exc_info:
+                asyncio.run(_spool_upload(request, max_bytes=100, timeout=1))
+            assert exc_info.value.status_code == 413
+
+    def test_slow_upload(self):
+        """测试时限内没有读完返回 408"""
+        with pytest.raises(HTTPException) as exc_info:
+            asyncio.run(_spool_upload(FakeRequest(b"a", b"b", delay=0.05), max_bytes=100, timeout=0.01))
+
+        assert exc_info.value.status_code == 408
+
+    def test_no_transaction_for_rejected_upload(self, monkeypatch):
+        """测试请求体超过上限时不借连接、不开事务"""
+        opened = []
+
+        @asynccontextmanager
+        async def transaction(readonly=False):
+            opened.append(readonly)
+            yield None
+
+        monkeypatch.setattr(contract_type_api, 'async_db_transaction', transaction)
+        monkeypatch.setattr(contract_type_api.Config, 'IMPORT_MAX_BYTES', 10)
+        app = FastAPI()
+        app.include_router(contract_type_api.router, prefix="/api")
+
+        response = TestClient(app).post(
+            "/api/contract-type/import", content=b'{"type_code": "A", "type_name": "a"}\n',
+        )
+
+        assert response.status_code == 413
+        assert opened == []
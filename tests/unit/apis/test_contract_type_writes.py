@@ -0,0 +1,118 @@
+"""
+合同类型写接口测试
+Test Contract Type Write Endpoints
+"""
+
+from contextlib import asynccontextmanager
+
+import psycopg
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from apis import contract_type as contract_type_api
+from tests.unit.models.test_contract_type import FakeAsyncConnection
+
+ROW = (1, 'SALES', '销售合同', None, 'standard_contract_processing', True, 1, None, None)
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    conn = FakeAsyncConnection()
+    
+    @asynccontextmanager
+    async def transaction(readonly=False):
+        yield conn
+    
+    monkeypatch.setattr(contract_type_api, 'async_db_transaction', transaction)
+    return conn
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(contract_type_api.router, prefix="/api")
+    return TestClient(app)
+
+
+class TestCreate:
+    """测试 ON CONFLICT 创建"""
+    
+    def test_created_in_one_statement(self, client, conn):
+        """测试创建只执行一条 INSERT ... ON CONFLICT"""
+        conn.rows = [(1, None, None)]
+        
+        response = client.post("/api/contract-type/", json={"type_code": "SALES", "type_name": "销售合同"})
+        
+        assert response.status_code == 200
+        assert response.json()['data']['id'] == 1
+        assert len(conn.executed) == 1
+        assert "ON CONFLICT (type_code) DO NOTHING" in conn.executed[0][0]
+    
+    def test_conflict(self, client, conn):
+        """测试代码已存在时返回 400"""
+        response = client.post("/api/contract-type/", json={"type_code": "SALES", "type_name": "销售合同"})
+        
+        assert response.status_code == 400
+        assert "already exists" in response.json()['detail']
+
+
+class TestPatch:
+    """测试部分更新"""
+    
+    def test_only_changed_columns(self, client, conn):
+        """测试只写请求中的字段，并返回 RETURNING 的数据"""
+        conn.rows = [('SALES',) + ROW[:2] + ('新名称',) + ROW[3:]]
+        
+        response = client.patch("/api/contract-type/SALES", json={"type_name": "新名称"})
+        
+        assert response.status_code == 200
+        assert response.json()['data']['type_name'] == '新名称'
+        query, params = conn.executed[0]
+        assert "SET type_name = %s, updated_at" in query
+        assert params == ('新名称', 'SALES')
+        assert len(conn.executed) == 1
+    
+    def test_not_found(self, client, conn):
+        """测试不存在时返回 404"""
+        response = client.patch("/api/contract-type/NOPE", json={"sort_order": 3})
+        
+        assert response.status_code == 404
+    
+    def test_empty_and_null(self, client, conn):
+        """测试空请求返回 400，非空字段传 null 返回 422"""
+        assert client.patch("/api/contract-type/SALES", json={}).status_code == 400
+        assert client.patch("/api/contract-type/SALES", json={"type_name": None}).status_code == 422
+        assert conn.executed == []
+    
+    def test_rename_conflict(self, client, conn, monkeypatch):
+        """测试改成已存在的代码时返回 400"""
+        async def execute(query, params=None, prepare=None):
+            raise psycopg.errors.UniqueViolation("duplicate key")
+        
+        cursor = conn.cursor()
+        cursor.execute = execute
+        monkeypatch.setattr(conn, 'cursor', lambda: cursor)
+        
+        response = client.patch("/api/contract-type/SALES", json={"type_code": "LEASE"})
+        
+        assert response.status_code == 400
+        assert "'LEASE' already exists" in response.json()['detail']
+
+
+class TestDeactivate:
+    """测试停用"""
+    
+    def test_deactivate(self, client, conn):
+        """测试返回停用后的数据"""
+        conn.rows = [ROW[:5] + (False,) + ROW[6:]]
+        
+        response = client.post("/api/contract-type/SALES/deactivate")
+        
+        assert response.status_code == 200
+        assert response.json()['data']['is_active'] is False
+        assert conn.executed[0][1] == ('SALES',)
+    
+    def test_not_found(self, client, conn):
+        """测试不存在时返回 404"""
+        assert client.post("/api/contract-type/NOPE/deactivate").status_code == 404
@@ -3,13 +3,23 @@
 Test Contract Type Model
 """
 
+import asyncio
 import pytest
 from datetime import datetime
+from models import contract_type as contract_type_module
 from models.contract_type import (
+    HOT_STATEMENTS,
+    AsyncContractTypeDAO,
     ContractType,
     ContractTypeDAO,
-    DefaultWorkflow
+    ContractTypeRecord,
+    DefaultWorkflow,
+    _page_query,
+    prepare_hot_statements,
+    row_mapper,
 )
+from tests.unit.utils.test_database import FakeAsyncConnection as FakeDriverConnection
+from utils.database import AsyncDatabasePool, _configure_async_connection, prepared_statements
 
 
 # ============================================
@@ -120,6 +130,82 @@ class TestContractType:
         assert ct.type_code == 'SALES'
         assert ct.type_name == '销售合同'
         assert ct.description is None
+    
+    def test_slots(self):
+        """测试实例没有 __dict__"""
+        ct = ContractType(type_code='SALES', type_name='销售合同')
+        
+        assert not hasattr(ct, '__dict__')
+        with pytest.raises(AttributeError):
+            ct.unknown_field = 1
+
+
+class TestPageQuery:
+    """测试分页查询的构造"""
+    
+    def test_first_page(self):
+        """测试第一页没有游标条件"""
+        query, params, columns = _page_query(20, None, None, None, None, None)
+        
+        assert "WHERE" not in query
+        assert query.endswith("ORDER BY sort_order, type_code LIMIT %s")
+        assert params == [21]
+        assert columns[0] == 'id'
+    
+    def test_filters_and_cursor(self):
+        """测试过滤条件与键集游标"""
+        query, params, _ = _page_query(20, (3, 'SERVICE'), 'quick_approval', True, '服务_', None)
+        
+        assert "is_active = %s AND default_workflow = %s AND type_name LIKE %s" in query
+        assert "(sort_order, type_code) > (%s, %s)" in query
+        assert params == [True, 'quick_approval', '服务\\_%', 3, 'SERVICE', 21]
+
+
+class TestRowMapper:
+    """测试按列布局生成的行映射函数"""
+    
+    ROW = (1, 'SALES', '销售合同', '商品销售合同', 'quick_approval', False, 3,
+           datetime(2025, 12, 4, 10, 0, 0), datetime(2025, 12, 5, 10, 0, 0))
+    
+    def test_mapper_cached_per_layout(self):
+        """测试同一布局只生成一次映射函数"""
+        columns = ('id', 'type_code', 'type_name')
+        
+        assert row_mapper(columns) is row_mapper(columns)
+    
+    def test_full_layout(self):
+        """测试完整查询与 from_db_row 结果一致"""
+        columns = ('id', 'type_code', 'type_name', 'description', 'default_workflow',
+                   'is_active', 'sort_order', 'created_at', 'updated_at')
+        
+        ct = row_mapper(columns)(self.ROW)
+        
+        assert ct == ContractType.from_db_row(self.ROW)
+        assert ct.is_active is False
+        assert ct.updated_at == datetime(2025, 12, 5, 10, 0, 0)
+    
+    def test_reordered_layout(self):
+        """测试列顺序不同、只查询部分列"""
+        mapper = row_mapper(('type_name', 'sort_order', 'type_code'))
+        
+        ct = mapper(('销售合同', 5, 'SALES'))
+        
+        assert (ct.type_code, ct.type_name, ct.sort_order) == ('SALES', '销售合同', 5)
+        assert ct.id is None
+    
+    def test_unknown_column(self):
+        """测试未知列名"""
+        with pytest.raises(ValueError, match="Unknown contract type columns"):
+            row_mapper(('id', 'type_code', 'type_name', 'extra'))
+    
+    def test_record(self):
+        """测试只读记录与 ContractType 的转换结果一致"""
+        record = ContractTypeRecord._make(self.ROW)
+        
+        assert record.to_dict() == ContractType.from_db_row(self.ROW).to_dict()
+        assert record.to_contract_type() == ContractType.from_db_row(self.ROW)
+        with pytest.raises(AttributeError):
+            record.type_name = '新名称'
 
 
 # ============================================
@@ -288,6 +374,70 @@ class TestContractTypeDAO:
         deleted = dao.get_by_id(created_id)
         assert deleted is None
     
+    def test_create_many(self, db_transaction):
+        """测试批量创建（多行 VALUES），按输入顺序回填 ID"""
+        dao = ContractTypeDAO(db_transaction, auto_commit=False)
+        new_types = [
+            ContractType(type_code=f'BULK_TEST_{i}', type_name=f'批量测试 {i}', sort_order=900 + i)
+            for i in range(5)
+        ]
+        
+        created = dao.create_many(new_types)
+        
+        assert [t.type_code for t in created] == [f'BULK_TEST_{i}' for i in range(5)]
+        assert all(t.id is not None and t.created_at is not None for t in created)
+        assert dao.get_by_code('BULK_TEST_3').id == created[3].id
+    
+    def test_create_many_copy_path(self, db_transaction, monkeypatch):
+        """测试超过阈值时走 COPY 路径"""
+        from config import Config
+        monkeypatch.setattr(Config, 'DB_BULK_COPY_THRESHOLD', 2)
+        dao = ContractTypeDAO(db_transaction, auto_commit=False)
+        new_types = [
+            ContractType(type_code=f'COPY_TEST_{i}', type_name=f'含\t特殊\n字符 {i}', description=None)
+            for i in range(3)
+        ]
+        
+        created = dao.create_many(new_types)
+        
+        found = dao.get_by_id(created[1].id)
+        assert found.type_name == '含\t特殊\n字符 1'
+        assert found.description is None
+    
+    def test_upsert_many(self, db_transaction):
+        """测试批量插入或更新"""
+        dao = ContractTypeDAO(db_transaction, auto_commit=False)
+        sales_id = dao.get_by_code('SALES').id
+        
+        result = dao.upsert_many([
+            ContractType(type_code='SALES', type_name='销售合同（更新）'),
+            ContractType(type_code='UPSERT_TEST', type_name='新增'),
+        ])
+        
+        assert result[0].id == sales_id
+        assert dao.get_by_code('SALES').type_name == '销售合同（更新）'
+        assert dao.get_by_code('UPSERT_TEST').id == result[1].id
+    
+    def test_update_many(self, db_transaction):
+        """测试批量更新，不存在的ID返回 False"""
+        dao = ContractTypeDAO(db_transaction, auto_commit=False)
+        sales = dao.get_by_code('SALES')
+        sales.type_name = '批量更新'
+        missing = ContractType(type_code='MISSING', type_name='不存在', id=99999)
+        
+        assert dao.update_many([sales, missing]) == [True, False]
+        assert dao.get_by_id(sales.id).type_name == '批量更新'
+    
+    def test_bulk_duplicate_codes(self):
+        """测试批量输入中 type_code 重复（应该失败）"""
+        dao = ContractTypeDAO(None)  # 校验在访问数据库之前
+        
+        with pytest.raises(ValueError, match="Duplicate type_code"):
+            dao.upsert_many([
+                ContractType(type_code='DUP', type_name='1'),
+                ContractType(type_code='DUP', type_name='2'),
+            ])
+    
     def test_delete_not_exists(self, db_transaction):
         """测试删除不存在的记录"""
         dao = ContractTypeDAO(db_transaction, auto_commit=False)
@@ -297,6 +447,156 @@ class TestContractTypeDAO:
         assert success is False
 
 
+# ============================================
+# AsyncContractTypeDAO 测试（使用假的异步连接）
+# ============================================
+class FakeAsyncCursor:
+    """模拟 psycopg AsyncCursor，按顺序返回预设结果"""
+    
+    def __init__(self, conn):
+        self.conn = conn
+        self.connection = conn
+        self.rowcount = 0
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc):
+        return False
+    
+    async def execute(self, query, params=None, prepare=None):
+        self.conn.executed.append((query, params))
+        self.rowcount = self.conn.rowcount
+    
+    async def fetchone(self):
+        return self.conn.rows[0] if self.conn.rows else None
+    
+    async def fetchall(self):
+        return list(self.conn.rows)
+
+
+class FakeAsyncConnection:
+    prepare_threshold = 5   # 驱动的默认值（None 表示关闭预编译）
+    
+    def __init__(self, rows=(), rowcount=0):
+        self.rows = list(rows)
+        self.rowcount = rowcount
+        self.executed = []
+        self.commits = 0
+    
+    def cursor(self):
+        return FakeAsyncCursor(self)
+    
+    async def commit(self):
+        self.commits += 1
+
+
+class TestAsyncContractTypeDAO:
+    """测试异步 DAO"""
+    
+    def test_get_by_code(self):
+        """测试异步查询返回 ContractType"""
+        conn = FakeAsyncConnection(rows=[(1, 'SALES', '销售合同')])
+        dao = AsyncContractTypeDAO(conn)
+        
+        result = asyncio.run(dao.get_by_code('SALES'))
+        
+        assert result.id == 1
+        assert result.type_code == 'SALES'
+        assert conn.executed[0][1] == ('SALES',)
+    
+    def test_get_by_code_not_exists(self):
+        """测试查询不存在的类型返回 None"""
+        dao = AsyncContractTypeDAO(FakeAsyncConnection())
+        
+        assert asyncio.run(dao.get_by_code('NOT_EXISTS')) is None
+    
+    def test_deactivate_auto_commit(self):
+        """测试 auto_commit=True 时写操作自动提交"""
+        conn = FakeAsyncConnection(rowcount=1)
+        dao = AsyncContractTypeDAO(conn)
+        
+        assert asyncio.run(dao.deactivate(1)) is True
+        assert conn.commits == 1
+    
+    def test_get_page(self):
+        """测试多取一行判断下一页，并返回最后一行的排序键"""
+        conn = FakeAsyncConnection(rows=[
+            (1, 'SALES', '销售合同', None, None, True, 1, None, None),
+            (2, 'LEASE', '租赁合同', None, None, True, 2, None, None),
+            (3, 'NDA', '保密协议', None, None, True, 3, None, None),
+        ])
+        dao = AsyncContractTypeDAO(conn)
+        
+        page = asyncio.run(dao.get_page(limit=2))
+        
+        assert [t.type_code for t in page.items] == ['SALES', 'LEASE']
+        assert page.next_after == (2, 'LEASE')
+        assert conn.executed[0][1] == [3]
+    
+    def test_get_page_sparse_fields(self):
+        """测试稀疏字段只返回请求的字段"""
+        conn = FakeAsyncConnection(rows=[('SALES', '销售合同', 1)])
+        dao = AsyncContractTypeDAO(conn)
+        
+        page = asyncio.run(dao.get_page(limit=2, fields=('type_code', 'type_name')))
+        
+        assert page.items == [{'type_code': 'SALES', 'type_name': '销售合同'}]
+        assert page.next_after is None
+        assert conn.executed[0][0].startswith("SELECT type_code, type_name, sort_order FROM")
+    
+    def test_get_by_codes(self):
+        """测试多个代码去重后用一条 ANY 查询"""
+        conn = FakeAsyncConnection(rows=[
+            (1, 'SALES', '销售合同', None, None, True, 1, None, None),
+            (2, 'LEASE', '租赁合同', None, None, True, 2, None, None),
+        ])
+        dao = AsyncContractTypeDAO(conn)
+        
+        result = asyncio.run(dao.get_by_codes(['SALES', 'LEASE', 'SALES', 'NDA']))
+        
+        assert set(result) == {'SALES', 'LEASE'}
+        assert result['LEASE'].id == 2
+        assert len(conn.executed) == 1
+        assert "= ANY(%s)" in conn.executed[0][0]
+        assert conn.executed[0][1] == (['SALES', 'LEASE', 'NDA'],)
+    
+    def test_get_by_ids_empty(self):
+        """测试空列表不查库"""
+        conn = FakeAsyncConnection()
+        
+        assert asyncio.run(AsyncContractTypeDAO(conn).get_by_ids([])) == {}
+        assert conn.executed == []
+    
+    def test_patch_reports_old_and_new_code(self, monkeypatch):
+        """测试改名时变更通知同时包含旧代码和新代码"""
+        changes = []
+        monkeypatch.setattr(contract_type_module, '_change_listeners', [changes.append])
+        conn = FakeAsyncConnection(rows=[('SALES', 1, 'SALES_V2', '销售合同', None, None, True, 1, None, None)])
+        
+        updated = asyncio.run(AsyncContractTypeDAO(conn).patch(1, {'type_code': 'SALES_V2'}))
+        
+        assert updated.type_code == 'SALES_V2'
+        assert changes[0].codes == ('SALES', 'SALES_V2')
+        assert conn.commits == 1
+    
+    def test_patch_rejects_unknown_fields(self):
+        """测试不可修改的字段和空修改"""
+        dao = AsyncContractTypeDAO(FakeAsyncConnection())
+        
+        with pytest.raises(ValueError, match="Unknown fields: id"):
+            asyncio.run(dao.patch(1, {'id': 2}))
+        with pytest.raises(ValueError, match="No fields to update"):
+            asyncio.run(dao.patch(1, {}))
+    
+    def test_update_without_id(self, sample_contract_type):
+        """测试更新没有ID的对象（应该失败）"""
+        dao = AsyncContractTypeDAO(None)
+        
+        with pytest.raises(ValueError, match="Contract type ID is required"):
+            asyncio.run(dao.update(sample_contract_type))
+
+
 # ============================================
 # 集成测试（完整流程）
 # ============================================
@@ -373,6 +673,59 @@ class TestContractTypeIntegration:
         assert len(active_test_types) == 2  # 只有2个启用的
 
 
+# ============================================
+# 启动预热测试（模拟驱动的预编译缓存）
+# ============================================
+class FakePool:
+    def __init__(self, conns):
+        self.min_size = len(conns)
+        self.idle = list(conns)
+    
+    async def getconn(self, timeout=None):
+        return self.idle.pop()
+    
+    async def putconn(self, conn):
+        self.idle.append(conn)
+
+
+class TestPrepareHotStatements:
+    """测试预热后常用读语句已在每个连接上准备，并被运行时查询复用"""
+    
+    @pytest.fixture
+    def conns(self, monkeypatch):
+        conns = [FakeDriverConnection(), FakeDriverConnection()]
+        for conn in conns:
+            asyncio.run(_configure_async_connection(conn))
+        monkeypatch.setattr(AsyncDatabasePool, '_pool', FakePool(conns))
+        return conns
+    
+    def test_statements_prepared_after_warm_up(self, conns):
+        """测试预热结束后（提交而不是回滚）语句仍在驱动缓存中"""
+        assert asyncio.run(AsyncDatabasePool.warm_up(prepare_hot_statements)) == 2
+        
+        for conn in conns:
+            assert len(conn.prepares) == len(HOT_STATEMENTS)
+            for name, _ in HOT_STATEMENTS:
+                assert prepared_statements.is_prepared(conn, name)
+    
+    def test_runtime_lookups_reuse_warm_statements(self, conns):
+        """测试运行时按 ID / 代码列表 / ID 列表查询时参数类型一致，不再重新准备"""
+        asyncio.run(AsyncDatabasePool.warm_up(prepare_hot_statements))
+        conn = conns[0]
+        dao = AsyncContractTypeDAO(conn)
+        
+        async def lookups():
+            await dao.get_by_id(70000)
+            await dao.get_by_code('SALES')
+            await dao.get_by_codes(['SALES', 'LEASE'])
+            await dao.get_by_ids([1, 70000])
+            await dao.get_all()
+        
+        asyncio.run(lookups())
+        
+        assert len(conn.prepares) == len(HOT_STATEMENTS)
+
+
 # ============================================
 # 性能测试（可选）
 # ============================================
@@ -0,0 +1,430 @@
+"""
+合同类型缓存测试
+Test Contract Type Cache
+"""
+
+import asyncio
+import pytest
+
+from models import contract_type as contract_type_module
+from models.contract_type import AsyncContractTypeDAO, ContractType, ContractTypeChange
+from models.contract_type_cache import REDIS_NAMESPACE, ContractTypeCache
+from tests.unit.models.test_contract_type import FakeAsyncConnection
+from tests.unit.utils.fake_redis import FakeClientProvider, FakeRedis, FakeRedisServer
+from utils import database
+from utils.cache import MISSING, RedisCache
+
+
+class FakeDAO:
+    """按预设数据回答查询，并记录查库次数"""
+    
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+    
+    async def get_all(self, active_only=True):
+        self.queries += 1
+        return [t for t in self.rows if t.is_active or not active_only]
+    
+    async def get_by_code(self, type_code):
+        self.queries += 1
+        return next((t for t in self.rows if t.type_code == type_code), None)
+    
+    async def get_by_id(self, id):
+        self.queries += 1
+        return next((t for t in self.rows if t.id == id), None)
+    
+    async def get_by_codes(self, type_codes):
+        self.queries += 1
+        return {t.type_code: t for t in self.rows if t.type_code in type_codes}
+    
+    async def get_by_ids(self, ids):
+        self.queries += 1
+        return {t.id: t for t in self.rows if t.id in ids}
+
+
+@pytest.fixture
+def fake_dao():
+    return FakeDAO([
+        ContractType(id=1, type_code='SALES', type_name='销售合同', sort_order=1),
+        ContractType(id=2, type_code='LEASE', type_name='租赁合同', sort_order=2),
+    ])
+
+
+@pytest.fixture
+def cache(fake_dao, monkeypatch):
+    cache = ContractTypeCache(ttl=60, max_size=100)
+    
+    async def load(query):
+        return await query(fake_dao)
+    
+    monkeypatch.setattr(cache, '_load', load)
+    return cache
+
+
+class TestContractTypeCache:
+    """测试读穿透与失效"""
+    
+    def test_read_through(self, cache, fake_dao):
+        """测试第二次读取命中缓存"""
+        first = asyncio.run(cache.get_by_code('SALES'))
+        second = asyncio.run(cache.get_by_code('SALES'))
+        
+        assert first is second
+        assert fake_dao.queries == 1
+        assert cache.stats()['hits'] == 1
+    
+    def test_get_all_fills_indexes(self, cache, fake_dao):
+        """测试列表查询回填按代码和ID的索引"""
+        asyncio.run(cache.get_all())
+        
+        assert asyncio.run(cache.get_by_code('LEASE')).id == 2
+        assert asyncio.run(cache.get_by_id(1)).type_code == 'SALES'
+        assert fake_dao.queries == 1
+    
+    def test_negative_cache(self, cache, fake_dao):
+        """测试不存在的代码也被缓存"""
+        assert asyncio.run(cache.get_by_code('NOT_EXISTS')) is None
+        assert asyncio.run(cache.get_by_code('NOT_EXISTS')) is None
+        
+        assert fake_dao.queries == 1
+    
+    def test_invalidate_by_id_drops_old_code(self, cache, fake_dao):
+        """测试改名后旧代码的条目也被失效"""
+        asyncio.run(cache.get_all())
+        fake_dao.rows[0] = ContractType(id=1, type_code='SALES_V2', type_name='销售合同')
+        
+        cache.invalidate(ContractTypeChange('update', ids=(1,), codes=('SALES_V2',)))
+        
+        assert asyncio.run(cache.get_by_code('SALES')) is None
+        assert asyncio.run(cache.get_by_id(1)).type_code == 'SALES_V2'
+        assert asyncio.run(cache.get_by_code('LEASE')).id == 2  # 其他条目不受影响
+        assert len(asyncio.run(cache.get_all())) == 2
+    
+    def test_invalidate_during_load(self, cache, fake_dao, monkeypatch):
+        """测试查库期间发生写入时不回填旧数据"""
+        async def load(query):
+            result = await query(fake_dao)
+            cache.invalidate(ContractTypeChange('create', ids=(3,), codes=('NEW',)))
+            return result
+        
+        monkeypatch.setattr(cache, '_load', load)
+        asyncio.run(cache.get_by_code('NEW'))
+        
+        assert len(cache._cache) == 0
+    
+    def test_concurrent_misses_batched(self, cache, fake_dao):
+        """测试同一轮中的多个未命中合并为一次查询"""
+        async def scenario():
+            return await asyncio.gather(
+                cache.get_by_code('SALES'),
+                cache.get_by_code('LEASE'),
+                cache.get_by_code('SALES'),
+                cache.get_by_code('NOT_EXISTS'),
+            )
+        
+        sales, lease, sales_again, missing = asyncio.run(scenario())
+        
+        assert sales is sales_again and lease.id == 2 and missing is None
+        assert fake_dao.queries == 1
+        # 重复的 SALES 先由 SingleFlight 合并，不再进入批量加载
+        assert cache.stats()['batch_loads']['code'] == {'requests': 3, 'keys': 3, 'batches': 1}
+        assert cache.stats()['single_flight']['shared'] == 1
+        # 结果（包括负缓存）已回填
+        assert asyncio.run(cache.get_many_by_code(['LEASE', 'NOT_EXISTS'])) == {'LEASE': lease, 'NOT_EXISTS': None}
+        assert fake_dao.queries == 1
+    
+    def test_concurrent_misses_single_flight(self, cache, fake_dao):
+        """测试同一个键的并发未命中只查一次库，并共享同一个结果"""
+        async def scenario():
+            return await asyncio.gather(*(cache.get_all() for _ in range(5)))
+        
+        results = asyncio.run(scenario())
+        
+        assert all(result is results[0] for result in results)
+        assert fake_dao.queries == 1
+        assert cache.stats()['single_flight']['shared'] == 4
+    
+    def test_single_flight_not_joined_after_invalidation(self, cache, fake_dao, monkeypatch):
+        """测试失效之后到达的请求重新查库，不等待失效之前开始的加载"""
+        async def scenario():
+            started, release = asyncio.Event(), asyncio.Event()
+            
+            async def slow_load(query):
+                started.set()
+                await release.wait()
+                return await query(fake_dao)
+            
+            monkeypatch.setattr(cache, '_load', slow_load)
+            before = asyncio.create_task(cache.get_all())
+            await started.wait()
+            cache.invalidate(ContractTypeChange('create', ids=(3,), codes=('NEW',)))
+            after = asyncio.create_task(cache.get_all())
+            await asyncio.sleep(0)
+            release.set()
+            await asyncio.gather(before, after)
+        
+        asyncio.run(scenario())
+        
+        assert fake_dao.queries == 2
+    
+    def test_disabled(self, fake_dao, monkeypatch):
+        """测试 ttl=0 时每次都查库"""
+        cache = ContractTypeCache(ttl=0, max_size=100)
+        
+        async def load(query):
+            return await query(fake_dao)
+        
+        monkeypatch.setattr(cache, '_load', load)
+        asyncio.run(cache.get_by_code('SALES'))
+        asyncio.run(cache.get_by_code('SALES'))
+        
+        assert fake_dao.queries == 2
+
+
+class TestSharedCache:
+    """测试 Redis 共享缓存层（两个 worker 连接同一个假的 Redis）"""
+    
+    @pytest.fixture
+    def server(self):
+        return FakeRedisServer()
+    
+    def make_worker(self, server, fake_dao, monkeypatch):
+        provider = FakeClientProvider(FakeRedis(server))
+        cache = ContractTypeCache(ttl=60, max_size=100, shared=RedisCache(REDIS_NAMESPACE, 60, provider))
+        
+        async def load(query):
+            return await query(fake_dao)
+        
+        monkeypatch.setattr(cache, '_load', load)
+        return cache, provider
+    
+    @staticmethod
+    async def wait_ready(*caches):
+        for _ in range(100):
+            if all(cache.shared.ready for cache in caches):
+                return
+            await asyncio.sleep(0.01)
+        raise AssertionError("listener did not subscribe")
+    
+    def test_shared_hit(self, server, fake_dao, monkeypatch):
+        """测试一个 worker 查库后另一个 worker 从 Redis 读取"""
+        worker_a, _ = self.make_worker(server, fake_dao, monkeypatch)
+        worker_b, _ = self.make_worker(server, fake_dao, monkeypatch)
+        
+        async def scenario():
+            await worker_a.start()
+            await worker_b.start()
+            await self.wait_ready(worker_a, worker_b)
+            
+            await worker_a.get_all()
+            contract_types = await worker_b.get_all()
+            
+            await worker_a.stop()
+            await worker_b.stop()
+            return contract_types
+        
+        contract_types = asyncio.run(scenario())
+        
+        assert [t.type_code for t in contract_types] == ['SALES', 'LEASE']
+        assert fake_dao.queries == 1
+        assert worker_b.stats()['shared']['hits'] == 1
+    
+    def test_invalidation_across_workers(self, server, fake_dao, monkeypatch):
+        """测试写入后其他 worker 的进程内缓存和 Redis 中的数据都失效"""
+        worker_a, _ = self.make_worker(server, fake_dao, monkeypatch)
+        worker_b, _ = self.make_worker(server, fake_dao, monkeypatch)
+        
+        async def scenario():
+            await worker_a.start()
+            await worker_b.start()
+            await self.wait_ready(worker_a, worker_b)
+            
+            await worker_b.get_by_code('SALES')
+            
+            fake_dao.rows[0] = ContractType(id=1, type_code='SALES', type_name='销售合同（新）')
+            worker_a.invalidate(ContractTypeChange('update', ids=(1,), codes=('SALES',)))
+            await asyncio.sleep(0.05)  # 等待广播送达
+            
+            result = await worker_b.get_by_code('SALES')
+            await worker_a.stop()
+            await worker_b.stop()
+            return result
+        
+        result = asyncio.run(scenario())
+        
+        assert result.type_name == '销售合同（新）'
+        assert worker_b.stats()['shared']['received'] == 1
+    
+    def test_no_stale_shared_read_before_generation_bump(self, server, fake_dao, monkeypatch):
+        """测试本地失效后、Redis 版本号递增前的未命中不会读回旧版本的共享数据"""
+        worker, provider = self.make_worker(server, fake_dao, monkeypatch)
+        incr = provider.client.incr
+        
+        async def slow_incr(key):
+            await asyncio.sleep(0.05)
+            return await incr(key)
+        
+        monkeypatch.setattr(provider.client, 'incr', slow_incr)
+        
+        async def scenario():
+            await worker.start()
+            await self.wait_ready(worker)
+            
+            await worker.get_by_code('SALES')       # 写入 Redis 当前版本
+            
+            fake_dao.rows[0] = ContractType(id=1, type_code='SALES', type_name='销售合同（新）')
+            worker.invalidate(ContractTypeChange('update', ids=(1,), codes=('SALES',)))
+            result = await worker.get_by_code('SALES')  # 版本号尚未递增
+            await asyncio.sleep(0.1)
+            cached = await worker.get_by_code('SALES')
+            
+            await worker.stop()
+            return result, cached
+        
+        result, cached = asyncio.run(scenario())
+        
+        assert result.type_name == '销售合同（新）'
+        assert cached.type_name == '销售合同（新）'
+        assert fake_dao.queries == 2
+    
+    def test_fallback_when_redis_down(self, server, fake_dao, monkeypatch):
+        """测试 Redis 不可用时回退到数据库"""
+        worker, provider = self.make_worker(server, fake_dao, monkeypatch)
+        
+        async def scenario():
+            await worker.start()
+            await self.wait_ready(worker)
+            server.down = True
+            result = await worker.get_by_code('SALES')
+            await worker.stop()
+            return result
+        
+        result = asyncio.run(scenario())
+        
+        assert result.type_code == 'SALES'
+        assert fake_dao.queries == 1
+        assert provider.failures >= 1
+    
+    def test_sync_invalidation(self, server, fake_dao, monkeypatch):
+        """测试没有事件循环时（同步 DAO）用同步客户端广播"""
+        worker, _ = self.make_worker(server, fake_dao, monkeypatch)
+        
+        worker.invalidate(ContractTypeChange('deactivate', ids=(1,)))
+        
+        assert server.get(f"{REDIS_NAMESPACE}:generation") == '1'
+        assert worker.stats()['shared']['published'] == 1
+
+
+class TestChangeFeed:
+    """测试数据库触发器变更通知的处理"""
+    
+    def test_parse_notification(self):
+        """测试解析通知载荷"""
+        change = ContractTypeChange.from_notification(
+            '{"op": "update", "ids": [3, 4], "codes": ["SVC", "SERVICE", "SVC"], "txid": 42}'
+        )
+        
+        assert change == ContractTypeChange('update', ids=(3, 4), codes=('SVC', 'SERVICE'), txid=42)
+        assert ContractTypeChange.from_notification('{"op": "truncate", "txid": 43}').everything
+        assert ContractTypeChange.from_notification('{"op": "insert", "everything": true, "txid": 44}').everything
+        assert ContractTypeChange.from_notification('not json').everything
+    
+    def test_parse_legacy_row_notification(self):
+        """测试兼容逐行触发器的载荷（迁移执行前）"""
+        change = ContractTypeChange.from_notification(
+            '{"op": "update", "id": 3, "type_code": "SVC", "old_type_code": "SERVICE", "txid": 42}'
+        )
+        
+        assert change == ContractTypeChange('update', ids=(3,), codes=('SVC', 'SERVICE'), txid=42)
+    
+    def test_apply_notification(self, cache, fake_dao):
+        """测试按通知精确失效（包括改名前的代码）"""
+        asyncio.run(cache.get_all())
+        
+        cache.apply_notification(
+            '{"op": "update", "ids": [1], "codes": ["SALES_V2", "SALES"], "txid": 7}'
+        )
+        
+        assert cache._cache.peek(('code', 'SALES')) is MISSING
+        assert cache._cache.peek(('id', 1)) is MISSING
+        assert cache._cache.peek(('code', 'LEASE')) is not MISSING
+    
+    def test_notification_bumps_shared_generation_once(self, fake_dao, monkeypatch):
+        """测试所有 worker 都收到同一条通知时，Redis 版本号只递增一次"""
+        server = FakeRedisServer()
+        workers = [
+            ContractTypeCache(ttl=60, max_size=100, shared=RedisCache(
+                REDIS_NAMESPACE, 60, FakeClientProvider(FakeRedis(server))
+            ))
+            for _ in range(3)
+        ]
+        payload = '{"op": "delete", "ids": [2], "codes": ["LEASE"], "txid": 9}'
+        
+        async def scenario():
+            for worker in workers:
+                worker.apply_notification(payload)
+            for worker in workers:
+                await worker.stop()
+        
+        asyncio.run(scenario())
+        
+        assert server.get(f"{REDIS_NAMESPACE}:generation") == '1'
+    
+    def test_resync(self, cache):
+        """测试首次连接只清空本地缓存，重连时整体失效"""
+        changes = []
+        cache.invalidate = changes.append
+        
+        cache.resync()
+        cache.resync()
+        
+        assert changes == [ContractTypeChange('resync', everything=True)]
+
+
+class TestChangeNotification:
+    """测试 DAO 写操作的变更通知"""
+    
+    @pytest.fixture
+    def changes(self, monkeypatch):
+        changes = []
+        monkeypatch.setattr(contract_type_module, '_change_listeners', [changes.append])
+        return changes
+    
+    def test_notify_after_auto_commit(self, changes):
+        """测试 auto_commit=True 时写入后立即通知"""
+        dao = AsyncContractTypeDAO(FakeAsyncConnection(rowcount=1))
+        
+        asyncio.run(dao.deactivate(1))
+        
+        assert changes == [ContractTypeChange('deactivate', ids=(1,))]
+    
+    def test_notify_after_outer_commit(self, changes):
+        """测试 auto_commit=False 时等事务提交后才通知"""
+        conn = FakeAsyncConnection(rowcount=1)
+        dao = AsyncContractTypeDAO(conn, auto_commit=False)
+        
+        asyncio.run(dao.delete(1))
+        assert changes == []
+        
+        database._run_after_commit(conn)
+        assert changes == [ContractTypeChange('delete', ids=(1,))]
+    
+    def test_no_notify_on_rollback(self, changes):
+        """测试事务回滚时不通知"""
+        conn = FakeAsyncConnection(rowcount=1)
+        dao = AsyncContractTypeDAO(conn, auto_commit=False)
+        
+        asyncio.run(dao.delete(1))
+        database._discard_after_commit(conn)
+        database._run_after_commit(conn)
+        
+        assert changes == []
+    
+    def test_no_notify_when_nothing_changed(self, changes):
+        """测试没有影响任何行时不通知"""
+        dao = AsyncContractTypeDAO(FakeAsyncConnection(rowcount=0))
+        
+        asyncio.run(dao.delete(99999))
+        
+        assert changes == []
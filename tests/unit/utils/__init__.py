@@ -0,0 +1,3 @@
+"""
+工具层单元测试
+"""
@@ -0,0 +1,129 @@
+"""
+假的 Redis（测试用）
+Fake Redis
+
+在内存中实现缓存层用到的命令子集（GET / SET / INCR / PUBLISH / 订阅）。
+多个 FakeRedis 共享同一个 FakeRedisServer 时，相当于多个 worker 连接同一台 Redis；
+把 server.down 设为 True 可模拟 Redis 宕机。
+"""
+
+import asyncio
+import time
+
+import redis
+
+
+class FakeRedisServer:
+    def __init__(self):
+        self.data: dict[str, tuple[str, float]] = {}
+        self.subscribers: dict[str, list['FakePubSub']] = {}
+        self.down = False
+
+    def check(self):
+        if self.down:
+            raise redis.ConnectionError("Connection refused")
+
+    def get(self, key):
+        self.check()
+        item = self.data.get(key)
+        if item is None or item[1] <= time.monotonic():
+            return None
+        return item[0]
+
+    def set(self, key, value, ex=None, nx=False):
+        self.check()
+        if nx and self.get(key) is not None:
+            return None
+        self.data[key] = (str(value), time.monotonic() + ex if ex else float('inf'))
+        return True
+
+    def incr(self, key):
+        value = int(self.get(key) or 0) + 1
+        self.set(key, value)
+        return value
+
+    def publish(self, channel, message):
+        self.check()
+        receivers = self.subscribers.get(channel, [])
+        for pubsub in receivers:
+            pubsub.queue.put_nowait({'type': 'message', 'channel': channel, 'data': message})
+        return len(receivers)
+
+
+class FakePubSub:
+    def __init__(self, server: FakeRedisServer):
+        self.server = server
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.channels: list[str] = []
+
+    async def subscribe(self, channel):
+        self.server.check()
+        self.server.subscribers.setdefault(channel, []).append(self)
+        self.channels.append(channel)
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+        self.server.check()
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def aclose(self):
+        for channel in self.channels:
+            self.server.subscribers[channel].remove(self)
+        self.channels = []
+
+
+class FakeRedis:
+    """异步客户端（对应 redis.asyncio.Redis）"""
+
+    def __init__(self, server: FakeRedisServer = None):
+        self.server = server or FakeRedisServer()
+
+    async def get(self, key):
+        return self.server.get(key)
+
+    async def set(self, key, value, ex=None, nx=False):
+        return self.server.set(key, value, ex, nx)
+
+    async def incr(self, key):
+        return self.server.incr(key)
+
+    async def publish(self, channel, message):
+        return self.server.publish(channel, message)
+
+    def pubsub(self):
+        return FakePubSub(self.server)
+
+    def sync(self) -> 'FakeSyncRedis':
+        return FakeSyncRedis(self.server)
+
+
+class FakeSyncRedis:
+    """同步客户端（对应 redis.Redis）"""
+
+    def __init__(self, server: FakeRedisServer):
+        self.server = server
+
+    def incr(self, key):
+        return self.server.incr(key)
+
+    def publish(self, channel, message):
+        return self.server.publish(channel, message)
+
+
+class FakeClientProvider:
+    """替代 RedisClient：每个 worker 一个，可单独模拟故障"""
+
+    def __init__(self, client: FakeRedis):
+        self.client = client
+        self.failures = 0
+
+    def get_client(self):
+        return self.client
+
+    def get_sync_client(self):
+        return self.client.sync()
+
+    def mark_failed(self, error=None):
+        self.failures += 1
@@ -0,0 +1,182 @@
+"""
+准入控制测试
+Test Admission Control
+"""
+
+import asyncio
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from utils.admission import PRIORITY_HEAVY, PRIORITY_READ, PRIORITY_WRITE, AdmissionController
+
+
+def make_controller(**kwargs) -> AdmissionController:
+    options = dict(max_concurrent=1, queue_size=10, queue_timeout=1, retry_after=3)
+    options.update(kwargs)
+    return AdmissionController(**options)
+
+
+class TestAdmission:
+    """测试名额分配"""
+
+    def test_admit_within_capacity(self):
+        """测试有名额时立即通过，释放后计数归零"""
+        controller = make_controller(max_concurrent=2)
+        route = controller.route('get_all', PRIORITY_READ)
+
+        async def scenario():
+            assert await controller.acquire(route) == 0.0
+            assert await controller.acquire(route) == 0.0
+            assert controller.stats()['active'] == 2
+            controller.release(route)
+            controller.release(route)
+
+        asyncio.run(scenario())
+        assert controller.stats()['active'] == 0
+
+    def test_reads_before_heavy(self):
+        """测试名额释放时先分给缓存读，即使重查询先排队"""
+        controller = make_controller()
+        read = controller.route('get_all', PRIORITY_READ)
+        write = controller.route('create', PRIORITY_WRITE)
+        heavy = controller.route('export', PRIORITY_HEAVY)
+        order = []
+
+        async def request(route):
+            await controller.acquire(route)
+            order.append(route.name)
+            controller.release(route)
+
+        async def scenario():
+            await controller.acquire(read)
+            tasks = [asyncio.create_task(request(route)) for route in (heavy, write, read)]
+            await asyncio.sleep(0)
+            controller.release(read)
+            await asyncio.gather(*tasks)
+
+        asyncio.run(scenario())
+        assert order == ['get_all', 'create', 'export']
+
+    def test_route_limit(self, monkeypatch):
+        """测试路由并发上限：重查询默认 ADMISSION_HEAVY_LIMIT，达到上限时不占用其他路由的名额"""
+        monkeypatch.setattr('config.Config.ADMISSION_HEAVY_LIMIT', 1)
+        controller = make_controller(max_concurrent=5)
+        heavy = controller.route('export', PRIORITY_HEAVY)
+        read = controller.route('get_all', PRIORITY_READ)
+
+        async def scenario():
+            await controller.acquire(heavy)
+            waiting = asyncio.create_task(controller.acquire(heavy))
+            await asyncio.sleep(0)
+            assert heavy.waiting == 1
+            assert await controller.acquire(read) == 0.0
+            controller.release(heavy)
+            await waiting
+            assert heavy.active == 1
+
+        asyncio.run(scenario())
+
+    def test_route_limit_from_config(self, monkeypatch):
+        """测试 ADMISSION_ROUTE_LIMITS 按路由名覆盖"""
+        monkeypatch.setattr('config.Config.ADMISSION_ROUTE_LIMITS', 'export=3, get_all=1')
+        controller = make_controller()
+
+        assert controller.route('export', PRIORITY_HEAVY).limit == 3
+        assert controller.route('get_all', PRIORITY_READ).limit == 1
+        assert controller.route('create', PRIORITY_WRITE).limit == 0
+
+    def test_queue_full(self):
+        """测试队列已满时立即返回 503 和 Retry-After"""
+        controller = make_controller(queue_size=0)
+        route = controller.route('get_all', PRIORITY_READ)
+
+        async def scenario():
+            await controller.acquire(route)
+            await controller.acquire(route)
+
+        with pytest.raises(HTTPException) as exc_info:
+            asyncio.run(scenario())
+        assert exc_info.value.status_code == 503
+        assert exc_info.value.headers == {'Retry-After': '3'}
+
+    def test_queue_timeout(self):
+        """测试排队超时返回 503，并退出队列"""
+        controller = make_controller(queue_timeout=0.01)
+        route = controller.route('get_all', PRIORITY_READ)
+
+        async def scenario():
+            await controller.acquire(route)
+            with pytest.raises(HTTPException) as exc_info:
+                await controller.acquire(route)
+            assert 'timeout' in exc_info.value.detail
+
+        asyncio.run(scenario())
+        assert route.waiting == 0
+        assert route.active == 1
+
+    def test_cancelled_waiter_leaves_queue(self):
+        """测试客户端断开时退出队列，不占用后续名额"""
+        controller = make_controller()
+        route = controller.route('get_all', PRIORITY_READ)
+
+        async def scenario():
+            await controller.acquire(route)
+            waiting = asyncio.create_task(controller.acquire(route))
+            await asyncio.sleep(0)
+            waiting.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiting
+            controller.release(route)
+
+        asyncio.run(scenario())
+        assert controller.stats()['active'] == 0
+        assert route.waiting == 0
+
+
+class TestInstall:
+    """测试路由包装"""
+
+    def test_overflow_uses_error_envelope(self):
+        """测试超出并发时返回统一错误格式的 503，未标记的路由不受限制"""
+        from main import http_exception_handler
+
+        controller = make_controller(max_concurrent=0, queue_size=0)
+        app = FastAPI()
+        app.add_exception_handler(HTTPException, http_exception_handler)
+
+        @app.get("/limited")
+        @controller.limit(PRIORITY_READ)
+        async def limited():
+            return {"success": True}
+
+        @app.get("/open")
+        async def open_route():
+            return {"success": True}
+
+        assert controller.install(app) == 1
+        client = TestClient(app)
+
+        response = client.get("/limited")
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '3'
+        assert response.json()['success'] is False
+        assert 'busy' in response.json()['error']
+        assert client.get("/open").status_code == 200
+
+    def test_slot_released_after_response(self):
+        """测试响应完成后归还名额"""
+        controller = make_controller()
+        app = FastAPI()
+
+        @app.get("/limited")
+        @controller.limit(PRIORITY_READ)
+        async def limited():
+            return {"success": True}
+
+        controller.install(app)
+        client = TestClient(app)
+
+        assert client.get("/limited").status_code == 200
+        assert client.get("/limited").status_code == 200
+        assert controller.stats()['routes']['limited'] == {'priority': 'read', 'limit': None, 'active': 0, 'waiting': 0}
@@ -0,0 +1,88 @@
+"""
+批量加载器测试
+Test Batch Loader
+"""
+
+import asyncio
+import pytest
+
+from utils.batch_loader import BatchLoader
+
+
+class RecordingBatch:
+    """记录每次批量查询收到的键"""
+    
+    def __init__(self, data, error=None):
+        self.data = data
+        self.error = error
+        self.calls = []
+    
+    async def __call__(self, keys):
+        self.calls.append(keys)
+        await asyncio.sleep(0)
+        if self.error:
+            raise self.error
+        return {key: self.data[key] for key in keys if key in self.data}
+
+
+class TestBatchLoader:
+    """测试按事件循环轮次合并查询"""
+    
+    def test_coalesce_and_dedupe(self):
+        """测试同一轮的查询去重后合并为一次"""
+        batch = RecordingBatch({'SALES': 1, 'LEASE': 2})
+        loader = BatchLoader(batch)
+        
+        async def scenario():
+            return await asyncio.gather(
+                loader.load('SALES'), loader.load('LEASE'), loader.load('SALES'), loader.load('NDA'),
+            )
+        
+        assert asyncio.run(scenario()) == [1, 2, 1, None]
+        assert batch.calls == [['SALES', 'LEASE', 'NDA']]
+        assert loader.stats() == {'requests': 4, 'keys': 3, 'batches': 1}
+    
+    def test_separate_ticks(self):
+        """测试先后发起的查询分别执行"""
+        batch = RecordingBatch({'SALES': 1})
+        loader = BatchLoader(batch)
+        
+        async def scenario():
+            await loader.load('SALES')
+            await loader.load('SALES')
+        
+        asyncio.run(scenario())
+        assert batch.calls == [['SALES'], ['SALES']]
+    
+    def test_max_batch_size(self):
+        """测试超过 max_batch_size 时拆分"""
+        batch = RecordingBatch({i: i * 10 for i in range(5)})
+        loader = BatchLoader(batch, max_batch_size=2)
+        
+        assert asyncio.run(loader.load_many(range(5))) == [0, 10, 20, 30, 40]
+        assert batch.calls == [[0, 1], [2, 3], [4]]
+    
+    def test_error_propagates_to_all_callers(self):
+        """测试批量查询失败时每个调用方都收到异常"""
+        loader = BatchLoader(RecordingBatch({}, error=RuntimeError("db down")))
+        
+        async def scenario():
+            return await asyncio.gather(loader.load('A'), loader.load('B'), return_exceptions=True)
+        
+        results = asyncio.run(scenario())
+        assert all(isinstance(r, RuntimeError) for r in results)
+    
+    def test_cancelled_caller_does_not_affect_others(self):
+        """测试一个调用方被取消时，等待同一个键的其他调用方仍得到结果"""
+        loader = BatchLoader(RecordingBatch({'SALES': 1}))
+        
+        async def scenario():
+            first = asyncio.create_task(loader.load('SALES'))
+            second = asyncio.create_task(loader.load('SALES'))
+            await asyncio.sleep(0)
+            first.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await first
+            return await second
+        
+        assert asyncio.run(scenario()) == 1
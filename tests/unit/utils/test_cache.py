@@ -0,0 +1,68 @@
+"""
+进程内缓存测试
+Test Local Cache
+"""
+
+import time
+
+from utils.cache import MISSING, LocalCache
+
+
+class TestLocalCache:
+    """测试 TTL + LRU 缓存"""
+    
+    def test_get_set(self):
+        """测试命中与未命中"""
+        cache = LocalCache(ttl=60, max_size=10)
+        
+        assert cache.get('a') is MISSING
+        cache.set('a', 1)
+        assert cache.get('a') == 1
+        
+        stats = cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['hit_ratio'] == 0.5
+    
+    def test_cache_none_value(self):
+        """测试可以缓存 None（与未命中区分）"""
+        cache = LocalCache(ttl=60, max_size=10)
+        cache.set('a', None)
+        
+        assert cache.get('a') is None
+    
+    def test_expiration(self):
+        """测试过期后视为未命中"""
+        cache = LocalCache(ttl=60, max_size=10)
+        cache.set('a', 1, ttl=0.01)
+        time.sleep(0.02)
+        
+        assert cache.get('a') is MISSING
+        assert cache.stats()['expirations'] == 1
+        assert len(cache) == 0
+    
+    def test_lru_eviction(self):
+        """测试超过容量时淘汰最久未使用的条目"""
+        cache = LocalCache(ttl=60, max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')       # a 变为最近使用
+        cache.set('c', 3)    # 淘汰 b
+        
+        assert cache.peek('b') is MISSING
+        assert cache.peek('a') == 1
+        assert cache.peek('c') == 3
+        assert cache.stats()['evictions'] == 1
+    
+    def test_delete_and_clear(self):
+        """测试失效统计"""
+        cache = LocalCache(ttl=60, max_size=10)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.set('c', 3)
+        
+        assert cache.delete('a', 'missing') == 1
+        cache.clear()
+        
+        assert len(cache) == 0
+        assert cache.stats()['invalidations'] == 3
@@ -0,0 +1,692 @@
+"""
+连接池测试
+Test Connection Pool
+"""
+
+import asyncio
+import contextvars
+import time
+from types import SimpleNamespace
+
+import psycopg
+import pytest
+from psycopg.pq import TransactionStatus
+from psycopg._preparing import PrepareManager
+from psycopg._queries import PostgresQuery
+from psycopg.adapt import Transformer
+from psycopg2 import extensions, pool
+
+from utils import database
+from utils.database import (
+    ManagedPool,
+    NotificationListener,
+    PoolTimeoutError,
+    PreparedStatementRegistry,
+    _async_pooled_transaction,
+    _configure_async_connection,
+    _pooled_transaction,
+    astream_query,
+    stream_batches,
+    stream_query,
+)
+
+
+# ============================================
+# 测试替身：模拟 psycopg2 连接
+# ============================================
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.connection = conn
+
+    def execute(self, query, params=None):
+        if self.conn.broken:
+            raise RuntimeError("server closed the connection unexpectedly")
+        self.conn.executed.append(query)
+        self.conn.status = extensions.TRANSACTION_STATUS_INTRANS
+        self._row = None
+        if query.startswith("SELECT 1 FROM pg_prepared_statements"):
+            self._row = (1,) if params[0] in self.conn.server_prepared else None
+        elif query.startswith("PREPARE "):
+            self.conn.server_prepared.add(query.split()[1])
+
+    def fetchone(self):
+        return self._row
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+        self.executed = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.server_prepared = set()   # 服务端会话中已存在的预编译语句
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def get_transaction_status(self):
+        return self.status
+
+    def commit(self):
+        self.commits += 1
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+class FakeAsyncCursor:
+    """按 psycopg 3 的规则查询驱动的预编译缓存（键为 SQL + 参数类型）"""
+
+    def __init__(self, conn):
+        self.connection = conn
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def fetchone(self):
+        return None
+
+    async def fetchall(self):
+        return []
+
+    async def execute(self, query, params=None, prepare=None):
+        pg_query = PostgresQuery(Transformer())
+        pg_query.convert(query, params)
+        pg_query.dump(params)
+        self.connection.info.transaction_status = TransactionStatus.INTRANS
+        prep, name = self.connection._prepared.get(pg_query, prepare)
+        if prep is prep.SHOULD:
+            self.connection.prepares.append(name)
+        self.connection._prepared.maybe_add_to_cache(pg_query, prep, name)
+
+
+class FakeAsyncConnection:
+    """只模拟 prepare_threshold、事务状态与驱动的 PrepareManager"""
+
+    closed = False
+
+    def __init__(self):
+        self._prepared = PrepareManager()
+        self.prepares = []
+        self.info = SimpleNamespace(transaction_status=TransactionStatus.IDLE)
+
+    @property
+    def prepare_threshold(self):
+        return self._prepared.prepare_threshold
+
+    @prepare_threshold.setter
+    def prepare_threshold(self, value):
+        self._prepared.prepare_threshold = value
+
+    def cursor(self):
+        return FakeAsyncCursor(self)
+
+    async def commit(self):
+        self.info.transaction_status = TransactionStatus.IDLE
+
+    async def rollback(self):
+        self.info.transaction_status = TransactionStatus.IDLE
+        self._prepared.clear()   # 与驱动一致：回滚后清空预编译缓存
+
+
+class FakeAsyncPool:
+    """模拟 AsyncConnectionPool：只有一个连接，归还时回滚仍在事务中的连接"""
+
+    name = "fake-async"
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def getconn(self, timeout=None):
+        return self.conn
+
+    async def putconn(self, conn):
+        if conn.info.transaction_status != TransactionStatus.IDLE:
+            await conn.rollback()
+
+
+def make_pool(**kwargs) -> tuple[ManagedPool, list[FakeConnection]]:
+    """创建使用假连接的连接池，返回 (连接池, 已创建的连接列表)"""
+    created = []
+
+    def connect(**_):
+        conn = FakeConnection()
+        created.append(conn)
+        return conn
+
+    options = dict(min_size=1, max_size=2, timeout=0.05, maintenance_interval=0)
+    options.update(kwargs)
+    return ManagedPool({}, connect=connect, **options), created
+
+
+# ============================================
+# ManagedPool 测试
+# ============================================
+class TestManagedPool:
+    """测试连接池的借出、回收和泄漏检测"""
+
+    def test_open_fills_min_size(self):
+        """测试启动时预热到最小连接数"""
+        db_pool, created = make_pool(min_size=2, max_size=4)
+        db_pool.open()
+
+        assert len(created) == 2
+        assert db_pool.stats()['idle'] == 2
+
+    def test_connection_is_reused(self):
+        """测试归还的连接会被复用"""
+        db_pool, created = make_pool()
+        db_pool.open()
+
+        conn1 = db_pool.getconn()
+        db_pool.putconn(conn1)
+        conn2 = db_pool.getconn()
+
+        assert conn1 is conn2
+        assert len(created) == 1
+
+    def test_checkout_timeout(self):
+        """测试连接耗尽时在超时后报错"""
+        db_pool, _ = make_pool(max_size=1)
+        db_pool.open()
+        db_pool.getconn()
+
+        with pytest.raises(PoolTimeoutError):
+            db_pool.getconn()
+
+        assert db_pool.stats()['timeouts'] == 1
+
+    def test_put_unknown_connection(self):
+        """测试归还不属于连接池的连接"""
+        db_pool, _ = make_pool()
+
+        with pytest.raises(pool.PoolError):
+            db_pool.putconn(FakeConnection())
+
+    def test_open_transaction_rolled_back_on_return(self):
+        """测试归还时回滚未结束的事务"""
+        db_pool, _ = make_pool()
+        conn = db_pool.getconn()
+        conn.cursor().execute("SELECT 1")
+
+        db_pool.putconn(conn)
+
+        assert conn.rollbacks == 1
+        assert conn.get_transaction_status() == extensions.TRANSACTION_STATUS_IDLE
+
+    def test_stale_connection_replaced(self):
+        """测试校验失败的空闲连接会被替换"""
+        db_pool, created = make_pool(validate_after=0)
+        db_pool.open()
+        created[0].broken = True
+
+        conn = db_pool.getconn()
+
+        assert conn is created[1]
+        assert created[0].closed
+
+    def test_expired_connection_recycled(self):
+        """测试超过最长存活时间的连接会被回收"""
+        db_pool, created = make_pool(max_lifetime=0)
+        conn = db_pool.getconn()
+        db_pool.putconn(conn)
+
+        assert conn.closed
+        assert db_pool.stats()['size'] == 0
+        assert db_pool.stats()['recycled'] == 1
+
+    def test_leak_detection(self):
+        """测试长时间未归还的连接被识别为泄漏（只报告一次）"""
+        db_pool, _ = make_pool(leak_threshold=0.01)
+        db_pool.getconn()
+        time.sleep(0.02)
+
+        assert len(db_pool.check_leaks()) == 1
+        assert db_pool.check_leaks() == []
+        assert db_pool.stats()['leaks'] == 1
+
+    def test_close_rejects_checkout(self):
+        """测试关闭后不能再借出连接"""
+        db_pool, created = make_pool()
+        db_pool.open()
+        db_pool.close()
+
+        assert created[0].closed
+        with pytest.raises(pool.PoolError):
+            db_pool.getconn()
+
+
+# ============================================
+# 事务上下文测试
+# ============================================
+class TestPooledTransaction:
+    """测试连接池事务上下文"""
+
+    def test_commit_and_return(self):
+        """测试成功时提交并归还连接"""
+        db_pool, _ = make_pool()
+
+        with _pooled_transaction(db_pool) as conn:
+            conn.cursor().execute("INSERT ...")
+
+        assert conn.commits == 1
+        assert db_pool.stats()['in_use'] == 0
+        assert db_pool.stats()['idle'] == 1
+
+    def test_rollback_on_error(self):
+        """测试异常时回滚并归还连接"""
+        db_pool, _ = make_pool()
+
+        with pytest.raises(ValueError):
+            with _pooled_transaction(db_pool) as conn:
+                conn.cursor().execute("INSERT ...")
+                raise ValueError("boom")
+
+        assert conn.commits == 0
+        assert conn.rollbacks == 1
+        assert db_pool.stats()['in_use'] == 0
+
+
+# ============================================
+# 读写路由测试
+# ============================================
+class TestReplicaRouting:
+    """测试只读事务路由到副本"""
+
+    @pytest.fixture
+    def pools(self, monkeypatch):
+        """主库和副本都使用假连接池，副本延迟视为 0"""
+        primary, _ = make_pool()
+        replica, _ = make_pool()
+        monitor = database.ReplicaLagMonitor(max_lag=5, check_interval=60)
+        monitor.record(0.0)
+
+        monkeypatch.setattr(database.Config, 'POSTGRES_REPLICA_HOST', 'replica')
+        monkeypatch.setattr(database.ConnectionPool, '_pool', primary)
+        monkeypatch.setattr(database.ReplicaConnectionPool, '_pool', replica)
+        monkeypatch.setattr(database, 'replica_lag', monitor)
+        return primary, replica, monitor
+
+    def run_in_context(self, fn):
+        """在独立的上下文中执行，模拟一次请求"""
+        return contextvars.copy_context().run(fn)
+
+    def test_readonly_uses_replica(self, pools):
+        """测试只读事务使用副本"""
+        primary, replica, _ = pools
+
+        def request():
+            with database.db_transaction(readonly=True):
+                return replica.stats()['in_use'], primary.stats()['in_use']
+
+        assert self.run_in_context(request) == (1, 0)
+
+    def test_read_after_write_uses_primary(self, pools):
+        """测试同一请求写过主库后读主库"""
+        primary, replica, _ = pools
+
+        def request():
+            with database.db_transaction():
+                pass
+            with database.db_transaction(readonly=True):
+                return replica.stats()['in_use'], primary.stats()['in_use']
+
+        assert self.run_in_context(request) == (0, 1)
+
+    def test_lagging_replica_falls_back(self, pools):
+        """测试复制延迟超过阈值时读主库"""
+        primary, replica, monitor = pools
+        monitor.record(30.0)
+
+        def request():
+            with database.db_transaction(readonly=True):
+                return replica.stats()['in_use'], primary.stats()['in_use']
+
+        assert self.run_in_context(request) == (0, 1)
+
+    def test_lag_check_is_throttled(self):
+        """测试同一间隔内只测量一次延迟"""
+        monitor = database.ReplicaLagMonitor(max_lag=5, check_interval=60)
+
+        assert monitor.begin_check() is True
+        assert monitor.begin_check() is False  # 正在测量
+        monitor.record(None)
+
+        assert monitor.begin_check() is False  # 间隔未到
+        assert monitor.acceptable() is False   # 测量失败视为不可用
+
+
+# ============================================
+# 预编译语句测试
+# ============================================
+class TestPreparedStatementRegistry:
+    """测试按连接懒加载的预编译语句"""
+
+    def test_prepare_once_per_connection(self):
+        """测试每个连接只 PREPARE 一次"""
+        registry = PreparedStatementRegistry()
+        stmt = registry.register('get_by_code', "SELECT * FROM t WHERE a = %s AND b = %s")
+        conn = FakeConnection()
+
+        registry.execute(conn.cursor(), stmt, ('x', 'y'))
+        registry.execute(conn.cursor(), stmt, ('x', 'y'))
+
+        assert conn.executed == [
+            "SELECT 1 FROM pg_prepared_statements WHERE name = %s",
+            "PREPARE get_by_code AS SELECT * FROM t WHERE a = $1 AND b = $2",
+            "EXECUTE get_by_code (%s, %s)",
+            "EXECUTE get_by_code (%s, %s)",
+        ]
+        assert registry.stats()['hits'] == 1
+        assert registry.stats()['misses'] == 1
+
+    def test_new_connection_reprepares(self):
+        """测试新连接（重连后）重新 PREPARE"""
+        registry = PreparedStatementRegistry()
+        stmt = registry.register('get_all', "SELECT * FROM t")
+
+        registry.execute(FakeConnection().cursor(), stmt)
+        conn = FakeConnection()
+        registry.execute(conn.cursor(), stmt)
+
+        assert conn.executed[1:] == ["PREPARE get_all AS SELECT * FROM t", "EXECUTE get_all"]
+        assert registry.stats()['misses'] == 2
+
+    def test_existing_server_statement_reused(self):
+        """测试记录被清除但服务端语句仍存在时（forget 之后）不重复 PREPARE，直接 EXECUTE"""
+        registry = PreparedStatementRegistry()
+        stmt = registry.register('get_all', "SELECT * FROM t")
+        conn = FakeConnection()
+        registry.execute(conn.cursor(), stmt)
+
+        registry.forget(conn)
+        conn.executed.clear()
+        registry.execute(conn.cursor(), stmt)
+
+        assert conn.executed == ["SELECT 1 FROM pg_prepared_statements WHERE name = %s", "EXECUTE get_all"]
+
+    def test_failed_prepare_is_retried(self):
+        """测试 PREPARE 失败后下次重新准备"""
+        registry = PreparedStatementRegistry()
+        stmt = registry.register('get_all', "SELECT * FROM t")
+        conn = FakeConnection()
+        conn.broken = True
+
+        with pytest.raises(RuntimeError):
+            registry.execute(conn.cursor(), stmt)
+
+        conn.broken = False
+        registry.execute(conn.cursor(), stmt)
+        assert conn.executed[1] == "PREPARE get_all AS SELECT * FROM t"
+
+    def test_async_prepared_by_driver(self):
+        """测试异步连接上语句由驱动准备一次，之后计为命中"""
+        registry = PreparedStatementRegistry()
+        stmt = registry.register('get_by_id', "SELECT * FROM t WHERE id = %s")
+        conn = FakeAsyncConnection()
+        asyncio.run(_configure_async_connection(conn))
+
+        async def scenario():
+            # id 大小不同（int2 / int4）时仍然命中同一条预编译语句
+            for id in (1, 40000, 3):
+                await registry.aexecute(conn.cursor(), stmt, (id,))
+
+        asyncio.run(scenario())
+
+        assert conn.prepares == [b'_pg3_0']
+        assert registry.is_prepared(conn, stmt)
+        assert registry.stats()['misses'] == 1
+        assert registry.stats()['hits'] == 2
+
+    def test_async_threshold_none_disables_prepare(self):
+        """测试 prepare_threshold 为 None 时驱动不准备，也不计为命中"""
+        registry = PreparedStatementRegistry()
+        stmt = registry.register('get_all', "SELECT * FROM t")
+        conn = FakeAsyncConnection()
+        conn.prepare_threshold = None
+
+        async def scenario():
+            await registry.aexecute(conn.cursor(), stmt)
+            await registry.aexecute(conn.cursor(), stmt)
+
+        asyncio.run(scenario())
+
+        assert conn.prepares == []
+        assert not registry.is_prepared(conn, stmt)
+        assert registry.stats()['hits'] == 0
+
+    def test_async_reprepared_after_rollback(self, monkeypatch):
+        """测试事务回滚清空驱动缓存后重新准备并计为未命中"""
+        registry = PreparedStatementRegistry()
+        stmt = registry.register('get_all', "SELECT * FROM t")
+        conn = FakeAsyncConnection()
+        asyncio.run(_configure_async_connection(conn))
+        db_pool = FakeAsyncPool(conn)
+        monkeypatch.setattr(database, 'prepared_statements', registry)
+
+        async def scenario():
+            with pytest.raises(ValueError):
+                async with _async_pooled_transaction(db_pool) as tx:
+                    await registry.aexecute(tx.cursor(), stmt)
+                    raise ValueError("boom")
+            assert not registry.is_prepared(conn, stmt)
+            async with _async_pooled_transaction(db_pool) as tx:
+                await registry.aexecute(tx.cursor(), stmt)
+
+        asyncio.run(scenario())
+
+        assert conn.prepares == [b'_pg3_0', b'_pg3_1']
+        assert registry.is_prepared(conn, stmt)
+        assert registry.stats()['misses'] == 2
+
+    def test_async_forgotten_when_returned_in_transaction(self, monkeypatch):
+        """测试连接在事务中归还（请求被取消）时，连接池的回滚同样清除记录"""
+        registry = PreparedStatementRegistry()
+        stmt = registry.register('get_all', "SELECT * FROM t")
+        conn = FakeAsyncConnection()
+        asyncio.run(_configure_async_connection(conn))
+        monkeypatch.setattr(database, 'prepared_statements', registry)
+
+        async def scenario():
+            await registry.aexecute(conn.cursor(), stmt)
+            await database._async_putconn(FakeAsyncPool(conn), conn)
+
+        asyncio.run(scenario())
+
+        assert not registry.is_prepared(conn, stmt)
+
+    def test_register_conflict(self):
+        """测试同名语句不能注册为不同 SQL"""
+        registry = PreparedStatementRegistry()
+        registry.register('stmt', "SELECT 1")
+
+        assert registry.register('stmt', "SELECT 1") == 'stmt'
+        with pytest.raises(ValueError):
+            registry.register('stmt', "SELECT 2")
+
+
+class FakeNamedCursor:
+    """模拟服务端命名游标：记录每次 fetchmany 的行数"""
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.itersize = None
+        self.fetches = []
+        self.closed = False
+
+    def execute(self, query, params=None):
+        self.query = query
+
+    def fetchmany(self, size):
+        self.fetches.append(size)
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+    def close(self):
+        self.closed = True
+
+
+class FakeStreamConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.cursors = []
+
+    def cursor(self, name=None):
+        assert name, "流式查询必须使用命名游标"
+        cursor = FakeNamedCursor(self.rows)
+        self.cursors.append(cursor)
+        return cursor
+
+
+class FakeAsyncNamedCursor(FakeNamedCursor):
+    async def execute(self, query, params=None):
+        self.query = query
+
+    async def fetchmany(self, size):
+        return FakeNamedCursor.fetchmany(self, size)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.closed = True
+
+
+class FakeAsyncStreamConnection(FakeStreamConnection):
+    def cursor(self, name=None):
+        assert name, "流式查询必须使用命名游标"
+        cursor = FakeAsyncNamedCursor(self.rows)
+        self.cursors.append(cursor)
+        return cursor
+
+
+class TestStreamQuery:
+    """测试服务端游标流式查询"""
+
+    def test_fetch_in_batches(self):
+        """测试按批读取并在结束后关闭游标"""
+        conn = FakeStreamConnection([(i,) for i in range(5)])
+
+        batches = list(stream_batches(conn, "SELECT id FROM t", batch_size=2))
+
+        assert batches == [[(0,), (1,)], [(2,), (3,)], [(4,)]]
+        cursor = conn.cursors[0]
+        assert cursor.fetches == [2, 2, 2, 2]
+        assert cursor.itersize == 2
+        assert cursor.closed
+
+    def test_early_stop_closes_cursor(self):
+        """测试提前停止迭代时游标被关闭，且不会多读"""
+        conn = FakeStreamConnection([(i,) for i in range(10)])
+
+        rows = stream_query(conn, "SELECT id FROM t", batch_size=3)
+        assert [next(rows) for _ in range(4)] == [(0,), (1,), (2,), (3,)]
+        rows.close()
+
+        cursor = conn.cursors[0]
+        assert cursor.fetches == [3, 3]
+        assert cursor.closed
+
+    def test_cursor_names_unique(self):
+        """测试同一连接上的多个流式查询使用不同的游标名"""
+        names = []
+
+        class Conn(FakeStreamConnection):
+            def cursor(self, name=None):
+                names.append(name)
+                return super().cursor(name)
+
+        conn = Conn([(1,)])
+        list(stream_query(conn, "SELECT 1"))
+        list(stream_query(conn, "SELECT 1"))
+
+        assert len(set(names)) == 2
+
+    def test_async_stream(self):
+        """测试异步版本逐行产出，提前停止时关闭游标"""
+        conn = FakeAsyncStreamConnection([(i,) for i in range(5)])
+
+        async def scenario():
+            collected = []
+            async for row in astream_query(conn, "SELECT id FROM t", batch_size=2):
+                collected.append(row)
+                if len(collected) == 3:
+                    break
+            return collected
+
+        assert asyncio.run(scenario()) == [(0,), (1,), (2,)]
+        assert conn.cursors[0].closed
+
+
+class FakeNotify:
+    def __init__(self, payload):
+        self.payload = payload
+
+
+class FakeListenConnection:
+    """每次 notifies() 依次产出预设的通知，用完后模拟断线"""
+
+    def __init__(self, payloads):
+        self.payloads = list(payloads)
+        self.executed = []
+        self.closed = False
+
+    async def execute(self, query):
+        self.executed.append(query)
+
+    async def notifies(self, timeout=None):
+        while self.payloads:
+            yield FakeNotify(self.payloads.pop(0))
+        raise psycopg.OperationalError("server closed the connection unexpectedly")
+
+    async def close(self):
+        self.closed = True
+
+
+class TestNotificationListener:
+    """测试 LISTEN 后台任务"""
+
+    def test_deliver_and_reconnect(self, monkeypatch):
+        """测试通知送达、断线后重连并再次调用 on_connect"""
+        received, connects = [], []
+        connections = [FakeListenConnection(['a', 'b']), FakeListenConnection(['c'])]
+        listener = NotificationListener(
+            'contract_types_changed', received.append,
+            on_connect=lambda: connects.append(len(received)),
+            retry_interval=0,
+        )
+
+        async def connect():
+            if connections:
+                return connections.pop(0)
+            await asyncio.sleep(3600)
+
+        monkeypatch.setattr(listener, '_connect', connect)
+
+        async def scenario():
+            await listener.start()
+            for _ in range(100):
+                if len(received) == 3:
+                    break
+                await asyncio.sleep(0.01)
+            await listener.stop()
+
+        asyncio.run(scenario())
+
+        assert received == ['a', 'b', 'c']
+        assert connects == [0, 2]
+        assert listener.stats()['reconnects'] == 2
@@ -0,0 +1,134 @@
+"""
+健康检查测试
+Test Health Checks
+"""
+
+import asyncio
+import time
+import pytest
+
+import utils.health as health_module
+from config import Config
+from utils.health import (
+    STATUS_DEGRADED,
+    STATUS_HEALTHY,
+    STATUS_STARTING,
+    STATUS_UNHEALTHY,
+    HealthMonitor,
+    check_disk,
+    check_postgres,
+)
+
+
+def make_monitor(**results) -> HealthMonitor:
+    """按 名称=(是否通过, 是否关键) 注册检查"""
+    monitor = HealthMonitor(interval=10, timeout=0.05)
+    for name, (ok, critical) in results.items():
+        async def check(ok=ok):
+            if not ok:
+                raise ConnectionError("down")
+            return {'probe': 'test'}
+        monitor.check(name, critical=critical)(check)
+    return monitor
+
+
+class TestHealthMonitor:
+    """测试缓存结果和整体状态"""
+
+    def test_starting_before_first_round(self):
+        """测试第一轮检查前为 starting"""
+        monitor = make_monitor(postgres=(True, True))
+
+        report = monitor.report()
+        assert report['status'] == STATUS_STARTING
+        assert report['checks']['postgres'] == {'status': 'pending'}
+        assert monitor.is_ok('postgres') is None
+
+    def test_healthy_with_age(self):
+        """测试全部通过时为 healthy，并返回结果的时间和附加信息"""
+        monitor = make_monitor(postgres=(True, True), redis=(True, False))
+        asyncio.run(monitor.run_once())
+
+        report = monitor.report()
+        assert report['status'] == STATUS_HEALTHY
+        assert report['checks']['postgres']['status'] == 'ok'
+        assert report['checks']['postgres']['probe'] == 'test'
+        assert report['checks']['postgres']['age_seconds'] >= 0
+
+    def test_non_critical_failure_degraded(self):
+        """测试非关键依赖失败时为 degraded"""
+        monitor = make_monitor(postgres=(True, True), redis=(False, False))
+        asyncio.run(monitor.run_once())
+
+        report = monitor.report()
+        assert report['status'] == STATUS_DEGRADED
+        assert report['checks']['redis']['status'] == 'fail'
+        assert report['checks']['redis']['error'] == 'down'
+
+    def test_critical_failure_unhealthy(self):
+        """测试关键依赖失败时为 unhealthy"""
+        monitor = make_monitor(postgres=(False, True), redis=(False, False))
+        asyncio.run(monitor.run_once())
+
+        assert monitor.report()['status'] == STATUS_UNHEALTHY
+
+    def test_timeout(self):
+        """测试超时记为失败"""
+        monitor = HealthMonitor(interval=10, timeout=0.01)
+
+        @monitor.check("slow")
+        async def slow():
+            await asyncio.sleep(1)
+
+        asyncio.run(monitor.run_once())
+        assert monitor.report()['checks']['slow']['error'].startswith("Timed out")
+
+    def test_stale_results(self, monkeypatch):
+        """测试结果长时间未更新时视为失败"""
+        monitor = make_monitor(postgres=(True, True))
+        asyncio.run(monitor.run_once())
+
+        later = time.monotonic() + 60
+        monkeypatch.setattr(health_module.time, 'monotonic', lambda: later)
+        report = monitor.report()
+        assert report['checks']['postgres']['status'] == 'stale'
+        assert report['status'] == STATUS_UNHEALTHY
+
+    def test_background_loop(self):
+        """测试 start 后立即执行第一轮，stop 后停止"""
+        monitor = make_monitor(postgres=(True, True))
+
+        async def scenario():
+            await monitor.start()
+            await asyncio.sleep(0.01)
+            await monitor.stop()
+
+        asyncio.run(scenario())
+        assert monitor.is_ok('postgres') is True
+
+
+class TestBuiltinChecks:
+    """测试内置检查"""
+
+    def test_postgres_passive_when_recent_success(self, monkeypatch):
+        """测试间隔内有成功事务时不查库"""
+        monkeypatch.setattr(health_module, 'last_transaction_success', lambda: time.monotonic())
+
+        async def fail():
+            raise AssertionError("should not borrow a connection")
+
+        monkeypatch.setattr(health_module.AsyncDatabasePool, 'get_pool', fail)
+        assert asyncio.run(check_postgres()) == {'probe': 'passive'}
+
+    def test_disk_free_space(self, monkeypatch, tmp_path):
+        """测试目录不存在时检查上级目录，剩余空间不足时失败"""
+        monkeypatch.setattr(Config, 'UPLOAD_DIR', str(tmp_path / 'uploads'))
+        monkeypatch.setattr(Config, 'HEALTH_MIN_FREE_DISK_MB', 0)
+
+        detail = asyncio.run(check_disk())
+        assert detail['exists'] is False
+        assert detail['free_mb'] >= 0
+
+        monkeypatch.setattr(Config, 'HEALTH_MIN_FREE_DISK_MB', 10 ** 12)
+        with pytest.raises(OSError):
+            asyncio.run(check_disk())
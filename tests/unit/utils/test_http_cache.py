@@ -0,0 +1,61 @@
+"""
+HTTP 条件请求工具测试
+Test Conditional GET Helpers
+"""
+
+from datetime import datetime, timezone
+
+from starlette.requests import Request
+
+from utils.http_cache import cache_headers, is_not_modified, make_etag
+
+
+def make_request(**headers) -> Request:
+    raw = [(k.replace('_', '-').lower().encode(), v.encode()) for k, v in headers.items()]
+    return Request({'type': 'http', 'method': 'GET', 'headers': raw})
+
+
+CHANGED_AT = datetime(2025, 12, 4, 8, 30, 15, 123456, tzinfo=timezone.utc)
+
+
+class TestConditionalGet:
+    """测试 ETag / Last-Modified 判断"""
+    
+    def test_headers(self):
+        """测试生成的验证头"""
+        headers = cache_headers(make_etag('contract-types', 42), CHANGED_AT)
+        
+        assert headers['ETag'] == '"contract-types-42"'
+        assert headers['Last-Modified'] == 'Thu, 04 Dec 2025 08:30:15 GMT'
+        assert headers['Cache-Control'] == 'no-cache'
+    
+    def test_if_none_match(self):
+        """测试 ETag 匹配（支持列表、W/ 前缀和 *）"""
+        etag = make_etag('contract-types', 42)
+        
+        assert is_not_modified(make_request(if_none_match='"contract-types-42"'), etag)
+        assert is_not_modified(make_request(if_none_match='"x", W/"contract-types-42"'), etag)
+        assert is_not_modified(make_request(if_none_match='*'), etag)
+        assert not is_not_modified(make_request(if_none_match='"contract-types-41"'), etag)
+        assert not is_not_modified(make_request(), etag)
+    
+    def test_if_modified_since(self):
+        """测试按秒比较修改时间"""
+        etag = make_etag('contract-types', 42)
+        
+        assert is_not_modified(
+            make_request(if_modified_since='Thu, 04 Dec 2025 08:30:15 GMT'), etag, CHANGED_AT
+        )
+        assert not is_not_modified(
+            make_request(if_modified_since='Thu, 04 Dec 2025 08:30:14 GMT'), etag, CHANGED_AT
+        )
+        assert not is_not_modified(make_request(if_modified_since='garbage'), etag, CHANGED_AT)
+    
+    def test_if_none_match_takes_precedence(self):
+        """测试同时带两个头时只看 If-None-Match"""
+        request = make_request(
+            if_none_match='"contract-types-41"',
+            if_modified_since='Thu, 04 Dec 2025 08:30:15 GMT',
+        )
+        
+        assert not is_not_modified(request, make_etag('contract-types', 42), CHANGED_AT)
@@ -0,0 +1,50 @@
+"""
+日志收集进程测试
+Test Log Collector
+"""
+
+import logging
+import logging.handlers
+import threading
+import time
+
+from utils.log_collector import LogCollector
+
+
+class ListHandler(logging.Handler):
+    def __init__(self, level=logging.DEBUG):
+        super().__init__(level)
+        self.records = []
+    
+    def emit(self, record):
+        self.records.append(record)
+
+
+class TestLogCollector:
+    """测试 worker → 收集进程的记录传输"""
+    
+    def test_records_from_socket_handler(self):
+        """测试 SocketHandler 发送的记录被还原并按级别分发"""
+        app, errors = ListHandler(), ListHandler(logging.ERROR)
+        collector = LogCollector('127.0.0.1', 0, handlers={'file': app, 'error': errors})
+        thread = threading.Thread(target=collector.serve_forever, daemon=True)
+        thread.start()
+        
+        sender = logging.handlers.SocketHandler(*collector.address)
+        try:
+            logger = logging.getLogger("test_log_collector.worker")
+            for level, msg, args in ((logging.INFO, "合同 %s 已处理", ("C-001",)), (logging.ERROR, "失败", None)):
+                sender.handle(logger.makeRecord(logger.name, level, __file__, 1, msg, args, None))
+            
+            for _ in range(200):
+                if collector.received == 2:
+                    break
+                time.sleep(0.01)
+        finally:
+            sender.close()
+            collector.shutdown()
+            thread.join(timeout=5)
+        
+        assert [r.getMessage() for r in app.records] == ["合同 C-001 已处理", "失败"]
+        assert [r.getMessage() for r in errors.records] == ["失败"]
+        assert app.records[0].name == "test_log_collector.worker"
@@ -0,0 +1,145 @@
+"""
+日志模块测试
+Test Logger
+"""
+
+import gzip
+import logging
+import logging.handlers
+import random
+import time
+from pathlib import Path
+
+import pytest
+
+from utils.logger import DailyRotatingFileHandler, LogDispatcher, SamplingFilter, setup_logger
+
+
+@pytest.fixture
+def captured(monkeypatch):
+    """截获共享 handler 实际写出的记录：{handler 名称: [消息]}"""
+    output = {}
+    for name, handler in LogDispatcher.handlers().items():
+        output[name] = []
+        monkeypatch.setattr(handler, 'emit', lambda record, name=name: output[name].append(record.getMessage()))
+    yield output
+
+
+def drain():
+    """停止后台线程（写完队列）再重新启动"""
+    LogDispatcher.stop()
+    LogDispatcher.start()
+
+
+class TestQueueLogging:
+    """测试经队列写出的日志"""
+    
+    def test_single_shared_queue_handler(self):
+        """测试每个 logger 只挂一个 QueueHandler，相同目标的 logger 共用"""
+        first = setup_logger("test_logger.shared_a")
+        second = setup_logger("test_logger.shared_b")
+        
+        assert len(first.handlers) == 1
+        assert isinstance(first.handlers[0], logging.handlers.QueueHandler)
+        assert first.handlers[0] is second.handlers[0]
+    
+    def test_records_reach_shared_handlers(self, captured):
+        """测试记录由后台线程写入文件和控制台，ERROR 同时写入错误日志"""
+        logger = setup_logger("test_logger.write")
+        
+        logger.info("合同 %s 已处理", "C-001")
+        logger.error("处理失败")
+        drain()
+        
+        assert captured['file'] == ["合同 C-001 已处理", "处理失败"]
+        assert captured['console'] == ["合同 C-001 已处理", "处理失败"]
+        assert captured['error'] == ["处理失败"]
+    
+    def test_targets(self, captured):
+        """测试 log_to_console=False 的 logger 只写文件"""
+        logger = setup_logger("test_logger.file_only", log_to_console=False)
+        
+        logger.warning("只写文件")
+        drain()
+        
+        assert captured['file'] == ["只写文件"]
+        assert captured['console'] == []
+    
+    def test_disabled_level_not_formatted(self, captured):
+        """测试级别未开启时不格式化参数、不入队"""
+        class Exploding:
+            def __str__(self):
+                raise AssertionError("should not be formatted")
+        
+        logger = setup_logger("test_logger.lazy", level="INFO")
+        logger.debug("value: %s", Exploding())
+        drain()
+        
+        assert captured['file'] == []
+
+
+def make_record(name="test", level=logging.INFO, msg="message", created=None):
+    record = logging.LogRecord(name, level, __file__, 1, msg, None, None)
+    if created is not None:
+        record.created = created
+    return record
+
+
+class TestDailyRotatingFileHandler:
+    """测试按日期命名、按大小轮转"""
+    
+    def test_size_rotation_with_compression(self, tmp_path):
+        """测试超过大小后轮转并压缩旧文件"""
+        handler = DailyRotatingFileHandler(tmp_path, 'app', max_bytes=60, backup_count=2, compress=True)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        
+        for i in range(6):
+            handler.emit(make_record(msg=f"line {i} " + "x" * 20))
+        handler.close()
+        
+        current = Path(handler.baseFilename)
+        assert current.name.startswith('app_') and current.suffix == '.log'
+        backups = sorted(p.name for p in tmp_path.iterdir() if p.name.endswith('.gz'))
+        assert backups == [current.name + '.1.gz', current.name + '.2.gz']
+        with gzip.open(tmp_path / backups[0], 'rt') as f:
+            assert 'line' in f.read()
+    
+    def test_switch_file_on_new_day(self, tmp_path, monkeypatch):
+        """测试跨过午夜后写入新日期的文件"""
+        handler = DailyRotatingFileHandler(tmp_path, 'app', max_bytes=0, backup_count=0)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        handler.emit(make_record(msg="today"))
+        first = handler.baseFilename
+        
+        tomorrow = handler._next_day + 60
+        monkeypatch.setattr(time, 'time', lambda: tomorrow)
+        handler.emit(make_record(msg="tomorrow", created=tomorrow))
+        handler.close()
+        
+        assert handler.baseFilename != first
+        assert Path(first).read_text(encoding='utf-8') == "today\n"
+        assert Path(handler.baseFilename).read_text(encoding='utf-8') == "tomorrow\n"
+
+
+class TestSamplingFilter:
+    """测试按 logger 采样"""
+    
+    def test_rates_apply_to_children_below_warning(self, monkeypatch):
+        """测试采样比例作用于子 logger，WARNING 及以上总是保留"""
+        sampling = SamplingFilter({'workflow': 0.0, 'workflow.audit': 1.0})
+        
+        assert not sampling.filter(make_record('workflow.nodes', logging.DEBUG))
+        assert sampling.filter(make_record('workflow.audit.steps', logging.DEBUG))
+        assert sampling.filter(make_record('workflow', logging.WARNING))
+        assert sampling.filter(make_record('api', logging.DEBUG))
+        assert sampling.dropped == 1
+    
+    def test_partial_rate(self, monkeypatch):
+        """测试按比例保留"""
+        sampling = SamplingFilter({'workflow': 0.25})
+        values = iter([0.1, 0.3, 0.2, 0.9])
+        monkeypatch.setattr(random, 'random', lambda: next(values))
+        
+        kept = [sampling.filter(make_record('workflow', logging.DEBUG)) for _ in range(4)]
+        
+        assert kept == [True, False, True, False]
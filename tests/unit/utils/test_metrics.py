@@ -0,0 +1,160 @@
+"""
+进程内指标测试
+Test Metrics
+"""
+
+import asyncio
+import math
+import pytest
+
+from utils.metrics import MetricsRegistry, instrument_methods
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+class TestMetricTypes:
+    """测试计数器 / 仪表 / 直方图"""
+
+    def test_counter_and_gauge_render(self, registry):
+        """测试带标签和不带标签的输出"""
+        requests = registry.counter('requests_total', 'Requests', ('route', 'status'))
+        requests.labels('/a', 200).inc()
+        requests.labels('/a', 200).inc(2)
+        in_flight = registry.gauge('in_flight', 'In flight')
+        in_flight.inc()
+        in_flight.inc()
+        in_flight.dec()
+
+        text = registry.render()
+
+        assert '# TYPE requests_total counter' in text
+        assert 'requests_total{route="/a",status="200"} 3' in text
+        assert 'in_flight 1' in text
+
+    def test_label_count_checked(self, registry):
+        """测试标签数量不符时报错"""
+        counter = registry.counter('c_total', 'C', ('route',))
+        with pytest.raises(ValueError):
+            counter.labels('/a', 'extra')
+
+    def test_same_name_returns_same_metric(self, registry):
+        """测试同名指标只注册一次，类型冲突时报错"""
+        first = registry.counter('c_total', 'C', ('route',))
+        assert registry.counter('c_total', 'C', ('route',)) is first
+        with pytest.raises(ValueError):
+            registry.gauge('c_total', 'C', ('route',))
+
+    def test_label_value_escaped(self, registry):
+        """测试标签值中的引号和换行被转义"""
+        registry.gauge('g', 'G', ('name',)).labels('a"b\nc').set(1)
+        assert 'g{name="a\\"b\\nc"} 1' in registry.render()
+
+    def test_histogram_buckets_cumulative(self, registry):
+        """测试桶计数累计输出，边界值落入 le 等于它的桶"""
+        histogram = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+
+        text = registry.render()
+
+        assert 'latency_seconds_bucket{le="0.1"} 2' in text
+        assert 'latency_seconds_bucket{le="1"} 3' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 4' in text
+        assert 'latency_seconds_count 4' in text
+        assert 'latency_seconds_sum 3.65' in text
+
+    def test_histogram_quantiles(self, registry):
+        """测试按桶插值估计分位数"""
+        histogram = registry.histogram('latency_seconds', 'Latency', buckets=(0.01, 0.1, 1.0))
+        child = histogram.labels()
+        assert math.isnan(child.quantile(0.5))
+
+        for _ in range(90):
+            histogram.observe(0.005)
+        for _ in range(10):
+            histogram.observe(0.5)
+
+        assert child.quantile(0.5) == pytest.approx(0.01 * 50 / 90)
+        assert 0.1 < child.quantile(0.99) <= 1.0
+        assert 'latency_seconds_quantile{quantile="0.5"}' in registry.render()
+
+    def test_histogram_timer(self, registry):
+        """测试计时上下文管理器"""
+        histogram = registry.histogram('op_seconds', 'Op', ('op',))
+        with histogram.labels('x').time():
+            pass
+
+        assert 'op_seconds_count{op="x"} 1' in registry.render()
+
+
+class TestCollectors:
+    """测试抓取回调"""
+
+    def test_on_collect_runs_before_render(self, registry):
+        """测试抓取时把外部状态同步到指标"""
+        size = registry.gauge('pool_size', 'Pool size')
+        state = {'size': 3}
+        registry.on_collect(lambda: size.set(state['size']))
+
+        assert 'pool_size 3' in registry.render()
+        state['size'] = 5
+        assert 'pool_size 5' in registry.render()
+
+    def test_failing_collector_isolated(self, registry):
+        """测试单个回调失败不影响输出"""
+        registry.gauge('g', 'G').set(1)
+
+        def broken():
+            raise RuntimeError("boom")
+
+        registry.on_collect(broken)
+        assert 'g 1' in registry.render()
+
+
+class TestInstrumentMethods:
+    """测试 DAO 方法耗时埋点"""
+
+    def test_public_methods_timed(self, registry):
+        """测试同步 / async 公开方法被记录，生成器和私有方法保持不变"""
+        duration = registry.histogram('dao_seconds', 'DAO', ('dao', 'method'))
+
+        @instrument_methods(duration)
+        class FakeDAO:
+            def get(self, key):
+                return self._lookup(key)
+
+            async def aget(self, key):
+                return key
+
+            def iter_all(self):
+                yield 1
+
+            def _lookup(self, key):
+                return key
+
+        dao = FakeDAO()
+        assert dao.get('a') == 'a'
+        assert asyncio.run(dao.aget('b')) == 'b'
+        assert list(dao.iter_all()) == [1]
+
+        text = registry.render()
+        assert 'dao_seconds_count{dao="FakeDAO",method="get"} 1' in text
+        assert 'dao_seconds_count{dao="FakeDAO",method="aget"} 1' in text
+        assert 'method="iter_all"' not in text
+        assert 'method="_lookup"' not in text
+
+    def test_failures_timed(self, registry):
+        """测试抛出异常的调用同样被记录"""
+        duration = registry.histogram('dao_seconds', 'DAO', ('dao', 'method'))
+
+        @instrument_methods(duration, component='dao')
+        class FakeDAO:
+            def fail(self):
+                raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            FakeDAO().fail()
+        assert 'dao_seconds_count{dao="dao",method="fail"} 1' in registry.render()
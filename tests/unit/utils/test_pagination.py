@@ -0,0 +1,49 @@
+"""
+分页工具测试
+Test Keyset Pagination Helpers
+"""
+
+import pytest
+
+from utils.pagination import decode_cursor, encode_cursor, escape_like, parse_fields
+
+
+class TestCursor:
+    """测试游标编码"""
+    
+    def test_round_trip(self):
+        """测试编码后可以原样解析"""
+        cursor = encode_cursor((99, '其他'))
+        
+        assert '=' not in cursor
+        assert decode_cursor(cursor, (int, str)) == (99, '其他')
+    
+    @pytest.mark.parametrize('cursor', ['not-base64!', encode_cursor((1,)), encode_cursor(('1', 'A'))])
+    def test_invalid(self, cursor):
+        """测试格式或类型不正确的游标"""
+        with pytest.raises(ValueError, match="Invalid cursor"):
+            decode_cursor(cursor, (int, str))
+
+
+class TestFields:
+    """测试稀疏字段解析"""
+    
+    def test_parse(self):
+        """测试按允许的字段顺序返回"""
+        assert parse_fields('type_name, id', ('id', 'type_code', 'type_name')) == ('id', 'type_name')
+        assert parse_fields(None, ('id',)) is None
+    
+    def test_unknown(self):
+        """测试未知字段"""
+        with pytest.raises(ValueError, match="Unknown fields: password"):
+            parse_fields('id,password', ('id',))
+    
+    def test_empty(self):
+        """测试指定了参数但没有字段时报错（而不是返回空元组）"""
+        for fields in ('', ',', ' , '):
+            with pytest.raises(ValueError, match="fields must not be empty"):
+                parse_fields(fields, ('id',))
+    
+    def test_escape_like(self):
+        """测试转义 LIKE 通配符"""
+        assert escape_like('50%_a\\b') == '50\\%\\_a\\\\b'
@@ -0,0 +1,60 @@
+"""
+生产模式启动器测试
+Test Prefork Server
+"""
+
+import pytest
+
+from config import Config
+from utils.prefork import fastest_implementations, resolve_workers, split_pool_budget
+
+
+class TestSplitPoolBudget:
+    """测试在 worker 之间分配连接数"""
+
+    def test_budget_caps_pool_size(self):
+        """测试预算不足时缩小每个 worker 的连接池"""
+        budget = split_pool_budget(8, max_connections=90, pool_min=2, pool_max=10, listener=True)
+
+        # 90 // 8 = 11 个连接：1 个 LISTEN + 2 个连接池各 5 个
+        assert budget.max_size == 5
+        assert budget.min_size == 2
+        assert budget.per_worker == 11
+        assert budget.per_worker * 8 <= 90
+
+    def test_pool_max_respected(self):
+        """测试预算充足时不超过 DB_POOL_MAX_SIZE"""
+        budget = split_pool_budget(2, max_connections=200, pool_min=2, pool_max=10, listener=False)
+
+        assert budget.max_size == 10
+        assert budget.per_worker == 20
+
+    def test_min_not_above_max(self):
+        """测试最小连接数不超过分到的最大连接数"""
+        budget = split_pool_budget(10, max_connections=50, pool_min=4, pool_max=10, listener=True)
+
+        assert budget.max_size == 2
+        assert budget.min_size == 2
+
+    def test_budget_too_small(self):
+        """测试预算不够每个 worker 至少一个连接时报错"""
+        with pytest.raises(ValueError):
+            split_pool_budget(16, max_connections=20, pool_min=1, pool_max=10, listener=True)
+
+
+class TestWorkerSettings:
+    """测试 worker 数量和实现选择"""
+
+    def test_resolve_workers(self, monkeypatch):
+        """测试 0 表示 CPU 核数"""
+        monkeypatch.setattr(Config, 'API_WORKERS', 0)
+        monkeypatch.setattr('os.cpu_count', lambda: 6)
+
+        assert resolve_workers() == 6
+        assert resolve_workers(3) == 3
+
+    def test_fastest_implementations(self, monkeypatch):
+        """测试未安装 uvloop / httptools 时回退到标准实现"""
+        monkeypatch.setattr('importlib.util.find_spec', lambda name: None)
+
+        assert fastest_implementations() == ("asyncio", "h11")
@@ -0,0 +1,76 @@
+"""
+JSON 响应工具测试
+Test JSON Responses
+"""
+
+import asyncio
+
+import orjson
+
+from utils.responses import ResponseSnapshots, dumps, ndjson_chunks
+
+
+class TestResponseSnapshots:
+    """测试响应体缓存"""
+    
+    def test_reuse_for_same_source(self):
+        """测试数据对象不变时不重新编码"""
+        snapshots = ResponseSnapshots()
+        data = [{'type_code': 'SALES'}]
+        builds = []
+        
+        def build():
+            builds.append(1)
+            return {'success': True, 'data': data}
+        
+        first = snapshots.get_or_encode('all', data, build)
+        second = snapshots.get_or_encode('all', data, build)
+        
+        assert first is second
+        assert len(builds) == 1
+        assert orjson.loads(first) == {'success': True, 'data': data}
+    
+    def test_reencode_for_new_source(self):
+        """测试缓存重新加载出新对象后重新编码（即使内容相等）"""
+        snapshots = ResponseSnapshots()
+        
+        snapshots.get_or_encode('all', [1], lambda: [1])
+        body = snapshots.get_or_encode('all', [1, 2], lambda: [1, 2])
+        
+        assert body == b'[1,2]'
+        assert snapshots.stats()['hits'] == 1  # 条目命中但对象不同
+    
+    def test_dumps_non_ascii(self):
+        """测试中文直接输出为 UTF-8"""
+        assert dumps({'type_name': '销售合同'}) == '{"type_name":"销售合同"}'.encode()
+
+
+class TestNDJSONChunks:
+    """测试 NDJSON 分块编码"""
+    
+    def test_one_chunk_per_batch(self):
+        """测试每批编码为一块，空批次被跳过"""
+        async def batches():
+            yield [{'id': 1}, {'id': 2}]
+            yield []
+            yield [{'id': 3, 'name': '销售'}]
+        
+        async def collect():
+            return [chunk async for chunk in ndjson_chunks(batches())]
+        
+        chunks = asyncio.run(collect())
+        
+        assert len(chunks) == 2
+        assert chunks[0] == b'{"id":1}\n{"id":2}\n'
+        assert orjson.loads(chunks[1].splitlines()[0]) == {'id': 3, 'name': '销售'}
+    
+    def test_to_item(self):
+        """测试使用 to_item 转换每条数据"""
+        async def batches():
+            yield [(1, 'SALES')]
+        
+        async def collect():
+            to_item = lambda row: {'id': row[0], 'type_code': row[1]}
+            return b"".join([chunk async for chunk in ndjson_chunks(batches(), to_item)])
+        
+        assert asyncio.run(collect()) == b'{"id":1,"type_code":"SALES"}\n'
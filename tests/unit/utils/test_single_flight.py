@@ -0,0 +1,138 @@
+"""
+并发请求合并测试
+Test Single Flight
+"""
+
+import asyncio
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from utils.single_flight import SingleFlight, single_flight
+
+
+class TestSingleFlight:
+    """测试按键合并"""
+
+    def test_concurrent_calls_share_result(self):
+        """测试进行中的相同调用只执行一次，不同键各自执行"""
+        flights = SingleFlight('test')
+        calls = []
+
+        async def load(key):
+            calls.append(key)
+            await asyncio.sleep(0.01)
+            return {'key': key}
+
+        async def scenario():
+            return await asyncio.gather(
+                flights.do('a', lambda: load('a')),
+                flights.do('a', lambda: load('a')),
+                flights.do('b', lambda: load('b')),
+            )
+
+        first, second, other = asyncio.run(scenario())
+
+        assert first is second
+        assert other == {'key': 'b'}
+        assert calls == ['a', 'b']
+        assert flights.stats() == {'in_flight': 0, 'executed': 2, 'shared': 1, 'shared_ratio': 0.3333}
+
+    def test_result_not_cached(self):
+        """测试调用结束后不保留结果，下一次调用重新执行"""
+        flights = SingleFlight('test')
+        calls = []
+
+        async def load():
+            calls.append(1)
+            return len(calls)
+
+        async def scenario():
+            return await flights.do('a', load), await flights.do('a', load)
+
+        assert asyncio.run(scenario()) == (1, 2)
+
+    def test_exception_shared(self):
+        """测试异常传给所有等待方，且不影响下一次调用"""
+        flights = SingleFlight('test')
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ConnectionError("db down")
+
+        async def scenario():
+            results = await asyncio.gather(
+                flights.do('a', fail), flights.do('a', fail), return_exceptions=True,
+            )
+            assert flights.in_flight() == 0
+            return results
+
+        first, second = asyncio.run(scenario())
+        assert isinstance(first, ConnectionError) and first is second
+
+    def test_leader_cancel_does_not_affect_followers(self):
+        """测试发起调用的请求被取消时，其他等待方仍然得到结果"""
+        flights = SingleFlight('test')
+
+        async def load():
+            await asyncio.sleep(0.01)
+            return 'value'
+
+        async def scenario():
+            leader = asyncio.create_task(flights.do('a', load))
+            await asyncio.sleep(0)
+            follower = asyncio.create_task(flights.do('a', load))
+            await asyncio.sleep(0)
+            leader.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await leader
+            return await follower
+
+        assert asyncio.run(scenario()) == 'value'
+
+
+class TestDecorator:
+    """测试装饰器"""
+
+    def test_keyed_by_arguments(self):
+        """测试按参数合并"""
+        calls = []
+
+        @single_flight()
+        async def load(code, active_only=True):
+            calls.append((code, active_only))
+            await asyncio.sleep(0.01)
+            return code
+
+        async def scenario():
+            return await asyncio.gather(
+                load('SALES'), load('SALES'), load('SALES', active_only=False),
+            )
+
+        assert asyncio.run(scenario()) == ['SALES', 'SALES', 'SALES']
+        assert calls == [('SALES', True), ('SALES', False)]
+        assert load.flights.stats()['shared'] == 1
+
+    def test_request_requires_key(self):
+        """测试参数中有 Request 时必须提供 key"""
+        with pytest.raises(TypeError):
+            @single_flight()
+            async def endpoint(code: str, request: Request):
+                return code
+
+        @single_flight(key=lambda code, request: (code, request.headers.get('if-none-match')))
+        async def keyed(code: str, request: Request):
+            return code
+
+    def test_endpoint_signature_preserved(self):
+        """测试用于端点时 FastAPI 仍按原函数签名解析参数"""
+        app = FastAPI()
+
+        @app.get("/items/{code}")
+        @single_flight()
+        async def get_item(code: str, limit: int = 10):
+            return {"code": code, "limit": limit}
+
+        response = TestClient(app).get("/items/SALES?limit=3")
+
+        assert response.json() == {"code": "SALES", "limit": 3}
@@ -0,0 +1,90 @@
+"""
+请求分阶段计时测试
+Test Request Phase Timing
+"""
+
+import asyncio
+import time
+
+from utils.metrics import MetricsRegistry, instrument_methods
+from utils.timing import (
+    PHASE_APP,
+    PHASE_DB,
+    PHASE_SERIALIZE,
+    PHASE_TOTAL,
+    begin_request,
+    current_timings,
+    end_request,
+    record_phase,
+    timed_phase,
+)
+
+
+class TestRequestTimings:
+    """测试阶段累计和输出格式"""
+
+    def test_record_and_finish(self):
+        """测试同一阶段累加次数，finish 补齐 app 和 total"""
+        timings, token = begin_request()
+        try:
+            record_phase(PHASE_DB, 0.002)
+            record_phase(PHASE_DB, 0.001)
+            with timed_phase(PHASE_SERIALIZE):
+                pass
+        finally:
+            end_request(token)
+        total = timings.finish()
+
+        assert timings.phases[PHASE_DB] == [0.003, 2]
+        assert timings.get(PHASE_TOTAL) == total
+        assert timings.get(PHASE_APP) >= 0
+
+        header = timings.server_timing()
+        assert header.startswith('db;dur=3.000;desc="DB queries x2"')
+        assert 'total;dur=' in header
+        assert 'db=3.0ms×2' in timings.summary()
+        assert 'total=' not in timings.summary()
+
+    def test_outside_request_ignored(self):
+        """测试请求之外记录不报错也不保留"""
+        assert current_timings() is None
+        record_phase(PHASE_DB, 1.0)
+        assert current_timings() is None
+
+    def test_shared_with_child_tasks(self):
+        """测试请求内创建的任务写入同一个计时对象"""
+        async def query():
+            record_phase(PHASE_DB, 0.001)
+
+        async def scenario():
+            timings, token = begin_request()
+            try:
+                await asyncio.gather(asyncio.create_task(query()), asyncio.create_task(query()))
+            finally:
+                end_request(token)
+            return timings
+
+        timings = asyncio.run(scenario())
+        assert timings.phases[PHASE_DB][1] == 2
+        assert current_timings() is None
+
+
+class TestInstrumentedPhase:
+    """测试 DAO 埋点同时记录请求阶段"""
+
+    def test_dao_time_added_to_request(self):
+        """测试 phase 参数把方法耗时计入当前请求"""
+        duration = MetricsRegistry().histogram('dao_seconds', 'DAO', ('dao', 'method'))
+
+        @instrument_methods(duration, phase=PHASE_DB)
+        class FakeDAO:
+            def get(self):
+                time.sleep(0.001)
+
+        timings, token = begin_request()
+        try:
+            FakeDAO().get()
+        finally:
+            end_request(token)
+
+        assert timings.get(PHASE_DB) >= 0.001
@@ -0,0 +1,93 @@
+"""
+启动预热测试
+Test Warm-up
+"""
+
+import asyncio
+import pytest
+
+from config import Config
+from utils.warmup import WarmUp
+
+
+@pytest.fixture(autouse=True)
+def fast_retry(monkeypatch):
+    monkeypatch.setattr(Config, 'WARMUP_RETRY_INTERVAL', 0.01)
+
+
+class TestWarmUp:
+    """测试预热步骤和就绪状态"""
+
+    def test_steps_run_in_order(self):
+        """测试全部步骤成功后就绪"""
+        warm_up = WarmUp()
+        calls = []
+
+        @warm_up.step("pool")
+        async def pool():
+            calls.append("pool")
+
+        @warm_up.step("cache")
+        async def cache():
+            calls.append("cache")
+
+        assert warm_up.status()['steps']['pool']['error'] == 'pending'
+        assert asyncio.run(warm_up.run()) is True
+        assert calls == ["pool", "cache"]
+        assert warm_up.ready
+        assert warm_up.status()['steps']['cache']['ok']
+
+    def test_failed_step_retried_in_background(self):
+        """测试失败时不就绪，后台只重试失败的步骤直到成功"""
+        warm_up = WarmUp()
+        calls = {"pool": 0, "cache": 0}
+
+        @warm_up.step("pool")
+        async def pool():
+            calls["pool"] += 1
+
+        @warm_up.step("cache")
+        async def cache():
+            calls["cache"] += 1
+            if calls["cache"] < 3:
+                raise ConnectionError("database unavailable")
+
+        async def scenario():
+            assert await warm_up.run() is False
+            assert warm_up.status()['steps']['cache']['error'] == "database unavailable"
+            for _ in range(100):
+                if warm_up.ready:
+                    break
+                await asyncio.sleep(0.01)
+
+        asyncio.run(scenario())
+        assert warm_up.ready
+        assert calls == {"pool": 1, "cache": 3}
+
+    def test_step_timeout(self):
+        """测试超时的步骤记为失败"""
+        warm_up = WarmUp()
+
+        @warm_up.step("slow")
+        async def slow():
+            await asyncio.sleep(1)
+
+        async def scenario():
+            ready = await warm_up.run(timeout=0.01)
+            await warm_up.stop()
+            return ready
+
+        assert asyncio.run(scenario()) is False
+        assert warm_up.status()['steps']['slow']['ok'] is False
+
+    def test_stop_marks_not_ready(self):
+        """测试关闭时立即摘除就绪状态"""
+        warm_up = WarmUp()
+
+        async def scenario():
+            await warm_up.run()
+            assert warm_up.ready
+            await warm_up.stop()
+
+        asyncio.run(scenario())
+        assert not warm_up.ready
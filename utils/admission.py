@@ -0,0 +1,276 @@
+"""
+准入控制
+Admission Control
+
+突发流量下每个请求都去抢数据库连接，连接池的等待队列没有上限，所有请求的延迟一起升高，
+最后大面积超时。这里在路由层限制并发：
+
+- 所有受限路由合计最多 ADMISSION_MAX_CONCURRENT 个请求同时处理（0 表示连接池大小的 2 倍：
+  缓存命中的读请求不占用连接，很快就会释放名额）
+- 每个路由还可以单独限制并发（重查询默认 ADMISSION_HEAVY_LIMIT，ADMISSION_ROUTE_LIMITS 按路由名覆盖）
+- 没有名额时进入该路由的等待队列（最多 ADMISSION_QUEUE_SIZE 个），最长等待 ADMISSION_QUEUE_TIMEOUT 秒
+- 队列已满或等待超时立即返回 503 + Retry-After，不再占用连接池的等待队列
+- 名额释放时按优先级分配：缓存读 > 写入 > 列表 / 导出 / 导入等重查询，同一优先级先到先得
+
+名额覆盖整个响应（包括流式导出的响应体），健康检查、/metrics 等未标记的路由不受限制。
+
+用法:
+    @router.get("/list")
+    @admission.limit(PRIORITY_HEAVY)
+    async def list_contract_types(...): ...
+
+    app.include_router(router)
+    admission.install(app)      # 注册全部路由之后调用
+"""
+
+import asyncio
+import time
+from typing import Callable, Optional
+
+from fastapi import FastAPI, HTTPException
+
+from config import Config
+from utils.logger import get_logger
+from utils.metrics import metrics
+from utils.timing import PHASE_QUEUE, record_phase
+
+logger = get_logger(__name__)
+
+# 优先级（数值越小越先获得名额）
+PRIORITY_READ = 0      # 缓存读：/all、/{type_code}
+PRIORITY_WRITE = 1     # 单行写入
+PRIORITY_HEAVY = 2     # 列表、导出、导入：长时间占用连接
+
+_PRIORITY_NAMES = ('read', 'write', 'heavy')
+
+admission_active = metrics.gauge('admission_active_requests', 'Requests holding an admission slot', ('route',))
+admission_waiting = metrics.gauge('admission_waiting_requests', 'Requests waiting for an admission slot', ('route',))
+admission_rejected = metrics.counter('admission_rejected_total', 'Requests shed with 503', ('route', 'reason'))
+admission_wait = metrics.histogram('admission_wait_seconds', 'Time spent waiting for an admission slot', ('route',))
+
+
+class _Route:
+    """一个受限路由的并发计数"""
+
+    __slots__ = ('name', 'priority', 'limit', 'active', 'waiting')
+
+    def __init__(self, name: str, priority: int, limit: int):
+        self.name = name
+        self.priority = priority
+        self.limit = limit          # 0 表示只受总并发限制
+        self.active = 0
+        self.waiting = 0
+
+    def has_room(self) -> bool:
+        return self.limit <= 0 or self.active < self.limit
+
+
+class _Waiter:
+    __slots__ = ('route', 'future', 'queued')
+
+    def __init__(self, route: _Route, future: asyncio.Future):
+        self.route = route
+        self.future = future
+        self.queued = True
+
+
+class AdmissionController:
+    """
+    按优先级分配并发名额的准入控制器
+
+    参数为 None 时使用 Config 中的值（每次使用时读取，prefork worker 修改连接池大小后同样生效）。
+    """
+
+    def __init__(
+        self,
+        max_concurrent: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        queue_timeout: Optional[float] = None,
+        retry_after: Optional[int] = None,
+    ):
+        self._max_concurrent = max_concurrent
+        self._queue_size = queue_size
+        self._queue_timeout = queue_timeout
+        self._retry_after = retry_after
+        self._routes: dict[str, _Route] = {}
+        self._queues: list[list[_Waiter]] = [[] for _ in _PRIORITY_NAMES]
+        self._active = 0
+
+    # ---------- 配置 ----------
+
+    @property
+    def capacity(self) -> int:
+        if self._max_concurrent is not None:
+            return self._max_concurrent
+        return Config.ADMISSION_MAX_CONCURRENT or 2 * Config.DB_POOL_MAX_SIZE
+
+    @property
+    def queue_size(self) -> int:
+        return Config.ADMISSION_QUEUE_SIZE if self._queue_size is None else self._queue_size
+
+    @property
+    def queue_timeout(self) -> float:
+        return Config.ADMISSION_QUEUE_TIMEOUT if self._queue_timeout is None else self._queue_timeout
+
+    @property
+    def retry_after(self) -> int:
+        return Config.ADMISSION_RETRY_AFTER if self._retry_after is None else self._retry_after
+
+    # ---------- 注册 ----------
+
+    @staticmethod
+    def limit(priority: int, max_concurrent: Optional[int] = None) -> Callable:
+        """
+        标记端点的优先级（装饰器，放在 @router.get 等之下；函数本身不变）
+
+        Args:
+            priority: PRIORITY_READ / PRIORITY_WRITE / PRIORITY_HEAVY
+            max_concurrent: 该路由的并发上限（默认：重查询为 ADMISSION_HEAVY_LIMIT，其余只受总并发限制）
+        """
+        def decorate(func: Callable) -> Callable:
+            func.__admission__ = (priority, max_concurrent)
+            return func
+        return decorate
+
+    def route(self, name: str, priority: int, max_concurrent: Optional[int] = None) -> _Route:
+        """按名称注册（或取得）受限路由；ADMISSION_ROUTE_LIMITS 中的配置优先"""
+        route = self._routes.get(name)
+        if route is None:
+            if max_concurrent is None:
+                max_concurrent = Config.ADMISSION_HEAVY_LIMIT if priority == PRIORITY_HEAVY else 0
+            limit = Config.get_admission_route_limits().get(name, max_concurrent)
+            route = self._routes[name] = _Route(name, priority, limit)
+        return route
+
+    def install(self, app: FastAPI) -> int:
+        """为所有标记过的端点包装准入控制，返回包装的路由数量"""
+        installed = 0
+        for app_route in app.routes:
+            spec = getattr(getattr(app_route, 'endpoint', None), '__admission__', None)
+            if spec is None:
+                continue
+            route = self.route(app_route.name, *spec)
+            app_route.app = self._wrap(app_route.app, route)
+            installed += 1
+        logger.info("🚦 Admission control on %d routes (max %d concurrent)", installed, self.capacity)
+        return installed
+
+    def _wrap(self, asgi_app: Callable, route: _Route) -> Callable:
+        async def admitted_app(scope, receive, send):
+            waited = await self.acquire(route)
+            if waited:
+                record_phase(PHASE_QUEUE, waited)
+            try:
+                await asgi_app(scope, receive, send)
+            finally:
+                self.release(route)
+        return admitted_app
+
+    # ---------- 名额 ----------
+
+    async def acquire(self, route: _Route) -> float:
+        """
+        取得一个名额，返回排队等待的秒数（立即取得时为 0）
+
+        Raises:
+            HTTPException: 503（队列已满或等待超时），带 Retry-After
+        """
+        if self._active < self.capacity and route.has_room():
+            self._grant(route)
+            return 0.0
+        if route.waiting >= self.queue_size:
+            self._reject(route, 'queue_full')
+
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(route, loop.create_future())
+        self._queues[route.priority].append(waiter)
+        route.waiting += 1
+        expire = loop.call_later(self.queue_timeout, self._expire, waiter)
+        start = time.perf_counter()
+        try:
+            await waiter.future
+        except asyncio.TimeoutError:
+            self._reject(route, 'timeout')
+        except asyncio.CancelledError:
+            # 客户端断开：已经分到名额时归还，否则退出队列
+            future = waiter.future
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self.release(route)
+            else:
+                self._dequeue(waiter)
+            raise
+        finally:
+            expire.cancel()
+        waited = time.perf_counter() - start
+        admission_wait.labels(route.name).observe(waited)
+        return waited
+
+    def release(self, route: _Route) -> None:
+        route.active -= 1
+        self._active -= 1
+        self._dispatch()
+
+    def _grant(self, route: _Route) -> None:
+        route.active += 1
+        self._active += 1
+
+    def _dispatch(self) -> None:
+        """按优先级把空出的名额分给等待者（路由已达上限的等待者跳过）"""
+        capacity = self.capacity
+        for queue in self._queues:
+            index = 0
+            while index < len(queue) and self._active < capacity:
+                waiter = queue[index]
+                if not waiter.route.has_room():
+                    index += 1
+                    continue
+                self._dequeue(waiter)
+                self._grant(waiter.route)
+                waiter.future.set_result(None)
+            if self._active >= capacity:
+                return
+
+    def _dequeue(self, waiter: _Waiter) -> None:
+        if waiter.queued:
+            waiter.queued = False
+            waiter.route.waiting -= 1
+            self._queues[waiter.route.priority].remove(waiter)
+
+    def _expire(self, waiter: _Waiter) -> None:
+        if not waiter.future.done():
+            self._dequeue(waiter)
+            waiter.future.set_exception(asyncio.TimeoutError())
+
+    def _reject(self, route: _Route, reason: str) -> None:
+        admission_rejected.labels(route.name, reason).inc()
+        raise HTTPException(
+            status_code=503,
+            detail=f"Server busy ({route.name}: {reason.replace('_', ' ')}), please retry later",
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+    def stats(self) -> dict:
+        return {
+            'capacity': self.capacity,
+            'active': self._active,
+            'routes': {
+                name: {
+                    'priority': _PRIORITY_NAMES[route.priority],
+                    'limit': route.limit or None,
+                    'active': route.active,
+                    'waiting': route.waiting,
+                }
+                for name, route in self._routes.items()
+            },
+        }
+
+
+# 全局实例（main.py 中 install）
+admission = AdmissionController()
+
+
+@metrics.on_collect
+def _collect_admission_metrics() -> None:
+    for name, route in admission._routes.items():
+        admission_active.labels(name).set(route.active)
+        admission_waiting.labels(name).set(route.waiting)
@@ -0,0 +1,111 @@
+"""
+批量加载器
+Batch Loader
+
+DataLoader 模式：同一轮事件循环中发起的单键查询先登记，本轮结束后
+去重合并为一次批量查询（例如 WHERE type_code = ANY(%s)），再把结果分发给各个调用方。
+并发请求各自查询同一批键时，也只会产生一次数据库往返。
+
+只合并同一时刻的查询，不缓存结果；需要缓存时在外层使用 ContractTypeCache 等缓存。
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable, Iterable, Optional
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class BatchLoader:
+    """
+    按事件循环轮次合并的批量加载器
+
+    用法:
+        async def load_types(codes: list[str]) -> dict[str, ContractType]:
+            async with async_db_transaction(readonly=True) as conn:
+                return await AsyncContractTypeDAO(conn).get_by_codes(codes)
+
+        loader = BatchLoader(load_types)
+        sales, lease = await asyncio.gather(loader.load('SALES'), loader.load('LEASE'))  # 一次查询
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[list], Awaitable[dict]],
+        max_batch_size: Optional[int] = None,
+        default: Any = None,
+    ):
+        """
+        Args:
+            batch_fn: 批量查询函数，参数为去重后的键列表，返回 {键: 值}
+            max_batch_size: 单次批量查询最多的键数，超过后拆分为多次查询
+            default: 结果中缺少的键返回的值
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.default = default
+        self._pending: dict[Hashable, asyncio.Future] = {}
+        self._scheduled = False
+        self._tasks: set[asyncio.Task] = set()
+        self._requests = 0
+        self._keys = 0
+        self._batches = 0
+
+    async def load(self, key: Hashable) -> Any:
+        """加载单个键（与同一轮中的其他键合并查询）"""
+        self._requests += 1
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._pending[key] = loop.create_future()
+            if not self._scheduled:
+                self._scheduled = True
+                loop.call_soon(self._dispatch)
+        # shield：某个调用方被取消时不影响等待同一个键的其他调用方
+        return await asyncio.shield(future)
+
+    async def load_many(self, keys: Iterable[Hashable]) -> list:
+        """加载多个键，按传入顺序返回"""
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def _dispatch(self) -> None:
+        batch, self._pending = self._pending, {}
+        self._scheduled = False
+
+        keys = list(batch)
+        size = self.max_batch_size or len(keys)
+        loop = asyncio.get_running_loop()
+        for start in range(0, len(keys), size):
+            chunk = {key: batch[key] for key in keys[start:start + size]}
+            task = loop.create_task(self._run(chunk))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: dict) -> None:
+        self._batches += 1
+        self._keys += len(batch)
+        try:
+            results = await self.batch_fn(list(batch))
+        except asyncio.CancelledError:
+            for future in batch.values():
+                future.cancel()
+            raise
+        except Exception as e:
+            logger.debug("Batch load of %d keys failed: %s", len(batch), e)
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(results.get(key, self.default))
+
+    def stats(self) -> dict:
+        """调用次数 / 实际查询的键数 / 批量查询次数"""
+        return {
+            'requests': self._requests,
+            'keys': self._keys,
+            'batches': self._batches,
+        }
@@ -0,0 +1,349 @@
+"""
+缓存模块
+Cache
+
+- LocalCache: 进程内缓存，带 TTL 和容量上限（LRU 淘汰），记录命中/未命中/淘汰统计
+- RedisCache: 多个 worker / 主机共享的 Redis 缓存层，键带版本号，通过 pub/sub 广播失效
+"""
+
+import asyncio
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from utils.logger import get_logger
+from utils.redis_client import REDIS_ERRORS, RedisClient
+
+logger = get_logger(__name__)
+
+
+# 缓存未命中的标记（缓存值本身可以是 None）
+MISSING = object()
+
+
+class LocalCache:
+    """
+    线程安全的 TTL + LRU 缓存
+    
+    用法:
+        cache = LocalCache(ttl=300, max_size=1000)
+        cache.set('key', value)
+        value = cache.get('key')
+        if value is MISSING:
+            ...
+    """
+    
+    def __init__(self, ttl: float, max_size: int):
+        """
+        Args:
+            ttl: 默认过期时间（秒）
+            max_size: 最多保存的条目数，超出时淘汰最久未使用的条目
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+    
+    def get(self, key: Hashable) -> Any:
+        """获取缓存值，不存在或已过期时返回 MISSING"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self._misses += 1
+                return MISSING
+            
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self._expirations += 1
+                self._misses += 1
+                return MISSING
+            
+            self._data.move_to_end(key)
+            self._hits += 1
+            return value
+    
+    def peek(self, key: Hashable) -> Any:
+        """读取缓存值但不计入统计、不更新 LRU 顺序"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] <= time.monotonic():
+                return MISSING
+            return item[1]
+    
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """写入缓存值"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self._evictions += 1
+    
+    def delete(self, *keys: Hashable) -> int:
+        """删除指定条目，返回实际删除的数量"""
+        removed = 0
+        with self._lock:
+            for key in keys:
+                if self._data.pop(key, None) is not None:
+                    removed += 1
+            self._invalidations += removed
+        return removed
+    
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._invalidations += len(self._data)
+            self._data.clear()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def stats(self) -> dict:
+        """命中 / 未命中 / 淘汰统计"""
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_ratio': round(self._hits / total, 4) if total else 0.0,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'invalidations': self._invalidations,
+            }
+
+
+class RedisCache:
+    """
+    Redis 共享缓存层（带版本号的键 + pub/sub 失效广播）
+
+    键格式: {namespace}:v{SCHEMA_VERSION}:g{generation}:{key}
+    - SCHEMA_VERSION: 缓存值的结构变化时递增，新旧代码部署期间互不读取对方的数据
+    - generation: 每次写入后递增（INCR），旧版本的键不再被读取，随 TTL 过期
+    
+    写入方递增版本号后向 {namespace}:invalidate 频道发布消息，每个 worker 的
+    listen() 收到后同步版本号并通知本地缓存失效。订阅未建立时（Redis 不可用、
+    断线重连中）ready 为 False，读路径应跳过本层直接查数据库。
+    
+    所有 Redis 异常都被吞掉并触发 RedisClient 的失败退避，调用方按未命中处理。
+    """
+    
+    SCHEMA_VERSION = 1
+    
+    def __init__(self, namespace: str, ttl: float, client_provider=RedisClient):
+        """
+        Args:
+            namespace: 键前缀，例如 'contract_forge:contract_types'
+            ttl: 缓存有效期（秒）
+            client_provider: 提供 get_client / get_sync_client / mark_failed 的对象
+        """
+        self.namespace = namespace
+        self.ttl = ttl
+        self.channel = f"{namespace}:invalidate"
+        self.origin = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._clients = client_provider
+        self._generation_key = f"{namespace}:generation"
+        self._generation: Optional[int] = None
+        self._subscribed = False
+        
+        self._hits = 0
+        self._misses = 0
+        self._errors = 0
+        self._published = 0
+        self._received = 0
+    
+    @property
+    def ready(self) -> bool:
+        """已订阅失效频道且知道当前版本号"""
+        return self._subscribed and self._generation is not None
+    
+    @property
+    def generation(self) -> Optional[int]:
+        """当前版本号（未订阅时为 None）"""
+        return self._generation
+    
+    def _key(self, key: str, generation: Optional[int] = None) -> str:
+        generation = self._generation if generation is None else generation
+        return f"{self.namespace}:v{self.SCHEMA_VERSION}:g{generation}:{key}"
+    
+    def _failed(self, error: Exception) -> None:
+        self._errors += 1
+        self._clients.mark_failed(error)
+    
+    # ============================================
+    # 读写
+    # ============================================
+    async def get(self, key: str) -> Any:
+        """读取缓存值，未命中或 Redis 不可用时返回 MISSING"""
+        client = self._clients.get_client() if self.ready else None
+        if client is None:
+            return MISSING
+        try:
+            raw = await client.get(self._key(key))
+        except REDIS_ERRORS as e:
+            self._failed(e)
+            return MISSING
+        if raw is None:
+            self._misses += 1
+            return MISSING
+        self._hits += 1
+        return json.loads(raw)
+    
+    async def set(self, key: str, value: Any, generation: Optional[int] = None) -> None:
+        """
+        写入缓存值（value 需可 JSON 序列化）
+        
+        Args:
+            generation: 写入哪个版本，应传入查库之前读到的 generation，
+                        这样查库期间发生的写入不会让旧数据出现在新版本下
+        """
+        client = self._clients.get_client() if self.ready else None
+        if client is None or (generation is None and self._generation is None):
+            return
+        try:
+            await client.set(
+                self._key(key, generation),
+                json.dumps(value, ensure_ascii=False),
+                ex=max(1, int(self.ttl)),
+            )
+        except REDIS_ERRORS as e:
+            self._failed(e)
+    
+    # ============================================
+    # 失效广播
+    # ============================================
+    async def invalidate(self, message: dict) -> None:
+        """递增版本号并广播失效消息"""
+        client = self._clients.get_client()
+        if client is None:
+            return
+        try:
+            generation = await client.incr(self._generation_key)
+            self._generation = generation
+            await client.publish(self.channel, self._encode_message(message, generation))
+            self._published += 1
+        except REDIS_ERRORS as e:
+            self._failed(e)
+    
+    async def invalidate_once(self, claim: str, message: dict) -> None:
+        """
+        同一个 claim 只有第一个调用者真正失效并广播
+        
+        用于所有 worker 都会收到的事件（例如数据库的 NOTIFY），避免重复递增版本号。
+        """
+        client = self._clients.get_client()
+        if client is None:
+            return
+        try:
+            claimed = await client.set(f"{self.namespace}:claim:{claim}", self.origin, nx=True, ex=60)
+        except REDIS_ERRORS as e:
+            self._failed(e)
+            return
+        if claimed:
+            await self.invalidate(message)
+    
+    def invalidate_sync(self, message: dict) -> None:
+        """同步版本（没有事件循环时使用，例如脚本中的同步 DAO）"""
+        client = self._clients.get_sync_client()
+        if client is None:
+            return
+        try:
+            generation = client.incr(self._generation_key)
+            client.publish(self.channel, self._encode_message(message, generation))
+            self._published += 1
+        except REDIS_ERRORS as e:
+            self._failed(e)
+    
+    def _encode_message(self, message: dict, generation: int) -> str:
+        return json.dumps({**message, 'origin': self.origin, 'generation': generation})
+    
+    async def listen(
+        self,
+        on_message: Callable[[dict], None],
+        retry_interval: float = 1.0,
+    ) -> None:
+        """
+        订阅失效频道，直到任务被取消
+        
+        收到其他 worker 的消息时调用 on_message(message)。每次（重新）订阅成功后
+        以 {'everything': True} 调用一次 on_message，因为断线期间可能错过了消息。
+        """
+        while True:
+            client = self._clients.get_client()
+            if client is None:
+                await asyncio.sleep(retry_interval)
+                continue
+            
+            pubsub = client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                self._generation = int(await client.get(self._generation_key) or 0)
+                self._subscribed = True
+                logger.info("Subscribed to %s (generation %s)", self.channel, self._generation)
+                on_message({'everything': True})
+                
+                while True:
+                    # 带超时轮询：阻塞读会受 socket_timeout 限制而误判断线
+                    raw = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if raw is not None and raw.get('type') == 'message':
+                        self._apply(raw['data'], on_message)
+            except REDIS_ERRORS as e:
+                self._failed(e)
+            finally:
+                self._subscribed = False
+                try:
+                    await pubsub.aclose()
+                except REDIS_ERRORS:
+                    pass
+            await asyncio.sleep(retry_interval)
+    
+    def _apply(self, data: str, on_message: Callable[[dict], None]) -> None:
+        try:
+            message = json.loads(data)
+        except ValueError:
+            logger.warning("Ignoring malformed invalidation message on %s", self.channel)
+            return
+        
+        generation = message.get('generation')
+        if isinstance(generation, int) and generation > (self._generation or 0):
+            self._generation = generation
+        if message.get('origin') == self.origin:
+            return  # 本 worker 发出的消息，本地已经失效过
+        
+        self._received += 1
+        try:
+            on_message(message)
+        except Exception:
+            logger.exception("Invalidation handler failed")
+    
+    def stats(self) -> dict:
+        """命中 / 未命中 / 错误 / 广播统计"""
+        total = self._hits + self._misses
+        return {
+            'ready': self.ready,
+            'generation': self._generation,
+            'hits': self._hits,
+            'misses': self._misses,
+            'hit_ratio': round(self._hits / total, 4) if total else 0.0,
+            'errors': self._errors,
+            'published': self._published,
+            'received': self._received,
+        }
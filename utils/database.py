@@ -1,12 +1,722 @@
 """
 数据库工具模块
 Database Utilities
+
+所有事务上下文（db_transaction / DatabaseManager.transaction /
+DatabaseManager.get_dao_connection）都从进程内连接池借用连接，
+不再为每个请求单独建立 TCP 连接。
+
+异步端点使用 async_db_transaction()，它基于 psycopg 3 的异步连接池，
+查询期间不会阻塞事件循环。
+
+配置了只读副本时，readonly=True 的事务自动路由到副本；复制延迟超过阈值、
+副本不可用，或同一请求中已经写过主库时，读操作回退到主库。
+
+大结果集使用 stream_query() / astream_query()：基于服务端命名游标分批 FETCH，
+客户端内存只保留一批行，与总行数无关。
+
+NotificationListener 在独立连接上 LISTEN 指定频道，用于接收数据库触发器
+发出的变更通知。
+
+借出连接的等待时间、连接池使用率和 DAO 方法耗时记录在 utils.metrics 中，由 /metrics 输出。
 """
 
+import asyncio
+import itertools
+import re
+import sys
+import threading
+import time
+import traceback
+import weakref
+from collections import deque
+from contextlib import aclosing, asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncGenerator, Awaitable, Callable, Generator, Optional, Sequence
+
+import psycopg
 import psycopg2
-from contextlib import contextmanager
-from typing import Generator
+import psycopg2.errors
+from psycopg import sql
+from psycopg.types.numeric import Int8
+from psycopg2 import extensions, pool
+from psycopg_pool import AsyncConnectionPool
+
 from config import Config
+from utils.logger import get_logger
+from utils.metrics import metrics, track_cache
+from utils.timing import PHASE_CHECKOUT, PHASE_DB, record_phase, timed_phase
+
+logger = get_logger(__name__)
+
+# 借出连接的等待时间（池内有空闲连接时约为微秒级，接近 timeout 说明连接池过小）
+db_checkout_wait = metrics.histogram(
+    'db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled connection', ('pool',),
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+# DAO 方法耗时（DAO 类用 utils.metrics.instrument_methods 埋点）
+db_query_duration = metrics.histogram(
+    'db_query_duration_seconds', 'DAO method duration', ('dao', 'method'),
+)
+
+
+# ============================================
+# 连接池（默认路径）
+# ============================================
+class PoolTimeoutError(pool.PoolError):
+    """在 checkout 超时时间内没有可用连接"""
+
+
+class _PoolEntry:
+    """连接池中的一条连接及其元数据"""
+
+    __slots__ = ('conn', 'created_at', 'last_used_at', 'checked_out_at', 'owner', 'leak_reported')
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used_at = now
+        self.checked_out_at = 0.0
+        self.owner: Optional[str] = None
+        self.leak_reported = False
+
+
+class ManagedPool:
+    """
+    线程安全的 PostgreSQL 连接池
+
+    - 连接数在 min_size ~ max_size 之间，借出时最多等待 timeout 秒
+    - 超过 max_lifetime 的连接会被回收，多余的空闲连接超过 max_idle 后关闭
+    - 空闲超过 validate_after 的连接在借出前先执行 SELECT 1 校验
+    - 借出超过 leak_threshold 仍未归还的连接会被记录为泄漏
+    """
+
+    def __init__(
+        self,
+        connect_kwargs: dict,
+        min_size: int = 1,
+        max_size: int = 10,
+        timeout: float = 5.0,
+        max_lifetime: float = 1800.0,
+        max_idle: float = 300.0,
+        validate_after: float = 30.0,
+        leak_threshold: float = 60.0,
+        trace_leaks: bool = False,
+        maintenance_interval: float = 10.0,
+        connect: Callable = psycopg2.connect,
+        name: str = "primary",
+    ):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min={min_size}, max={max_size}")
+
+        self.name = name
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.validate_after = validate_after
+        self.leak_threshold = leak_threshold
+        self.trace_leaks = trace_leaks
+        self.maintenance_interval = maintenance_interval
+
+        self._connect_kwargs = connect_kwargs
+        self._connect = connect
+        self._cond = threading.Condition()
+        self._idle: deque[_PoolEntry] = deque()
+        self._in_use: dict[int, _PoolEntry] = {}
+        self._size = 0  # 已打开 + 正在打开的连接数
+        self._waiting = 0
+        self._closed = False
+        self._stop = threading.Event()
+        self._maintenance_thread: Optional[threading.Thread] = None
+
+        # 统计
+        self._checkouts = 0
+        self._timeouts = 0
+        self._leaks = 0
+        self._recycled = 0
+
+    # ---------- 生命周期 ----------
+
+    def open(self) -> None:
+        """预热到 min_size 并启动后台维护线程"""
+        self._fill_to_min()
+
+        if self.maintenance_interval > 0 and self._maintenance_thread is None:
+            self._maintenance_thread = threading.Thread(
+                target=self._maintenance_loop,
+                name=f"db-pool-{self.name}",
+                daemon=True,
+            )
+            self._maintenance_thread.start()
+
+    def close(self) -> None:
+        """关闭连接池和所有空闲连接；仍被借出的连接归还时关闭"""
+        self._stop.set()
+        with self._cond:
+            self._closed = True
+            entries = list(self._idle)
+            self._idle.clear()
+            self._size -= len(entries)
+            in_use = len(self._in_use)
+            self._cond.notify_all()
+
+        for entry in entries:
+            self._close_quietly(entry.conn)
+
+        if in_use:
+            logger.warning("Pool '%s' closed with %d connection(s) still checked out", self.name, in_use)
+
+        if self._maintenance_thread is not None:
+            self._maintenance_thread.join(timeout=self.maintenance_interval)
+            self._maintenance_thread = None
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    # ---------- 借出 / 归还 ----------
+
+    def getconn(self, timeout: Optional[float] = None):
+        """
+        借出一个连接
+
+        Args:
+            timeout: 最长等待秒数（默认使用池的 timeout）
+
+        Raises:
+            PoolTimeoutError: 超时仍无可用连接
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        while True:
+            entry = self._acquire(deadline)
+
+            if entry is None:
+                # 已预留名额，在锁外建立新连接
+                try:
+                    entry = _PoolEntry(self._connect(**self._connect_kwargs))
+                except Exception:
+                    self._release_slot()
+                    raise
+            elif not self._validate(entry):
+                self._discard(entry)
+                continue
+
+            return self._check_out(entry)
+
+    def putconn(self, conn, discard: bool = False) -> None:
+        """
+        归还连接
+
+        Args:
+            conn: 之前借出的连接
+            discard: 是否直接关闭（例如连接已损坏）
+        """
+        if not discard and not conn.closed:
+            # 未结束的事务不能带回池中
+            if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except Exception:
+                    discard = True
+
+        with self._cond:
+            entry = self._in_use.pop(id(conn), None)
+            if entry is None:
+                raise pool.PoolError("trying to put unkeyed connection")
+
+            now = time.monotonic()
+            if self._closed or discard or conn.closed or self._expired(entry, now):
+                self._size -= 1
+                self._recycled += 1
+                to_close = entry
+            else:
+                entry.last_used_at = now
+                entry.owner = None
+                self._idle.append(entry)
+                to_close = None
+            self._cond.notify()
+
+        if to_close is not None:
+            self._close_quietly(to_close.conn)
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None) -> Generator:
+        """借出连接并在退出时归还（不处理事务）"""
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    # ---------- 维护 ----------
+
+    def maintain(self) -> None:
+        """回收过期/多余的空闲连接，补足 min_size，并检测泄漏"""
+        now = time.monotonic()
+        to_close = []
+
+        with self._cond:
+            if self._closed:
+                return
+            keep = deque()
+            for entry in self._idle:
+                if self._expired(entry, now) or (
+                    self._size - len(to_close) > self.min_size
+                    and now - entry.last_used_at > self.max_idle
+                ):
+                    to_close.append(entry)
+                else:
+                    keep.append(entry)
+            self._idle = keep
+            self._size -= len(to_close)
+            self._recycled += len(to_close)
+
+        for entry in to_close:
+            self._close_quietly(entry.conn)
+
+        self._fill_to_min()
+        self.check_leaks()
+
+    def check_leaks(self) -> list[dict]:
+        """
+        检测借出时间超过 leak_threshold 仍未归还的连接
+
+        每个连接只报告一次，返回本次新发现的泄漏信息
+        """
+        now = time.monotonic()
+        leaks = []
+
+        with self._cond:
+            for entry in self._in_use.values():
+                held = now - entry.checked_out_at
+                if held > self.leak_threshold and not entry.leak_reported:
+                    entry.leak_reported = True
+                    self._leaks += 1
+                    leaks.append({'held_seconds': round(held, 3), 'owner': entry.owner})
+
+        for leak in leaks:
+            logger.warning(
+                "Pool '%s': connection checked out for %.1fs without being returned (possible leak)%s",
+                self.name, leak['held_seconds'],
+                f"\n{leak['owner']}" if leak['owner'] else "",
+            )
+
+        return leaks
+
+    def stats(self) -> dict:
+        """连接池状态统计"""
+        with self._cond:
+            return {
+                'name': self.name,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'waiting': self._waiting,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'leaks': self._leaks,
+                'recycled': self._recycled,
+            }
+
+    # ---------- 内部方法 ----------
+
+    def _acquire(self, deadline: float) -> Optional[_PoolEntry]:
+        """取出一个空闲连接；返回 None 表示已为新连接预留名额"""
+        to_close = []
+        try:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise pool.PoolError("connection pool is closed")
+
+                    now = time.monotonic()
+                    while self._idle:
+                        entry = self._idle.pop()  # LIFO：优先使用最近用过的连接
+                        if self._expired(entry, now):
+                            self._size -= 1
+                            self._recycled += 1
+                            to_close.append(entry)
+                            continue
+                        return entry
+
+                    if self._size < self.max_size:
+                        self._size += 1
+                        return None
+
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeoutError(
+                            f"Pool '{self.name}' exhausted: no connection available "
+                            f"within {self.timeout}s (max_size={self.max_size})"
+                        )
+
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+        finally:
+            for entry in to_close:
+                self._close_quietly(entry.conn)
+
+    def _check_out(self, entry: _PoolEntry):
+        entry.checked_out_at = time.monotonic()
+        entry.leak_reported = False
+        entry.owner = (
+            "".join(traceback.format_stack(limit=12)[:-3]) if self.trace_leaks
+            else threading.current_thread().name
+        )
+        with self._cond:
+            self._in_use[id(entry.conn)] = entry
+            self._checkouts += 1
+        return entry.conn
+
+    def _validate(self, entry: _PoolEntry) -> bool:
+        """校验空闲较久的连接是否仍然可用"""
+        conn = entry.conn
+        if conn.closed:
+            return False
+        if time.monotonic() - entry.last_used_at < self.validate_after:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            conn.rollback()
+            return True
+        except Exception as e:
+            logger.info("Pool '%s': dropping stale connection (%s)", self.name, e)
+            return False
+
+    def _expired(self, entry: _PoolEntry, now: float) -> bool:
+        return now - entry.created_at > self.max_lifetime
+
+    def _discard(self, entry: _PoolEntry) -> None:
+        self._release_slot()
+        self._close_quietly(entry.conn)
+
+    def _release_slot(self) -> None:
+        with self._cond:
+            self._size -= 1
+            self._recycled += 1
+            self._cond.notify()
+
+    def _fill_to_min(self) -> None:
+        with self._cond:
+            missing = max(0, self.min_size - self._size)
+            self._size += missing
+
+        opened = []
+        try:
+            for _ in range(missing):
+                opened.append(_PoolEntry(self._connect(**self._connect_kwargs)))
+        except Exception as e:
+            logger.warning("Pool '%s': failed to open connection (%s)", self.name, e)
+        finally:
+            with self._cond:
+                self._size -= missing - len(opened)
+                if self._closed:
+                    self._size -= len(opened)
+                else:
+                    self._idle.extendleft(opened)
+                    opened = []
+                self._cond.notify_all()
+            for entry in opened:
+                self._close_quietly(entry.conn)
+
+    def _maintenance_loop(self) -> None:
+        while not self._stop.wait(self.maintenance_interval):
+            try:
+                self.maintain()
+            except Exception:
+                logger.exception("Pool '%s': maintenance failed", self.name)
+
+    @staticmethod
+    def _close_quietly(conn) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    数据库连接池（进程内单例）
+
+    应用启动时在 lifespan 中 initialize()，关闭时 close_all()；
+    未初始化时首次使用会按 Config 自动初始化。
+    """
+
+    _pool: Optional[ManagedPool] = None
+    _lock = threading.Lock()
+    _name = "primary"
+
+    @classmethod
+    def _database_config(cls) -> dict:
+        return Config.get_database_config()
+
+    @classmethod
+    def initialize(
+        cls,
+        minconn: Optional[int] = None,
+        maxconn: Optional[int] = None,
+        timeout: Optional[float] = None,
+        **overrides,
+    ) -> ManagedPool:
+        """
+        初始化连接池（重复调用无副作用）
+
+        Args:
+            minconn: 最小连接数（默认 Config.DB_POOL_MIN_SIZE）
+            maxconn: 最大连接数（默认 Config.DB_POOL_MAX_SIZE）
+            timeout: 借出连接的最长等待秒数（默认 Config.DB_POOL_TIMEOUT）
+            **overrides: 其他 ManagedPool 参数
+        """
+        with cls._lock:
+            if cls._pool is None or cls._pool.closed:
+                options = Config.get_pool_config()
+                if minconn is not None:
+                    options['min_size'] = minconn
+                if maxconn is not None:
+                    options['max_size'] = maxconn
+                if timeout is not None:
+                    options['timeout'] = timeout
+                options.update(overrides)
+
+                new_pool = ManagedPool(cls._database_config(), name=cls._name, **options)
+                new_pool.open()
+                cls._pool = new_pool
+                logger.info(
+                    "Connection pool '%s' initialized (min=%d, max=%d, timeout=%.1fs)",
+                    cls._name, new_pool.min_size, new_pool.max_size, new_pool.timeout,
+                )
+            return cls._pool
+
+    @classmethod
+    def get_pool(cls) -> ManagedPool:
+        """获取连接池实例（未初始化时自动初始化）"""
+        current = cls._pool
+        if current is None or current.closed:
+            current = cls.initialize()
+        return current
+
+    @classmethod
+    @contextmanager
+    def get_connection(cls):
+        """从连接池获取连接（成功提交，失败回滚）"""
+        with _pooled_transaction(cls.get_pool()) as conn:
+            yield conn
+
+    @classmethod
+    def stats(cls) -> dict:
+        """连接池状态；未初始化时返回空字典"""
+        return cls._pool.stats() if cls._pool is not None else {}
+
+    @classmethod
+    def close_all(cls):
+        """关闭所有连接"""
+        with cls._lock:
+            if cls._pool is not None:
+                cls._pool.close()
+                cls._pool = None
+
+
+class ReplicaConnectionPool(ConnectionPool):
+    """只读副本连接池（仅在 Config.has_replica() 时使用）"""
+
+    _pool: Optional[ManagedPool] = None
+    _lock = threading.Lock()
+    _name = "replica"
+
+    @classmethod
+    def _database_config(cls) -> dict:
+        return Config.get_replica_database_config()
+
+
+# ============================================
+# 提交后回调
+# ============================================
+# 连接 → 本事务提交成功后要执行的回调（回滚时丢弃）
+_after_commit_callbacks: 'weakref.WeakKeyDictionary' = weakref.WeakKeyDictionary()
+
+
+def after_commit(conn, callback: Callable[[], None]) -> None:
+    """
+    注册在当前事务提交后执行的回调（例如缓存失效）
+
+    由 db_transaction / async_db_transaction 等上下文在 commit 成功后调用，
+    事务回滚时回调被丢弃。
+    """
+    _after_commit_callbacks.setdefault(conn, []).append(callback)
+
+
+def _run_after_commit(conn) -> None:
+    for callback in _after_commit_callbacks.pop(conn, ()):
+        try:
+            callback()
+        except Exception:
+            logger.exception("after_commit callback failed")
+
+
+def _discard_after_commit(conn) -> None:
+    _after_commit_callbacks.pop(conn, None)
+
+
+# ============================================
+# 读写路由
+# ============================================
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+class ReplicaLagMonitor:
+    """
+    记录最近一次测得的副本复制延迟
+
+    每隔 check_interval 秒只允许一个调用方测量一次；
+    测量失败时视为副本不可用，直到下一次测量成功。
+    """
+
+    def __init__(self, max_lag: float, check_interval: float):
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._lag: Optional[float] = None
+        self._checked_at = float('-inf')
+        self._checking = False
+
+    def begin_check(self) -> bool:
+        """到了测量时间且没有其他调用方正在测量时返回 True"""
+        with self._lock:
+            if self._checking or time.monotonic() - self._checked_at < self.check_interval:
+                return False
+            self._checking = True
+            return True
+
+    def record(self, lag: Optional[float]) -> None:
+        """记录测量结果；None 表示测量失败"""
+        with self._lock:
+            self._lag = lag
+            self._checked_at = time.monotonic()
+            self._checking = False
+
+    @property
+    def lag(self) -> Optional[float]:
+        return self._lag
+
+    def acceptable(self) -> bool:
+        """副本延迟是否在阈值内"""
+        lag = self._lag
+        return lag is not None and lag <= self.max_lag
+
+
+replica_lag = ReplicaLagMonitor(Config.REPLICA_MAX_LAG_SECONDS, Config.REPLICA_LAG_CHECK_INTERVAL)
+
+# 当前请求（上下文）是否已经写过主库：写后读必须读主库
+_wrote_primary: ContextVar[bool] = ContextVar('wrote_primary', default=False)
+
+
+def mark_primary_write() -> None:
+    """标记当前上下文已写主库，后续读操作不再路由到副本"""
+    _wrote_primary.set(True)
+
+
+def _replica_allowed() -> bool:
+    return Config.has_replica() and not _wrote_primary.get()
+
+
+def _measure_replica_lag(replica_pool: ManagedPool) -> None:
+    try:
+        with replica_pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(REPLICA_LAG_SQL)
+            lag = float(cursor.fetchone()[0])
+            cursor.close()
+            conn.rollback()
+    except Exception as e:
+        logger.warning("Replica lag check failed, reading from primary: %s", e)
+        lag = None
+    replica_lag.record(lag)
+
+
+def _read_pool() -> Optional[ManagedPool]:
+    """返回可用于只读事务的副本连接池；不满足条件时返回 None（读主库）"""
+    if not _replica_allowed():
+        return None
+    replica_pool = ReplicaConnectionPool.get_pool()
+    if replica_lag.begin_check():
+        _measure_replica_lag(replica_pool)
+    return replica_pool if replica_lag.acceptable() else None
+
+
+def _getconn(db_pool: ManagedPool):
+    """借出连接并记录等待时间"""
+    start = time.perf_counter()
+    conn = db_pool.getconn()
+    elapsed = time.perf_counter() - start
+    db_checkout_wait.labels(db_pool.name).observe(elapsed)
+    record_phase(PHASE_CHECKOUT, elapsed)
+    return conn
+
+
+def _checkout(db_pool: ManagedPool, fallback: Optional[ManagedPool]) -> tuple:
+    """借出连接；副本借出失败时回退到主库，返回 (连接池, 连接)"""
+    if fallback is None:
+        return db_pool, _getconn(db_pool)
+    try:
+        return db_pool, _getconn(db_pool)
+    except Exception as e:
+        logger.warning("Replica unavailable, reading from primary: %s", e)
+        replica_lag.record(None)
+        return fallback, _getconn(fallback)
+
+
+@contextmanager
+def _pooled_transaction(
+    db_pool: ManagedPool,
+    auto_commit: bool = False,
+    fallback: Optional[ManagedPool] = None,
+) -> Generator:
+    """
+    从连接池借出连接并管理事务
+
+    Args:
+        db_pool: 连接池
+        auto_commit: 为 True 时由调用方（DAO）自行提交
+        fallback: db_pool 借出失败时改用的连接池（副本 → 主库）
+    """
+    db_pool, conn = _checkout(db_pool, fallback)
+    broken = False
+    try:
+        yield conn
+        if not auto_commit:
+            with timed_phase(PHASE_DB):
+                conn.commit()
+        _run_after_commit(conn)
+    except Exception as e:
+        broken = isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError))
+        if not conn.closed:
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+        raise
+    finally:
+        _discard_after_commit(conn)
+        db_pool.putconn(conn, discard=broken)
 
 
 class DatabaseManager:
@@ -14,7 +724,7 @@ class DatabaseManager:
     
     @staticmethod
     def get_connection():
-        """获取数据库连接"""
+        """获取独立的数据库连接（不经过连接池，调用方负责关闭）"""
         return psycopg2.connect(**Config.get_database_config())
     
     @staticmethod
@@ -31,17 +741,11 @@ class DatabaseManager:
                 # 如果有异常，自动 rollback
         
         Yields:
-            数据库连接对象
+            数据库连接对象（来自连接池，退出时归还）
         """
-        conn = psycopg2.connect(**Config.get_database_config())
-        try:
+        mark_primary_write()
+        with _pooled_transaction(ConnectionPool.get_pool()) as conn:
             yield conn
-            conn.commit()  # 成功时提交
-        except Exception as e:
-            conn.rollback()  # 失败时回滚
-            raise e
-        finally:
-            conn.close()  # 总是关闭连接
     
     @staticmethod
     @contextmanager
@@ -60,25 +764,18 @@ class DatabaseManager:
             auto_commit: 是否自动提交（用于兼容 DAO）
         
         Yields:
-            数据库连接对象
+            数据库连接对象（来自连接池，退出时归还）
         """
-        conn = psycopg2.connect(**Config.get_database_config())
-        try:
+        mark_primary_write()
+        with _pooled_transaction(ConnectionPool.get_pool(), auto_commit=auto_commit) as conn:
             yield conn
-            if not auto_commit:
-                conn.commit()  # 手动控制时才在这里提交
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
 
 
 # ============================================
 # 简化版：单独的事务函数
 # ============================================
 @contextmanager
-def db_transaction() -> Generator:
+def db_transaction(readonly: bool = False) -> Generator:
     """
     简化的事务上下文管理器
     
@@ -88,60 +785,679 @@ def db_transaction() -> Generator:
         with db_transaction() as conn:
             dao = ContractTypeDAO(conn, auto_commit=False)
             dao.create(new_type)
+        
+        with db_transaction(readonly=True) as conn:  # 可路由到只读副本
+            types = ContractTypeDAO(conn).get_all()
+    
+    Args:
+        readonly: 只读事务；配置了副本且延迟在阈值内时使用副本
     """
-    conn = psycopg2.connect(**Config.get_database_config())
-    try:
+    primary = ConnectionPool.get_pool()
+    if readonly:
+        replica_pool = _read_pool()
+        if replica_pool is not None:
+            with _pooled_transaction(replica_pool, fallback=primary) as conn:
+                yield conn
+            return
+    else:
+        mark_primary_write()
+
+    with _pooled_transaction(primary) as conn:
         yield conn
-        conn.commit()
-    except Exception:
-        conn.rollback()
-        raise
-    finally:
-        conn.close()
 
 
 # ============================================
-# 连接池版本（高性能场景）
+# 流式查询（服务端游标）
 # ============================================
-from psycopg2 import pool
+# 同一连接上的命名游标不能重名
+_stream_cursor_ids = itertools.count(1)
 
-class ConnectionPool:
-    """数据库连接池"""
+
+def _stream_cursor_name() -> str:
+    return f"stream_{next(_stream_cursor_ids)}"
+
+
+def stream_batches(
+    conn,
+    query: str,
+    params: Optional[Sequence] = None,
+    batch_size: Optional[int] = None,
+) -> Generator[list, None, None]:
+    """
+    通过服务端命名游标分批读取查询结果（DECLARE ... CURSOR + FETCH FORWARD n）
+    
+    fetchall() 会先把全部结果读入客户端内存；这里每次只取一批，
+    内存占用与总行数无关。命名游标只在事务内有效，应在
+    db_transaction() / DatabaseManager.transaction() 中使用；
+    提前停止迭代时游标随生成器关闭。
+    
+    用法:
+        with db_transaction(readonly=True) as conn:
+            for rows in stream_batches(conn, "SELECT ... FROM audit_logs"):
+                handle(rows)
     
-    _pool = None
+    Args:
+        conn: psycopg2 连接（处于事务中）
+        query: 查询语句
+        params: 查询参数
+        batch_size: 每批行数（默认 Config.DB_STREAM_BATCH_SIZE）
     
+    Yields:
+        每批的行列表（非空）
+    """
+    size = batch_size or Config.DB_STREAM_BATCH_SIZE
+    cursor = conn.cursor(name=_stream_cursor_name())
+    cursor.itersize = size
+    try:
+        cursor.execute(query, params)
+        while rows := cursor.fetchmany(size):
+            yield rows
+    finally:
+        cursor.close()
+
+
+def stream_query(
+    conn,
+    query: str,
+    params: Optional[Sequence] = None,
+    batch_size: Optional[int] = None,
+) -> Generator[tuple, None, None]:
+    """逐行读取查询结果（参数见 stream_batches）"""
+    for rows in stream_batches(conn, query, params, batch_size):
+        yield from rows
+
+
+# ============================================
+# 服务端预编译语句
+# ============================================
+class PreparedStatementRegistry:
+    """
+    按名称注册的服务端预编译语句
+
+    每个连接第一次执行某条语句时才 PREPARE（服务端已存在时跳过），之后直接 EXECUTE，
+    省去 PostgreSQL 每次的解析和生成执行计划。已准备的语句按连接对象记录，
+    连接被回收、重连后得到的是新连接对象，会自动重新准备。
+    psycopg 3 连接由驱动执行 PREPARE，驱动在回滚时清空缓存，回滚后须调用 forget(conn)
+    （async_db_transaction 和连接池预热已经处理）。
+
+    用法:
+        STMT = prepared_statements.register('ct_get_by_code', "SELECT ... WHERE type_code = %s")
+        prepared_statements.execute(cursor, STMT, ('SALES',))          # psycopg2
+        await prepared_statements.aexecute(cursor, STMT, ('SALES',))   # psycopg 3
+    """
+
+    def __init__(self):
+        self._statements: dict[str, str] = {}
+        self._prepared: 'weakref.WeakKeyDictionary' = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def register(self, name: str, sql: str) -> str:
+        """
+        注册语句（使用 %s 占位符），返回语句名
+
+        Raises:
+            ValueError: 同名语句已注册为不同的 SQL
+        """
+        if not re.fullmatch(r'[a-z_][a-z0-9_]*', name):
+            raise ValueError(f"Invalid prepared statement name: {name!r}")
+        existing = self._statements.get(name)
+        if existing is not None and existing != sql:
+            raise ValueError(f"Prepared statement {name!r} already registered with different SQL")
+        self._statements[name] = sql
+        return name
+
+    def sql(self, name: str) -> str:
+        """获取已注册语句的 SQL"""
+        return self._statements[name]
+
+    def execute(self, cursor, name: str, params: tuple = ()) -> None:
+        """在 psycopg2 游标上执行预编译语句（必要时先 PREPARE）"""
+        sql = self._statements[name]
+        conn = cursor.connection
+
+        if self._mark(conn, name):
+            placeholders = iter(range(1, sql.count('%s') + 1))
+            try:
+                # 记录与服务端会话不一致时（例如 forget() 之后）语句可能已存在：
+                # 直接 PREPARE 会报 DuplicatePreparedStatement 并中止调用方的事务，先查询再准备
+                cursor.execute("SELECT 1 FROM pg_prepared_statements WHERE name = %s", (name,))
+                if cursor.fetchone() is None:
+                    cursor.execute(f"PREPARE {name} AS " + re.sub(r'%s', lambda _: f"${next(placeholders)}", sql))
+            except Exception:
+                self._unmark(conn, name)
+                raise
+
+        try:
+            if params:
+                cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+            else:
+                cursor.execute(f"EXECUTE {name}")
+        except psycopg2.errors.InvalidSqlStatementName:
+            # 服务端语句已被清除（DISCARD ALL 等），下个事务重新准备
+            self._unmark(conn, name)
+            raise
+
+    async def aexecute(self, cursor, name: str, params: tuple = ()) -> None:
+        """
+        在 psycopg 3 异步游标上执行预编译语句（由驱动按连接缓存）
+
+        驱动的缓存键包含参数类型，整数参数统一按 int8 传递，
+        否则同一条语句会因为 id 大小不同（int2 / int4 / int8）被重复准备。
+        连接的 prepare_threshold 为 None 时驱动不准备，不计入命中 / 未命中。
+        """
+        conn = cursor.connection
+        if conn.prepare_threshold is None:
+            await cursor.execute(self._statements[name], _stable_params(params) or None)
+            return
+
+        marked = self._mark(conn, name)
+        try:
+            await cursor.execute(self._statements[name], _stable_params(params) or None, prepare=True)
+        except Exception:
+            if marked:
+                self._unmark(conn, name)   # 执行失败的语句驱动不会缓存
+            raise
+
+    def is_prepared(self, conn, name: str) -> bool:
+        """该连接上是否已准备过此语句（按本注册表的记录）"""
+        with self._lock:
+            return name in self._prepared.get(conn, ())
+
+    def _unmark(self, conn, name: str) -> None:
+        with self._lock:
+            self._prepared.get(conn, set()).discard(name)
+
+    def forget(self, conn) -> None:
+        """清除某个连接上的准备记录"""
+        with self._lock:
+            self._prepared.pop(conn, None)
+
+    def stats(self) -> dict:
+        """命中 / 未命中统计（未命中即需要 PREPARE 的次数）"""
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                'statements': len(self._statements),
+                'connections': len(self._prepared),
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_ratio': round(self._hits / total, 4) if total else 0.0,
+            }
+
+    def _mark(self, conn, name: str) -> bool:
+        """记录一次执行；该连接尚未准备此语句时返回 True"""
+        with self._lock:
+            prepared = self._prepared.get(conn)
+            if prepared is None:
+                prepared = self._prepared[conn] = set()
+            if name in prepared:
+                self._hits += 1
+                return False
+            prepared.add(name)
+            self._misses += 1
+            return True
+
+
+prepared_statements = PreparedStatementRegistry()
+
+
+def _stable_params(params: Sequence) -> tuple:
+    """整数（及整数列表）按 int8 传递，使驱动的预编译缓存键不随数值大小变化"""
+    def stable(value):
+        if isinstance(value, int) and not isinstance(value, bool):
+            return Int8(value)
+        if isinstance(value, list) and value and all(
+            isinstance(item, int) and not isinstance(item, bool) for item in value
+        ):
+            return [Int8(item) for item in value]
+        return value
+    return tuple(stable(value) for value in params)
+
+
+# ============================================
+# 异步版本（psycopg 3）
+# ============================================
+def _libpq_kwargs(db_config: dict) -> dict:
+    """把 Config 的连接参数转换为 libpq 关键字（psycopg 3 不接受 database 别名）"""
+    kwargs = dict(db_config)
+    kwargs['dbname'] = kwargs.pop('database')
+    return kwargs
+
+
+# 驱动自动准备的执行次数阈值：设为极大值，只有显式 prepare=True 的语句才会准备
+# （设为 None 会关闭驱动的预编译功能，prepare=True 也不再生效）
+_NO_AUTO_PREPARE = sys.maxsize
+
+
+async def _configure_async_connection(conn) -> None:
+    """新连接的初始化：只预编译通过 PreparedStatementRegistry 注册的语句"""
+    conn.prepare_threshold = _NO_AUTO_PREPARE
+
+
+async def _async_putconn(db_pool: AsyncConnectionPool, conn) -> None:
+    """归还连接；仍在事务中的连接由连接池回滚，驱动的预编译缓存随之清空"""
+    if conn.info.transaction_status != psycopg.pq.TransactionStatus.IDLE:
+        prepared_statements.forget(conn)
+    await db_pool.putconn(conn)
+
+
+class AsyncDatabasePool:
+    """
+    异步数据库连接池（进程内单例）
+
+    与 ConnectionPool 共用 Config 中的 DB_POOL_* 配置，
+    在 lifespan 中 open()/close()；未打开时首次使用会自动打开。
+    """
+
+    _pool: Optional[AsyncConnectionPool] = None
+    _name = "async-primary"
+
+    @classmethod
+    def _database_config(cls) -> dict:
+        return Config.get_database_config()
+
     @classmethod
-    def initialize(cls, minconn=1, maxconn=10):
-        """初始化连接池"""
+    async def open(
+        cls,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> AsyncConnectionPool:
+        """
+        打开连接池（重复调用无副作用）
+
+        Args:
+            min_size: 最小连接数（默认 Config.DB_POOL_MIN_SIZE）
+            max_size: 最大连接数（默认 Config.DB_POOL_MAX_SIZE）
+            timeout: 借出连接的最长等待秒数（默认 Config.DB_POOL_TIMEOUT）
+        """
         if cls._pool is None:
-            cls._pool = pool.ThreadedConnectionPool(
-                minconn,
-                maxconn,
-                **Config.get_database_config()
+            options = Config.get_pool_config()
+            new_pool = AsyncConnectionPool(
+                kwargs=_libpq_kwargs(cls._database_config()),
+                min_size=options['min_size'] if min_size is None else min_size,
+                max_size=options['max_size'] if max_size is None else max_size,
+                timeout=options['timeout'] if timeout is None else timeout,
+                max_lifetime=options['max_lifetime'],
+                max_idle=options['max_idle'],
+                configure=_configure_async_connection,
+                name=cls._name,
+                open=False,
             )
-    
+            cls._pool = new_pool
+            await new_pool.open()
+            logger.info(
+                "Async connection pool '%s' opened (min=%d, max=%d)",
+                cls._name, new_pool.min_size, new_pool.max_size,
+            )
+        return cls._pool
+
     @classmethod
-    @contextmanager
-    def get_connection(cls):
-        """从连接池获取连接"""
+    async def get_pool(cls) -> AsyncConnectionPool:
+        """获取连接池实例（未打开时自动打开）"""
         if cls._pool is None:
-            cls.initialize()
-        
-        conn = cls._pool.getconn()
+            return await cls.open()
+        return cls._pool
+
+    @classmethod
+    async def warm_up(
+        cls,
+        prepare: Optional[Callable[[psycopg.AsyncConnection], Awaitable[None]]] = None,
+        timeout: Optional[float] = None,
+    ) -> int:
+        """
+        预热：等待连接池建立到最小连接数，并在每个连接上执行 prepare(conn)（例如预编译常用语句）
+
+        Args:
+            prepare: 在每个连接上执行的初始化（执行后提交：psycopg 3 回滚时会清空驱动的预编译缓存，
+                prepare 中不应有写操作）
+            timeout: 等待连接的最长秒数（默认 Config.DB_POOL_TIMEOUT）
+
+        Returns:
+            预热的连接数（min_size 为 0 时也预热 1 个）
+        """
+        db_pool = await cls.get_pool()
+        timeout = Config.DB_POOL_TIMEOUT if timeout is None else timeout
+
+        # 同时借出 min_size 个连接：等待连接池建立完，并保证每个连接都执行一次 prepare
+        # （不使用 AsyncConnectionPool.wait()，它超时后会关闭连接池）
+        conns = []
         try:
-            yield conn
-            conn.commit()
-        except Exception:
-            conn.rollback()
-            raise
+            for _ in range(max(db_pool.min_size, 1)):
+                conns.append(await db_pool.getconn(timeout=timeout))
+            if prepare is not None:
+                async def prepare_one(conn) -> None:
+                    await prepare(conn)
+                    await conn.commit()
+                await asyncio.gather(*(prepare_one(conn) for conn in conns))
         finally:
-            cls._pool.putconn(conn)
-    
+            for conn in conns:
+                await _async_putconn(db_pool, conn)
+        return len(conns)
+
     @classmethod
-    def close_all(cls):
-        """关闭所有连接"""
-        if cls._pool:
-            cls._pool.closeall()
+    def stats(cls) -> dict:
+        """连接池状态；未打开时返回空字典"""
+        return cls._pool.get_stats() if cls._pool is not None else {}
+
+    @classmethod
+    async def close(cls) -> None:
+        """关闭连接池"""
+        if cls._pool is not None:
+            current, cls._pool = cls._pool, None
+            await current.close()
+
+
+class AsyncReplicaPool(AsyncDatabasePool):
+    """异步只读副本连接池（仅在 Config.has_replica() 时使用）"""
+
+    _pool: Optional[AsyncConnectionPool] = None
+    _name = "async-replica"
+
+    @classmethod
+    def _database_config(cls) -> dict:
+        return Config.get_replica_database_config()
+
+
+async def _async_measure_replica_lag(replica_pool: AsyncConnectionPool) -> None:
+    try:
+        async with replica_pool.connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(REPLICA_LAG_SQL)
+                lag = float((await cursor.fetchone())[0])
+    except Exception as e:
+        logger.warning("Replica lag check failed, reading from primary: %s", e)
+        lag = None
+    replica_lag.record(lag)
+
+
+async def _async_read_pool() -> Optional[AsyncConnectionPool]:
+    """返回可用于只读事务的异步副本连接池；不满足条件时返回 None（读主库）"""
+    if not _replica_allowed():
+        return None
+    replica_pool = await AsyncReplicaPool.get_pool()
+    if replica_lag.begin_check():
+        await _async_measure_replica_lag(replica_pool)
+    return replica_pool if replica_lag.acceptable() else None
+
+
+async def _async_getconn(db_pool: AsyncConnectionPool):
+    """借出连接并记录等待时间"""
+    start = time.perf_counter()
+    conn = await db_pool.getconn()
+    elapsed = time.perf_counter() - start
+    db_checkout_wait.labels(db_pool.name).observe(elapsed)
+    record_phase(PHASE_CHECKOUT, elapsed)
+    return conn
+
+
+async def _async_checkout(db_pool: AsyncConnectionPool, fallback: Optional[AsyncConnectionPool]) -> tuple:
+    """借出连接；副本借出失败时回退到主库，返回 (连接池, 连接)"""
+    if fallback is None:
+        return db_pool, await _async_getconn(db_pool)
+    try:
+        return db_pool, await _async_getconn(db_pool)
+    except Exception as e:
+        logger.warning("Replica unavailable, reading from primary: %s", e)
+        replica_lag.record(None)
+        return fallback, await _async_getconn(fallback)
+
+
+# 每个异步连接池最近一次事务成功完成的时间（monotonic）；健康检查据此跳过主动探测
+_last_async_success: dict[str, float] = {}
+
+
+def last_transaction_success(pool_name: str = AsyncDatabasePool._name) -> Optional[float]:
+    """指定异步连接池最近一次事务成功完成的时间（time.monotonic()），没有过成功的事务时返回 None"""
+    return _last_async_success.get(pool_name)
+
+
+@asynccontextmanager
+async def _async_pooled_transaction(
+    db_pool: AsyncConnectionPool,
+    auto_commit: bool = False,
+    fallback: Optional[AsyncConnectionPool] = None,
+) -> AsyncGenerator:
+    """
+    从异步连接池借出连接并管理事务
+
+    Args:
+        db_pool: 异步连接池
+        auto_commit: 为 True 时由调用方（DAO）自行提交
+        fallback: db_pool 借出失败时改用的连接池（副本 → 主库）
+    """
+    db_pool, conn = await _async_checkout(db_pool, fallback)
+    try:
+        yield conn
+        if not auto_commit:
+            with timed_phase(PHASE_DB):
+                await conn.commit()
+        _last_async_success[db_pool.name] = time.monotonic()
+        _run_after_commit(conn)
+    except Exception:
+        if not conn.closed:
+            try:
+                await conn.rollback()
+            except psycopg.Error:
+                pass  # 连接已损坏，归还时由连接池丢弃
+        prepared_statements.forget(conn)  # 回滚清空了驱动的预编译缓存
+        raise
+    finally:
+        _discard_after_commit(conn)
+        await _async_putconn(db_pool, conn)
+
+
+@asynccontextmanager
+async def async_db_transaction(readonly: bool = False) -> AsyncGenerator:
+    """
+    异步事务上下文管理器
+    
+    用法:
+        from utils.database import async_db_transaction
+        
+        async with async_db_transaction() as conn:
+            dao = AsyncContractTypeDAO(conn, auto_commit=False)
+            await dao.create(new_type)
+    
+    Args:
+        readonly: 只读事务；配置了副本且延迟在阈值内时使用副本
+    """
+    primary = await AsyncDatabasePool.get_pool()
+    if readonly:
+        replica_pool = await _async_read_pool()
+        if replica_pool is not None:
+            async with _async_pooled_transaction(replica_pool, fallback=primary) as conn:
+                yield conn
+            return
+    else:
+        mark_primary_write()
+
+    async with _async_pooled_transaction(primary) as conn:
+        yield conn
+
+
+async def astream_batches(
+    conn,
+    query: str,
+    params: Optional[Sequence] = None,
+    batch_size: Optional[int] = None,
+) -> AsyncGenerator[list, None]:
+    """
+    stream_batches 的异步版本（psycopg 3 AsyncServerCursor）
+    
+    用法:
+        async with async_db_transaction(readonly=True) as conn:
+            async for rows in astream_batches(conn, "SELECT ... FROM audit_logs"):
+                ...
+    """
+    size = batch_size or Config.DB_STREAM_BATCH_SIZE
+    async with conn.cursor(name=_stream_cursor_name()) as cursor:
+        cursor.itersize = size
+        await cursor.execute(query, params)
+        while rows := await cursor.fetchmany(size):
+            yield rows
+
+
+async def astream_query(
+    conn,
+    query: str,
+    params: Optional[Sequence] = None,
+    batch_size: Optional[int] = None,
+) -> AsyncGenerator[tuple, None]:
+    """逐行读取查询结果（异步版本，参数见 stream_batches）"""
+    # aclosing：调用方提前停止时立即关闭游标，而不是等到垃圾回收
+    async with aclosing(astream_batches(conn, query, params, batch_size)) as batches:
+        async for rows in batches:
+            for row in rows:
+                yield row
+
+
+# ============================================
+# LISTEN / NOTIFY
+# ============================================
+class NotificationListener:
+    """
+    监听 PostgreSQL 通知频道（后台任务，断线自动重连）
+    
+    使用独立的长连接（不占用连接池），每次（重新）连接成功后调用 on_connect，
+    因为断线期间的通知已经丢失，调用方应把依赖通知的状态整体作废。
+    
+    用法:
+        listener = NotificationListener('contract_types_changed', on_notify, on_connect)
+        await listener.start()
+        ...
+        await listener.stop()
+    """
+    
+    def __init__(
+        self,
+        channel: str,
+        on_notify: Callable[[str], None],
+        on_connect: Optional[Callable[[], None]] = None,
+        retry_interval: float = None,
+    ):
+        """
+        Args:
+            channel: 频道名
+            on_notify: 收到通知时调用，参数为载荷字符串
+            on_connect: 每次 LISTEN 成功后调用
+            retry_interval: 断线后重连间隔（秒），默认读取配置
+        """
+        self.channel = channel
+        self.on_notify = on_notify
+        self.on_connect = on_connect
+        self.retry_interval = (
+            Config.DB_CHANGE_FEED_RETRY_INTERVAL if retry_interval is None else retry_interval
+        )
+        self.heartbeat_interval = 30.0
+        self._task: Optional[asyncio.Task] = None
+        self._connected = False
+        self._received = 0
+        self._reconnects = 0
+    
+    @property
+    def connected(self) -> bool:
+        return self._connected
+    
+    async def _connect(self):
+        return await psycopg.AsyncConnection.connect(
+            **_libpq_kwargs(Config.get_database_config()),
+            autocommit=True,
+        )
+    
+    async def _run(self) -> None:
+        while True:
+            try:
+                conn = await self._connect()
+                try:
+                    await conn.execute(sql.SQL("LISTEN {}").format(sql.Identifier(self.channel)))
+                    self._connected = True
+                    logger.info("Listening on channel %s", self.channel)
+                    if self.on_connect is not None:
+                        self.on_connect()
+                    
+                    while True:
+                        async for notify in conn.notifies(timeout=self.heartbeat_interval):
+                            self._received += 1
+                            try:
+                                self.on_notify(notify.payload)
+                            except Exception:
+                                logger.exception("Notification handler failed (channel %s)", self.channel)
+                        # 空闲期间探测连接，及时发现静默断开（期间到达的通知由 psycopg 缓存）
+                        await conn.execute("SELECT 1")
+                finally:
+                    self._connected = False
+                    await conn.close()
+            except (psycopg.OperationalError, psycopg.InterfaceError, OSError) as e:
+                logger.warning(
+                    "LISTEN %s lost: %s, reconnecting in %ss", self.channel, e, self.retry_interval
+                )
+            self._reconnects += 1
+            await asyncio.sleep(self.retry_interval)
+    
+    async def start(self) -> None:
+        """启动后台监听任务"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name=f"listen-{self.channel}")
+    
+    async def stop(self) -> None:
+        """停止监听"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    def stats(self) -> dict:
+        return {
+            'channel': self.channel,
+            'connected': self._connected,
+            'received': self._received,
+            'reconnects': self._reconnects,
+        }
+
+# ============================================
+# 连接池指标（抓取 /metrics 时从 stats() 同步）
+# ============================================
+db_pool_connections = metrics.gauge('db_pool_connections', 'Pooled connections by state', ('pool', 'state'))
+db_pool_max_connections = metrics.gauge('db_pool_max_connections', 'Configured pool max size', ('pool',))
+db_pool_utilization = metrics.gauge('db_pool_utilization', 'In-use connections / max size', ('pool',))
+db_pool_waiting = metrics.gauge('db_pool_waiting_requests', 'Requests waiting for a connection', ('pool',))
+db_pool_failures = metrics.counter('db_pool_checkout_failures_total', 'Checkouts that timed out or failed', ('pool',))
+
+
+def _record_pool(name: str, in_use: int, idle: int, max_size: int, waiting: int, failures: int) -> None:
+    db_pool_connections.labels(name, 'in_use').set(in_use)
+    db_pool_connections.labels(name, 'idle').set(idle)
+    db_pool_max_connections.labels(name).set(max_size)
+    db_pool_utilization.labels(name).set(in_use / max_size if max_size else 0.0)
+    db_pool_waiting.labels(name).set(waiting)
+    db_pool_failures.labels(name).set_total(failures)
+
+
+@metrics.on_collect
+def _collect_pool_metrics() -> None:
+    for stats in (ConnectionPool.stats(), ReplicaConnectionPool.stats()):
+        if stats:
+            _record_pool(
+                stats['name'], stats['in_use'], stats['idle'],
+                stats['max_size'], stats['waiting'], stats['timeouts'],
+            )
+    for pool_cls in (AsyncDatabasePool, AsyncReplicaPool):
+        stats = pool_cls.stats()
+        if stats:
+            idle = stats.get('pool_available', 0)
+            _record_pool(
+                pool_cls._name, stats.get('pool_size', 0) - idle, idle,
+                stats.get('pool_max', 0), stats.get('requests_waiting', 0), stats.get('requests_errors', 0),
+            )
+
+
+track_cache('prepared_statements', prepared_statements.stats)
 
 
 # ============================================
@@ -0,0 +1,236 @@
+"""
+依赖健康检查
+Health Checks
+
+负载均衡每秒探测每个实例的 /health，如果每次探测都查库，扩容越多数据库负担越重。
+这里由后台任务每隔 HEALTH_CHECK_INTERVAL 秒检查一次 PostgreSQL、Redis 和上传目录的磁盘空间，
+/health 只读取缓存的结果（附带结果的时间），不做任何 I/O。
+
+- PostgreSQL：间隔内已有请求事务成功完成时直接记为正常，不额外查询；
+  空闲时才借一个池内连接执行 SELECT 1（连接池繁忙时也不会误报）
+- Redis：PING（REDIS_CACHE_ENABLED=false 时跳过）。Redis 只是缓存层，失败时整体状态为 degraded
+- 磁盘：上传目录所在文件系统的剩余空间不低于 HEALTH_MIN_FREE_DISK_MB
+
+结果超过 3 个检查间隔未更新（后台任务异常）时视为过期，按失败处理。
+"""
+
+import asyncio
+import os
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from config import Config
+from utils.database import AsyncDatabasePool, last_transaction_success
+from utils.logger import get_logger
+from utils.metrics import metrics
+from utils.redis_client import REDIS_ERRORS, RedisClient
+
+logger = get_logger(__name__)
+
+STATUS_HEALTHY = "healthy"
+STATUS_DEGRADED = "degraded"      # 非关键依赖（Redis）异常，服务仍可用
+STATUS_UNHEALTHY = "unhealthy"
+STATUS_STARTING = "starting"      # 第一轮检查尚未完成
+
+_STALE_INTERVALS = 3
+
+
+class _Check:
+    __slots__ = ('name', 'func', 'critical')
+
+    def __init__(self, name: str, func: Callable[[], Awaitable[Optional[dict]]], critical: bool):
+        self.name = name
+        self.func = func
+        self.critical = critical
+
+
+class HealthMonitor:
+    """
+    后台定期执行依赖检查，缓存最近一次结果
+
+    检查函数正常返回即为通过（可返回附加信息字典），抛出异常即为失败。
+
+    用法:
+        @health_monitor.check("postgres")
+        async def check_postgres(): ...
+
+        await health_monitor.start()     # lifespan 中
+        health_monitor.report()          # /health 中，只读缓存
+    """
+
+    def __init__(self, interval: Optional[float] = None, timeout: Optional[float] = None):
+        self.interval = Config.HEALTH_CHECK_INTERVAL if interval is None else interval
+        self.timeout = Config.HEALTH_CHECK_TIMEOUT if timeout is None else timeout
+        self._checks: dict[str, _Check] = {}
+        self._results: dict[str, dict] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def check(self, name: str, critical: bool = True) -> Callable:
+        """
+        注册检查（装饰器）
+
+        Args:
+            name: 检查名称（/health 返回的键）
+            critical: 失败时整体状态为 unhealthy（503）；否则为 degraded（200）
+        """
+        def decorate(func: Callable[[], Awaitable[Optional[dict]]]) -> Callable[[], Awaitable[Optional[dict]]]:
+            self._checks[name] = _Check(name, func, critical)
+            return func
+        return decorate
+
+    async def run_once(self) -> None:
+        """并发执行所有检查并更新缓存"""
+        await asyncio.gather(*(self._run(check) for check in self._checks.values()))
+
+    async def _run(self, check: _Check) -> None:
+        start = time.perf_counter()
+        try:
+            detail = await asyncio.wait_for(check.func(), self.timeout)
+            error = None
+        except asyncio.TimeoutError:
+            detail, error = None, f"Timed out after {self.timeout}s"
+        except Exception as e:
+            detail, error = None, str(e) or type(e).__name__
+        latency = time.perf_counter() - start
+
+        previous = self._results.get(check.name)
+        if error and (previous is None or previous['ok']):
+            logger.warning("❤️  Health check '%s' failed: %s", check.name, error)
+        elif not error and previous is not None and not previous['ok']:
+            logger.info("❤️  Health check '%s' recovered", check.name)
+
+        self._results[check.name] = {
+            'ok': error is None,
+            'critical': check.critical,
+            'latency_ms': round(latency * 1000, 3),
+            'error': error,
+            'detail': detail,
+            'checked_at': time.monotonic(),
+            'checked_at_iso': datetime.now().isoformat(),
+        }
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error("Health check round failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+    async def start(self) -> None:
+        """启动后台检查（重复调用无副作用）"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def report(self) -> dict:
+        """最近一次检查结果（只读缓存，不做 I/O）"""
+        now = time.monotonic()
+        stale_after = self.interval * _STALE_INTERVALS + self.timeout
+        checks = {}
+        status = STATUS_HEALTHY if self._results else STATUS_STARTING
+        for name, check in self._checks.items():
+            result = self._results.get(name)
+            if result is None:
+                checks[name] = {'status': 'pending'}
+                status = STATUS_STARTING if status == STATUS_HEALTHY else status
+                continue
+
+            age = now - result['checked_at']
+            ok = result['ok'] and age <= stale_after
+            checks[name] = {
+                'status': 'ok' if ok else ('stale' if result['ok'] else 'fail'),
+                'age_seconds': round(age, 3),
+                'checked_at': result['checked_at_iso'],
+                'latency_ms': result['latency_ms'],
+                **({'error': result['error']} if result['error'] else {}),
+                **(result['detail'] or {}),
+            }
+            if not ok:
+                if check.critical:
+                    status = STATUS_UNHEALTHY
+                elif status != STATUS_UNHEALTHY:
+                    status = STATUS_DEGRADED
+        return {'status': status, 'checks': checks}
+
+    def is_ok(self, name: str) -> Optional[bool]:
+        """某项检查最近一次是否通过（尚未检查时返回 None）"""
+        result = self._results.get(name)
+        return None if result is None else result['ok']
+
+
+# 全局实例（lifespan 中 start / stop）
+health_monitor = HealthMonitor()
+
+
+# ============================================
+# 内置检查
+# ============================================
+
+@health_monitor.check("postgres")
+async def check_postgres() -> dict:
+    """间隔内有成功的请求事务时不查库；否则借池内连接执行 SELECT 1"""
+    last_success = last_transaction_success()
+    if last_success is not None and time.monotonic() - last_success < health_monitor.interval:
+        return {'probe': 'passive'}
+
+    db_pool = await AsyncDatabasePool.get_pool()
+    async with db_pool.connection(timeout=health_monitor.timeout) as conn:
+        await conn.execute("SELECT 1")
+    return {'probe': 'active'}
+
+
+@health_monitor.check("redis", critical=False)
+async def check_redis() -> dict:
+    if not Config.REDIS_CACHE_ENABLED:
+        return {'probe': 'disabled'}
+    client = RedisClient.get_client()
+    if client is None:
+        raise ConnectionError("Redis unavailable (retrying after backoff)")
+    try:
+        await client.ping()
+    except REDIS_ERRORS as e:
+        RedisClient.mark_failed(e)
+        raise
+    return {'probe': 'ping'}
+
+
+@health_monitor.check("disk")
+async def check_disk() -> dict:
+    """上传目录所在文件系统的剩余空间（目录尚未创建时检查最近的已存在上级目录）"""
+    path = Path(Config.UPLOAD_DIR).resolve()
+    existing = path
+    while not existing.exists() and existing != existing.parent:
+        existing = existing.parent
+    usage = await asyncio.to_thread(shutil.disk_usage, existing)
+    free_mb = usage.free // (1024 * 1024)
+    if free_mb < Config.HEALTH_MIN_FREE_DISK_MB:
+        raise OSError(f"Only {free_mb} MB free on {existing} (minimum {Config.HEALTH_MIN_FREE_DISK_MB} MB)")
+    return {
+        'path': str(path),
+        'exists': path.exists(),
+        'writable': os.access(existing, os.W_OK),
+        'free_mb': free_mb,
+    }
+
+
+health_check_up = metrics.gauge('health_check_up', 'Last health check result (1 = ok)', ('check',))
+
+
+@metrics.on_collect
+def _collect_health_metrics() -> None:
+    for name in health_monitor._checks:
+        ok = health_monitor.is_ok(name)
+        if ok is not None:
+            health_check_up.labels(name).set(1 if ok else 0)
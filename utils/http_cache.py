@@ -0,0 +1,73 @@
+"""
+HTTP 条件请求工具
+Conditional GET Helpers
+
+根据数据版本生成 ETag / Last-Modified，并判断请求的 If-None-Match /
+If-Modified-Since 是否命中，命中时直接返回 304，不再查询和序列化数据。
+"""
+
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+# 浏览器每次使用缓存前都向服务器验证（配合 ETag 得到 304）
+CACHE_CONTROL = "no-cache"
+
+
+def make_etag(*parts) -> str:
+    """由版本信息生成强 ETag，例如 make_etag('contract-types', 42) → '"contract-types-42"'"""
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+def _http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def cache_headers(etag: str, last_modified: Optional[datetime] = None) -> dict:
+    """200 / 304 响应都要带上的验证头"""
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if last_modified is not None:
+        headers["Last-Modified"] = _http_date(last_modified)
+    return headers
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match 使用弱比较：忽略 W/ 前缀
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    判断客户端缓存是否仍然有效（RFC 9110 第 13 节）
+
+    同时带 If-None-Match 和 If-Modified-Since 时只看 If-None-Match。
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    # HTTP 日期只精确到秒
+    return last_modified.replace(microsecond=0) <= since
+
+
+def not_modified(headers: dict) -> Response:
+    """304 响应（无响应体）"""
+    return Response(status_code=304, headers=headers)
@@ -0,0 +1,133 @@
+"""
+日志收集进程
+Log Collector
+
+多进程部署时，各 worker 的 RotatingFileHandler 各自轮转同一组文件，
+会出现丢行、交错和反复轮转。开启 LOG_COLLECTOR_ENABLED 后，worker 通过
+logging.handlers.SocketHandler 把记录发到本进程，由这里唯一的一组
+DailyRotatingFileHandler 写文件、按日期和大小轮转、（可选）压缩。
+
+协议与标准库 SocketHandler 相同：4 字节长度（大端）+ pickle 的记录字典。
+pickle 数据可以执行任意代码，只能监听本机地址（默认 127.0.0.1）。
+
+运行:
+    python -m utils.log_collector
+或由启动器调用 start_collector_process()
+"""
+
+import logging
+import multiprocessing
+import pickle
+import signal
+import socketserver
+import struct
+import sys
+import threading
+from pathlib import Path
+from typing import Optional
+
+# 添加项目根目录到 Python 路径（直接运行本文件时）
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import Config
+from utils.logger import build_file_handlers
+
+_HEADER = struct.Struct(">L")
+
+
+class LogCollector:
+    """
+    接收 worker 发来的日志记录并写入文件
+
+    用法:
+        collector = LogCollector()
+        collector.serve_forever()   # 阻塞，直到 shutdown()
+    """
+
+    def __init__(self, host: Optional[str] = None, port: Optional[int] = None, handlers: Optional[dict] = None):
+        """
+        Args:
+            host: 监听地址，默认 Config.LOG_COLLECTOR_HOST
+            port: 监听端口，默认 Config.LOG_COLLECTOR_PORT（0 表示随机端口）
+            handlers: 写入记录的 handler，默认 build_file_handlers(collector=True)
+        """
+        self.handlers = handlers if handlers is not None else build_file_handlers(collector=True)
+        self.received = 0
+        self._lock = threading.Lock()
+        self._server = _CollectorServer(
+            (host or Config.LOG_COLLECTOR_HOST, Config.LOG_COLLECTOR_PORT if port is None else port),
+            self,
+        )
+
+    @property
+    def address(self) -> tuple:
+        return self._server.server_address
+
+    def handle(self, record: logging.LogRecord) -> None:
+        """把一条记录交给各个 handler（每个 handler 自带锁，多个连接并发写入是安全的）"""
+        with self._lock:
+            self.received += 1
+        for handler in self.handlers.values():
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def serve_forever(self) -> None:
+        try:
+            self._server.serve_forever(poll_interval=0.5)
+        finally:
+            self._server.server_close()
+            for handler in self.handlers.values():
+                handler.close()
+
+    def shutdown(self) -> None:
+        """停止接收（在其他线程中调用）"""
+        self._server.shutdown()
+
+
+class _RecordStreamHandler(socketserver.StreamRequestHandler):
+    """一个 worker 连接：循环读取 长度 + pickle 记录"""
+
+    def handle(self) -> None:
+        collector: LogCollector = self.server.collector
+        while True:
+            header = self.rfile.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return  # worker 断开
+            (length,) = _HEADER.unpack(header)
+            data = self.rfile.read(length)
+            if len(data) < length:
+                return
+            collector.handle(logging.makeLogRecord(pickle.loads(data)))
+
+
+class _CollectorServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address: tuple, collector: LogCollector):
+        self.collector = collector
+        super().__init__(address, _RecordStreamHandler)
+
+
+def run_collector(host: Optional[str] = None, port: Optional[int] = None) -> None:
+    """运行收集进程直到收到 SIGTERM / SIGINT"""
+    collector = LogCollector(host, port)
+
+    def stop(signum, frame):
+        threading.Thread(target=collector.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    print(f"📝 Log collector listening on {collector.address[0]}:{collector.address[1]}")
+    collector.serve_forever()
+
+
+def start_collector_process() -> multiprocessing.Process:
+    """在子进程中启动日志收集器（由多进程启动器在 fork worker 之前调用）"""
+    process = multiprocessing.Process(target=run_collector, name="log-collector", daemon=False)
+    process.start()
+    return process
+
+
+if __name__ == "__main__":
+    run_collector()
@@ -1,20 +1,51 @@
 """
 日志模块 - 统一的日志配置和管理
 使用 Python logging 标准库
+
+所有 logger 只挂一个 QueueHandler：记录放入内存队列后立即返回，
+由后台线程中唯一的 QueueListener 写控制台和文件，请求处理不会阻塞在磁盘 I/O 上。
+控制台 / 文件 / 错误文件 handler 整个进程只各创建一个，被所有 logger 共享，
+不会再出现多个 handler 同时打开、轮转同一个文件。
+
+日志调用请使用 %s 占位符（logger.info("处理合同: %s", contract_id)），
+级别未开启时不会格式化参数。
+
+文件按日期命名（app_YYYYMMDD.log），跨天自动切换，超过大小后轮转（可 gzip 压缩）。
+多进程部署时开启 LOG_COLLECTOR_ENABLED：worker 不再写文件，而是把记录发送给
+单独的收集进程（utils/log_collector.py），由它统一写文件和轮转。
+LOG_SAMPLING 可按 logger 只保留一部分 WARNING 以下的记录。
 """
 
+import atexit
+import copy
+import gzip
 import logging
 import logging.handlers
+import os
+import queue
+import random
+import shutil
+import threading
+import time
+from functools import lru_cache
 from pathlib import Path
 from datetime import datetime
 import sys
 
+from config import Config
+
 # 日志目录
 LOG_DIR = Path("logs")
 LOG_DIR.mkdir(exist_ok=True)
 
 # 日志格式
 LOG_FORMAT = "%(asctime)s | %(levelname)-8s | %(name)s | %(message)s"
+ERROR_LOG_FORMAT = "%(asctime)s | %(levelname)s | %(name)s | %(filename)s:%(lineno)d | %(message)s"
+# 收集进程写入的文件带上来源进程号
+COLLECTOR_LOG_FORMAT = "%(asctime)s | %(levelname)-8s | %(process)d | %(name)s | %(message)s"
+COLLECTOR_ERROR_LOG_FORMAT = (
+    "%(asctime)s | %(levelname)s | %(process)d | %(name)s | %(filename)s:%(lineno)d | %(message)s"
+)
 DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 
 # 颜色代码（用于控制台输出）
@@ -27,19 +58,286 @@ COLORS = {
     'RESET': '\033[0m'      # 重置
 }
 
+# 输出目标（对应 setup_logger 的 log_to_console / log_to_file）
+TARGET_CONSOLE = "console"
+TARGET_FILE = "file"
+
 
 class ColoredFormatter(logging.Formatter):
     """带颜色的日志格式化器（仅用于控制台）"""
     
     def format(self, record):
-        # 添加颜色
+        # 同一条记录还要交给文件 handler，在副本上添加颜色
         levelname = record.levelname
         if levelname in COLORS:
+            record = copy.copy(record)
             record.levelname = f"{COLORS[levelname]}{levelname}{COLORS['RESET']}"
         
         return super().format(record)
 
 
+def _gzip_rotator(source: str, dest: str) -> None:
+    """轮转时把旧文件压缩为 dest（.gz）"""
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+class DailyRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    按日期命名、按大小轮转的文件 handler
+    
+    写入 {prefix}_YYYYMMDD.log；跨过午夜后切换到新日期的文件，
+    同一天内超过 max_bytes 时轮转为 .1、.2 ...（compress=True 时为 .1.gz ...）。
+    只应由一个进程写同一组文件（多进程部署使用日志收集进程）。
+    """
+    
+    def __init__(
+        self,
+        directory: Path,
+        prefix: str,
+        max_bytes: int,
+        backup_count: int,
+        compress: bool = False,
+        encoding: str = 'utf-8',
+    ):
+        self.directory = Path(directory)
+        self.prefix = prefix
+        self.compress = compress
+        self._next_day = self._compute_next_day(time.time())
+        super().__init__(
+            self._path_for(time.time()), maxBytes=max_bytes, backupCount=backup_count,
+            encoding=encoding, delay=True,
+        )
+        if compress:
+            self.namer = lambda name: name + ".gz"
+            self.rotator = _gzip_rotator
+    
+    def _path_for(self, timestamp: float) -> str:
+        return str(self.directory / f"{self.prefix}_{time.strftime('%Y%m%d', time.localtime(timestamp))}.log")
+    
+    @staticmethod
+    def _compute_next_day(timestamp: float) -> float:
+        tm = time.localtime(timestamp)
+        return time.mktime((tm.tm_year, tm.tm_mon, tm.tm_mday + 1, 0, 0, 0, 0, 0, -1))
+    
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if record.created >= self._next_day:
+            return True
+        return bool(super().shouldRollover(record))
+    
+    def doRollover(self) -> None:
+        now = time.time()
+        if now < self._next_day:
+            super().doRollover()
+            return
+        
+        # 跨天：关闭前一天的文件（需要时整体压缩），改写新日期的文件
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        previous = self.baseFilename
+        if self.compress and os.path.exists(previous):
+            _gzip_rotator(previous, previous + ".gz")
+        self._next_day = self._compute_next_day(now)
+        self.baseFilename = os.path.abspath(self._path_for(now))
+
+
+def build_file_handlers(collector: bool = False) -> dict[str, logging.Handler]:
+    """
+    创建写文件的 handler：app（全部记录）和 error（ERROR 及以上）
+    
+    Args:
+        collector: 由日志收集进程使用（格式中带来源进程号）
+    """
+    app_format, error_format = (
+        (COLLECTOR_LOG_FORMAT, COLLECTOR_ERROR_LOG_FORMAT) if collector else (LOG_FORMAT, ERROR_LOG_FORMAT)
+    )
+    handlers = {}
+    for name, level, fmt in (('file', logging.DEBUG, app_format), ('error', logging.ERROR, error_format)):
+        handler = DailyRotatingFileHandler(
+            LOG_DIR,
+            'app' if name == 'file' else 'error',
+            max_bytes=Config.LOG_FILE_MAX_BYTES,
+            backup_count=Config.LOG_FILE_BACKUP_COUNT,
+            compress=Config.LOG_FILE_COMPRESS,
+        )
+        handler.setLevel(level)
+        handler.setFormatter(logging.Formatter(fmt, DATE_FORMAT))
+        handlers[name] = handler
+    return handlers
+
+
+class SamplingFilter(logging.Filter):
+    """
+    按 logger 采样 WARNING 以下的记录
+    
+    rates 以 logger 名称为键（同时作用于子 logger，例如 'workflow' 覆盖 'workflow.nodes'），
+    值为保留比例（0~1）。WARNING 及以上的记录总是保留。
+    """
+    
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self.rates = dict(rates)
+        self.dropped = 0
+        self._rate_for = lru_cache(maxsize=1024)(self._lookup)
+    
+    def _lookup(self, name: str) -> float:
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition('.')[0]
+        return 1.0
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate_for(record.name)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        self.dropped += 1
+        return False
+
+
+class _TargetFilter(logging.Filter):
+    """共享 handler 只处理发往自己的记录"""
+    
+    def __init__(self, target: str):
+        super().__init__()
+        self.target = target
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        return self.target in getattr(record, 'log_targets', (self.target,))
+
+
+class _TargetedQueueHandler(logging.handlers.QueueHandler):
+    """放入队列前标记记录的输出目标"""
+    
+    def __init__(self, log_queue, targets: frozenset):
+        super().__init__(log_queue)
+        self.targets = targets
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = super().prepare(record)
+        record.log_targets = self.targets
+        return record
+
+
+class LogDispatcher:
+    """
+    进程内唯一的日志队列与后台写入线程
+    
+    - 队列不限长度，put 不会阻塞调用方
+    - 文件输出：LOG_COLLECTOR_ENABLED 时经 SocketHandler 发给收集进程（连接断开时
+      丢弃记录并自动重连），否则直接写本地文件
+    - 共享 handler 在第一次使用时创建，进程退出时（atexit）停止监听并写完队列中的记录
+    - fork 出的子进程不继承后台线程，子进程中自动换新队列并重新启动
+    """
+    
+    _lock = threading.Lock()
+    _queue: "queue.SimpleQueue" = queue.SimpleQueue()
+    _listener = None
+    _handlers: dict[str, logging.Handler] = {}
+    _queue_handlers: dict[frozenset, _TargetedQueueHandler] = {}
+    _sampling = SamplingFilter(Config.get_log_sampling())
+    
+    @classmethod
+    def _build_handlers(cls) -> dict[str, logging.Handler]:
+        # 1. 控制台 Handler（带颜色）
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setLevel(logging.DEBUG)
+        console_handler.setFormatter(ColoredFormatter(LOG_FORMAT, DATE_FORMAT))
+        console_handler.addFilter(_TargetFilter(TARGET_CONSOLE))
+        handlers = {'console': console_handler}
+        
+        # 2. 文件：发给收集进程，或直接写本地文件（全部日志 + 错误日志）
+        if Config.LOG_COLLECTOR_ENABLED:
+            file_handlers = {
+                'collector': logging.handlers.SocketHandler(Config.LOG_COLLECTOR_HOST, Config.LOG_COLLECTOR_PORT),
+            }
+        else:
+            file_handlers = build_file_handlers()
+        for handler in file_handlers.values():
+            handler.addFilter(_TargetFilter(TARGET_FILE))
+        handlers.update(file_handlers)
+        
+        return handlers
+    
+    @classmethod
+    def queue_handler(cls, targets: frozenset) -> logging.Handler:
+        """获取发往 targets 的 QueueHandler（相同目标的 logger 共用一个），必要时启动后台线程"""
+        with cls._lock:
+            handler = cls._queue_handlers.get(targets)
+            if handler is None:
+                handler = cls._queue_handlers[targets] = _TargetedQueueHandler(cls._queue, targets)
+                if cls._sampling.rates:
+                    handler.addFilter(cls._sampling)  # 入队前丢弃，不占队列和写入
+            cls._start_locked()
+            return handler
+    
+    @classmethod
+    def handlers(cls) -> dict[str, logging.Handler]:
+        """共享的输出 handler（console / file / error）"""
+        with cls._lock:
+            if not cls._handlers:
+                cls._handlers = cls._build_handlers()
+            return dict(cls._handlers)
+    
+    @classmethod
+    def start(cls) -> None:
+        """启动后台写入线程（重复调用无副作用）"""
+        with cls._lock:
+            cls._start_locked()
+    
+    @classmethod
+    def _start_locked(cls) -> None:
+        if cls._listener is not None:
+            return
+        if not cls._handlers:
+            cls._handlers = cls._build_handlers()
+        cls._listener = logging.handlers.QueueListener(
+            cls._queue, *cls._handlers.values(), respect_handler_level=True
+        )
+        cls._listener.start()
+    
+    @classmethod
+    def stop(cls) -> None:
+        """停止后台线程（先写完队列中已有的记录）"""
+        with cls._lock:
+            listener, cls._listener = cls._listener, None
+        if listener is not None:
+            listener.stop()
+    
+    @classmethod
+    def stats(cls) -> dict:
+        return {
+            'running': cls._listener is not None,
+            'queued': cls._queue.qsize(),
+            'handlers': sorted(cls._handlers),
+            'sampled_out': cls._sampling.dropped,
+        }
+    
+    @classmethod
+    def _after_fork_in_child(cls) -> None:
+        # 父进程的后台线程不存在于子进程中：换新队列，已有的 logger 改投新队列
+        cls._lock = threading.Lock()
+        cls._queue = queue.SimpleQueue()
+        for handler in cls._queue_handlers.values():
+            handler.queue = cls._queue
+        # 父进程已连接的收集器套接字不能与子进程共用，首次写入时重新连接
+        for handler in cls._handlers.values():
+            if isinstance(handler, logging.handlers.SocketHandler):
+                handler.sock = None
+        running, cls._listener = cls._listener is not None, None
+        if running:
+            cls.start()
+
+
+atexit.register(LogDispatcher.stop)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=LogDispatcher._after_fork_in_child)
+
+
 def setup_logger(
     name: str,
     level: str = "INFO",
@@ -66,45 +364,12 @@ def setup_logger(
     if logger.handlers:
         return logger
     
-    # 1. 控制台 Handler（带颜色）
-    if log_to_console:
-        console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setLevel(logging.DEBUG)
-        console_formatter = ColoredFormatter(LOG_FORMAT, DATE_FORMAT)
-        console_handler.setFormatter(console_formatter)
-        logger.addHandler(console_handler)
-    
-    # 2. 文件 Handler（所有日志）
-    if log_to_file:
-        # 按日期命名日志文件
-        log_file = LOG_DIR / f"app_{datetime.now().strftime('%Y%m%d')}.log"
-        file_handler = logging.handlers.RotatingFileHandler(
-            log_file,
-            maxBytes=10 * 1024 * 1024,  # 10MB
-            backupCount=5,
-            encoding='utf-8'
-        )
-        file_handler.setLevel(logging.DEBUG)
-        file_formatter = logging.Formatter(LOG_FORMAT, DATE_FORMAT)
-        file_handler.setFormatter(file_formatter)
-        logger.addHandler(file_handler)
-    
-    # 3. 错误日志单独记录
-    if log_to_file:
-        error_log_file = LOG_DIR / f"error_{datetime.now().strftime('%Y%m%d')}.log"
-        error_handler = logging.handlers.RotatingFileHandler(
-            error_log_file,
-            maxBytes=10 * 1024 * 1024,
-            backupCount=5,
-            encoding='utf-8'
-        )
-        error_handler.setLevel(logging.ERROR)
-        error_formatter = logging.Formatter(
-            "%(asctime)s | %(levelname)s | %(name)s | %(filename)s:%(lineno)d | %(message)s",
-            DATE_FORMAT
-        )
-        error_handler.setFormatter(error_formatter)
-        logger.addHandler(error_handler)
+    targets = frozenset(
+        target for target, enabled in ((TARGET_CONSOLE, log_to_console), (TARGET_FILE, log_to_file))
+        if enabled
+    )
+    if targets:
+        logger.addHandler(LogDispatcher.queue_handler(targets))
     
     return logger
 
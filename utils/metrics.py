@@ -0,0 +1,488 @@
+"""
+进程内指标
+Metrics
+
+轻量的 Counter / Gauge / Histogram 注册表，由 main.py 在 /metrics 以
+Prometheus 文本格式（0.0.4）输出，不依赖 prometheus_client。
+
+- 热路径上只有一次字典查找、一次 bisect 和一次无竞争的加锁，
+  直方图使用固定桶，内存占用与请求量无关
+- 连接池、缓存等已有 stats() 的组件不在热路径上埋点，
+  而是通过 on_collect() 注册回调，在抓取时把 stats() 同步到指标
+- 多 worker 部署时每个进程各自计数，抓取方需要逐个进程抓取或按实例聚合
+
+用法:
+    from utils.metrics import metrics
+
+    requests_total = metrics.counter('app_requests_total', '请求数', ('route',))
+    requests_total.labels('/api/contract-type/all').inc()
+
+    latency = metrics.histogram('app_latency_seconds', '耗时', ('route',))
+    with latency.labels('/api/contract-type/all').time():
+        ...
+"""
+
+import functools
+import inspect
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Iterable, Optional, Sequence
+
+from utils.logger import get_logger
+from utils.timing import record_phase
+
+logger = get_logger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 默认桶（秒）：覆盖 1ms ~ 10s 的请求耗时
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 默认输出的分位数估计
+DEFAULT_QUANTILES = (0.5, 0.95, 0.99)
+
+
+# ============================================
+# 指标类型
+# ============================================
+
+class _CounterChild:
+    """一组标签值对应的计数器"""
+
+    __slots__ = ('_value', '_lock')
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def set_total(self, value: float) -> None:
+        """同步外部的累计值（只用于单调递增的来源，例如组件 stats() 中的命中次数）"""
+        self._value = float(value)
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class _GaugeChild:
+    """一组标签值对应的仪表"""
+
+    __slots__ = ('_value', '_lock')
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value -= amount
+
+    def set(self, value: float) -> None:
+        self._value = float(value)
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class _HistogramChild:
+    """一组标签值对应的直方图（桶内计数非累计存储，输出时再累加）"""
+
+    __slots__ = ('_bounds', '_counts', '_sum', '_lock')
+
+    def __init__(self, bounds: tuple):
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)  # 最后一个是 +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self._bounds, value)  # value <= bounds[index]
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def time(self) -> '_Timer':
+        """计时上下文管理器，退出时记录耗时（秒）"""
+        return _Timer(self)
+
+    def snapshot(self) -> tuple[list[int], float]:
+        """返回 (累计桶计数, 总和)"""
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative, running = [], 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, total
+
+    def quantile(self, q: float) -> float:
+        """
+        按桶线性插值估计分位数（与 PromQL histogram_quantile 的算法相同）
+
+        统计范围是进程启动以来的全部观测值；需要时间窗口时在 Prometheus 中对 _bucket 求 rate。
+        落在 +Inf 桶时返回最大的有限边界。
+        """
+        cumulative, _ = self.snapshot()
+        count = cumulative[-1]
+        if count == 0:
+            return math.nan
+        rank = q * count
+        index = bisect_left(cumulative, rank)
+        if index >= len(self._bounds):
+            return self._bounds[-1]
+        lower = self._bounds[index - 1] if index > 0 else 0.0
+        below = cumulative[index - 1] if index > 0 else 0
+        in_bucket = cumulative[index] - below
+        if in_bucket == 0:
+            return self._bounds[index]
+        return lower + (self._bounds[index] - lower) * (rank - below) / in_bucket
+
+
+class _Timer:
+    __slots__ = ('_child', '_start')
+
+    def __init__(self, child: _HistogramChild):
+        self._child = child
+
+    def __enter__(self) -> '_Timer':
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._child.observe(time.perf_counter() - self._start)
+
+
+class _Metric:
+    """指标族：名称 + 标签名，按标签值保存子指标"""
+
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def labels(self, *values) -> object:
+        """按标签值（位置参数，顺序与 labelnames 一致）取子指标，不存在时创建"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(
+                    f"{self.name} expects labels {self.labelnames}, got {values}"
+                )
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _items(self) -> list[tuple[tuple, object]]:
+        """(字符串化的标签值, 子指标)"""
+        with self._lock:
+            items = list(self._children.items())
+        return [(tuple(str(v) for v in values), child) for values, child in items]
+
+    def clear(self) -> None:
+        """删除所有子指标（例如标签对应的对象已不存在时）"""
+        with self._lock:
+            self._children.clear()
+            if not self.labelnames:
+                self._default = self._children[()] = self._new_child()
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {_escape_help(self.documentation)}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        for values, child in self._items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+
+    type_name = 'counter'
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """无标签时直接计数"""
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    """可增可减的当前值"""
+
+    type_name = 'gauge'
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default.dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+
+class Histogram(_Metric):
+    """
+    固定桶直方图
+
+    除标准的 _bucket / _sum / _count 外，还输出 <name>_quantile 仪表族，
+    给出按桶估计的分位数（不接 Prometheus 时也能直接查看 p50 / p95 / p99）。
+    """
+
+    type_name = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        quantiles: Sequence[float] = DEFAULT_QUANTILES,
+    ):
+        self.buckets = tuple(sorted(float(b) for b in buckets if b != math.inf))
+        if not self.buckets:
+            raise ValueError(f"{name} needs at least one finite bucket")
+        self.quantiles = tuple(quantiles)
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def time(self) -> _Timer:
+        return self._default.time()
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {_escape_help(self.documentation)}",
+            f"# TYPE {self.name} histogram",
+        ]
+        quantile_lines = []
+        label_names = self.labelnames + ('le',)
+        for values, child in self._items():
+            cumulative, total = child.snapshot()
+            for bound, count in zip(self.buckets + (math.inf,), cumulative):
+                labels = _format_labels(label_names, values + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative[-1]}")
+            for q in self.quantiles:
+                labels = _format_labels(self.labelnames + ('quantile',), values + (str(q),))
+                quantile_lines.append(f"{self.name}_quantile{labels} {_format_value(child.quantile(q))}")
+
+        if quantile_lines:
+            lines.append(f"# HELP {self.name}_quantile Estimated quantiles of {self.name} since start")
+            lines.append(f"# TYPE {self.name}_quantile gauge")
+            lines.extend(quantile_lines)
+        return lines
+
+
+# ============================================
+# 注册表
+# ============================================
+
+class MetricsRegistry:
+    """指标注册表：同名指标只创建一次，render() 输出全部指标"""
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: list[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        quantiles: Sequence[float] = DEFAULT_QUANTILES,
+    ) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets, quantiles=quantiles)
+
+    def _register(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif type(metric) is not cls or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} already registered as {metric.type_name}{metric.labelnames}")
+            return metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def on_collect(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """注册抓取前执行的回调（把组件的 stats() 同步到指标），可用作装饰器"""
+        self._collectors.append(callback)
+        return callback
+
+    def collect(self) -> None:
+        """执行所有抓取回调；单个回调失败不影响其他指标"""
+        for callback in list(self._collectors):
+            try:
+                callback()
+            except Exception as e:
+                logger.warning("Metrics collector %s failed: %s", getattr(callback, '__name__', callback), e)
+
+    def render(self) -> str:
+        """Prometheus 文本格式"""
+        self.collect()
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# 全局注册表
+metrics = MetricsRegistry()
+
+
+# ============================================
+# 通用埋点
+# ============================================
+
+def instrument_methods(
+    histogram: Histogram,
+    component: Optional[str] = None,
+    phase: Optional[str] = None,
+) -> Callable[[type], type]:
+    """
+    类装饰器：记录公开方法（同步或 async）的耗时，标签为 (组件名, 方法名)
+
+    指定 phase 时同一次计时还会累加到当前请求的分阶段计时（utils.timing）。
+
+    生成器方法（分批 / 流式读取）的耗时取决于调用方的消费速度，不做记录；
+    私有方法、静态方法和类方法保持不变。
+
+    用法:
+        @instrument_methods(db_query_duration, phase=PHASE_DB)
+        class ContractTypeDAO: ...
+    """
+    def decorate(cls: type) -> type:
+        name = component or cls.__name__
+        for attr, func in list(vars(cls).items()):
+            if attr.startswith('_') or not inspect.isfunction(func):
+                continue
+            if inspect.isgeneratorfunction(func) or inspect.isasyncgenfunction(func):
+                continue
+            setattr(cls, attr, _timed(func, histogram.labels(name, attr), phase))
+        return cls
+    return decorate
+
+
+def _timed(func: Callable, child: _HistogramChild, phase: Optional[str] = None) -> Callable:
+    def observe(elapsed: float) -> None:
+        child.observe(elapsed)
+        if phase is not None:
+            record_phase(phase, elapsed)
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                observe(time.perf_counter() - start)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            observe(time.perf_counter() - start)
+    return wrapper
+
+
+cache_hits = metrics.counter('cache_hits_total', 'Cache hits', ('cache',))
+cache_misses = metrics.counter('cache_misses_total', 'Cache misses', ('cache',))
+cache_hit_ratio = metrics.gauge('cache_hit_ratio', 'Cache hits / lookups since start', ('cache',))
+
+
+def track_cache(name: str, stats: Callable[[], Optional[dict]]) -> None:
+    """
+    抓取时把缓存 stats() 中的 hits / misses 同步为指标
+
+    Args:
+        name: 标签 cache 的值
+        stats: 返回包含 hits / misses 的字典；返回 None 或空字典时跳过（例如缓存未启用）
+    """
+    def collect() -> None:
+        current = stats()
+        if not current or 'hits' not in current:
+            return
+        hits, misses = current['hits'], current['misses']
+        cache_hits.labels(name).set_total(hits)
+        cache_misses.labels(name).set_total(misses)
+        cache_hit_ratio.labels(name).set(hits / (hits + misses) if hits + misses else 0.0)
+
+    collect.__name__ = f"track_cache[{name}]"
+    metrics.on_collect(collect)
+
+
+# ============================================
+# 内部函数
+# ============================================
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if value != value:
+        return "NaN"
+    if float(value).is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_help(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
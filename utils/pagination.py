@@ -0,0 +1,70 @@
+"""
+分页工具
+Keyset Pagination Helpers
+
+列表接口使用键集分页（keyset / seek）：游标记录上一页最后一行的排序键，
+下一页用 WHERE (排序键) > (游标) 直接定位，第 N 页与第 1 页的代价相同，
+不像 OFFSET 那样需要扫描并丢弃前面的所有行。
+
+游标对客户端是不透明的字符串（URL 安全的 base64 编码 JSON）。
+"""
+
+import base64
+import json
+from typing import Optional
+
+
+def encode_cursor(values: tuple) -> str:
+    """把排序键编码为游标"""
+    raw = json.dumps(list(values), ensure_ascii=False, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, types: tuple) -> tuple:
+    """
+    解析游标
+
+    Args:
+        cursor: encode_cursor 生成的字符串
+        types: 每个排序键的类型，例如 (int, str)
+
+    Raises:
+        ValueError: 游标格式不正确
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+    if not isinstance(values, list) or len(values) != len(types):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    if not all(type(value) is expected for value, expected in zip(values, types)):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return tuple(values)
+
+
+def parse_fields(fields: Optional[str], allowed: tuple) -> Optional[tuple]:
+    """
+    解析稀疏字段参数（fields=type_code,type_name）
+
+    Returns:
+        按 allowed 中的顺序排列的字段元组；未指定时返回 None（表示全部字段）
+
+    Raises:
+        ValueError: 包含未知字段，或指定了参数但没有任何字段（例如 fields=,）
+    """
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(',') if name.strip()}
+    if not requested:
+        raise ValueError("fields must not be empty")
+    unknown = requested - set(allowed)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(name for name in allowed if name in requested)
+
+
+def escape_like(prefix: str) -> str:
+    """转义 LIKE 通配符，用于前缀匹配（配合 ESCAPE '\\'）"""
+    return prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
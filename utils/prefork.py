@@ -0,0 +1,251 @@
+"""
+生产模式启动器
+Prefork Server
+
+`python main.py` 是开发模式（单进程，API_DEBUG 时自动重载）。生产环境使用:
+
+    python main.py serve [--workers N] [--host H] [--port P]
+
+- 主进程导入应用、绑定端口后 fork 出 N 个 worker（API_WORKERS，0 表示 CPU 核数），
+  worker 共享监听套接字，导入后的代码和只读数据通过写时复制共享
+- 安装了 uvloop / httptools 时自动使用（uvicorn[standard] 已包含）
+- 按 DB_MAX_CONNECTIONS 在 worker 之间分配连接池大小，合计不超过数据库的连接上限
+- SIGTERM / SIGINT：转发给所有 worker，worker 停止接受新连接、等待进行中的请求完成
+  （最长 API_GRACEFUL_TIMEOUT 秒）后退出；超时仍未退出的 worker 被强制结束
+- worker 意外退出时自动重启
+- LOG_COLLECTOR_ENABLED 时先启动日志收集进程，所有 worker 退出后再停止它
+
+连接池在每个 worker 的 lifespan 中打开，fork 之前主进程不建立数据库连接。
+"""
+
+import importlib.util
+import os
+import signal
+import socket
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import uvicorn
+
+from config import Config
+from utils.logger import LogDispatcher, get_logger
+
+logger = get_logger(__name__)
+
+# 每个 worker 的连接数 = 异步连接池 + 同步连接池（共用 DB_POOL_* 配置）+ 变更通知的 LISTEN 连接
+_POOLS_PER_WORKER = 2
+
+_RESTART_BACKOFF = 1.0     # worker 启动后这么短时间内退出时，重启前先等待（秒）
+_POLL_INTERVAL = 0.2
+
+
+@dataclass(frozen=True)
+class PoolBudget:
+    """每个 worker 的连接池大小"""
+    min_size: int
+    max_size: int
+    per_worker: int     # 每个 worker 最多占用的连接数（含 LISTEN 连接）
+
+
+def split_pool_budget(
+    workers: int,
+    max_connections: Optional[int] = None,
+    pool_min: Optional[int] = None,
+    pool_max: Optional[int] = None,
+    listener: Optional[bool] = None,
+) -> PoolBudget:
+    """
+    把连接数预算平均分给各 worker
+
+    每个 worker 的连接池不超过 DB_POOL_MAX_SIZE，也不超过预算允许的大小。
+
+    Args:
+        workers: worker 数量
+        max_connections: 所有 worker 合计可用的连接数（默认 Config.DB_MAX_CONNECTIONS）
+        pool_min: 单个连接池的最小连接数（默认 Config.DB_POOL_MIN_SIZE）
+        pool_max: 单个连接池的最大连接数上限（默认 Config.DB_POOL_MAX_SIZE）
+        listener: 每个 worker 是否占用一个 LISTEN 连接（默认 Config.DB_CHANGE_FEED_ENABLED）
+
+    Raises:
+        ValueError: 预算不足以给每个 worker 的连接池至少一个连接
+    """
+    max_connections = Config.DB_MAX_CONNECTIONS if max_connections is None else max_connections
+    pool_min = Config.DB_POOL_MIN_SIZE if pool_min is None else pool_min
+    pool_max = Config.DB_POOL_MAX_SIZE if pool_max is None else pool_max
+    reserved = int(Config.DB_CHANGE_FEED_ENABLED if listener is None else listener)
+
+    per_worker = max_connections // workers
+    max_size = min(pool_max, (per_worker - reserved) // _POOLS_PER_WORKER)
+    if max_size < 1:
+        raise ValueError(
+            f"DB_MAX_CONNECTIONS={max_connections} is too small for {workers} workers "
+            f"(each needs at least {_POOLS_PER_WORKER + reserved} connections)"
+        )
+    return PoolBudget(
+        min_size=min(pool_min, max_size),
+        max_size=max_size,
+        per_worker=max_size * _POOLS_PER_WORKER + reserved,
+    )
+
+
+def resolve_workers(workers: Optional[int] = None) -> int:
+    """worker 数量：参数 > Config.API_WORKERS > CPU 核数"""
+    workers = Config.API_WORKERS if workers is None else workers
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+def fastest_implementations() -> tuple[str, str]:
+    """返回 (事件循环, HTTP 解析器)：安装了 uvloop / httptools 时优先使用"""
+    loop = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    return loop, http
+
+
+class PreforkServer:
+    """
+    主进程：绑定端口、fork worker、转发信号、重启意外退出的 worker
+
+    用法:
+        PreforkServer("main:app", workers=4).run()
+    """
+
+    def __init__(
+        self,
+        app: str,
+        workers: Optional[int] = None,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        graceful_timeout: Optional[float] = None,
+    ):
+        self.app = app
+        self.workers = resolve_workers(workers)
+        self.host = host or Config.API_HOST
+        self.port = Config.API_PORT if port is None else port
+        self.graceful_timeout = Config.API_GRACEFUL_TIMEOUT if graceful_timeout is None else graceful_timeout
+        self.budget = split_pool_budget(self.workers)
+        self.loop, self.http = fastest_implementations()
+        self._children: dict[int, tuple[int, float]] = {}   # pid -> (序号, 启动时间)
+        self._stopping = False
+        self._socket: Optional[socket.socket] = None
+
+    def run(self) -> None:
+        """运行直到收到 SIGTERM / SIGINT 且所有 worker 退出"""
+        config = self._uvicorn_config()
+        config.load()   # 在主进程中导入应用（worker 通过写时复制共享）
+        self._socket = config.bind_socket()
+
+        collector = None
+        if Config.LOG_COLLECTOR_ENABLED:
+            from utils.log_collector import start_collector_process
+            collector = start_collector_process()
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+
+        logger.info(
+            "🚀 Serving %s on %s:%d with %d workers (loop=%s, http=%s, db pool %d~%d per worker, %d connections max)",
+            self.app, self.host, self.port, self.workers, self.loop, self.http,
+            self.budget.min_size, self.budget.max_size, self.budget.per_worker * self.workers,
+        )
+        try:
+            for index in range(self.workers):
+                self._spawn(config, index)
+            self._supervise(config)
+        finally:
+            self._socket.close()
+            if collector is not None:
+                collector.terminate()
+                collector.join(timeout=5)
+        logger.info("🛑 All workers stopped")
+
+    # ---------- 内部方法 ----------
+
+    def _uvicorn_config(self) -> uvicorn.Config:
+        return uvicorn.Config(
+            self.app,
+            host=self.host,
+            port=self.port,
+            loop=self.loop,
+            http=self.http,
+            lifespan="on",
+            access_log=False,   # 访问日志由 main.py 的中间件记录
+            proxy_headers=True,
+            timeout_graceful_shutdown=self.graceful_timeout,
+        )
+
+    def _spawn(self, config: uvicorn.Config, index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker(config, index)   # 不会返回
+        self._children[pid] = (index, time.monotonic())
+
+    def _run_worker(self, config: uvicorn.Config, index: int) -> None:
+        exit_code = 0
+        try:
+            # 独立进程组：终端的 Ctrl+C 只发给主进程，由主进程统一转发 SIGTERM
+            os.setpgid(0, 0)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            # 连接池在 lifespan 中按这里的大小打开
+            Config.DB_POOL_MIN_SIZE = self.budget.min_size
+            Config.DB_POOL_MAX_SIZE = self.budget.max_size
+            Config.API_HOST, Config.API_PORT = self.host, self.port
+            logger.info("Worker %d started (pid %d)", index, os.getpid())
+            uvicorn.Server(config).run(sockets=[self._socket])
+        except BaseException:
+            logger.exception("Worker %d crashed", index)
+            exit_code = 1
+        finally:
+            LogDispatcher.stop()   # os._exit 不执行 atexit，先把队列中的日志写完
+            os._exit(exit_code)
+
+    def _handle_stop(self, signum, frame) -> None:
+        if not self._stopping:
+            logger.info("Received %s, draining workers...", signal.Signals(signum).name)
+        self._stopping = True
+        for pid in self._children:
+            self._kill(pid, signal.SIGTERM)
+
+    def _supervise(self, config: uvicorn.Config) -> None:
+        deadline = None
+        while self._children:
+            if self._stopping and deadline is None:
+                deadline = time.monotonic() + self.graceful_timeout + 5
+            if deadline is not None and time.monotonic() > deadline:
+                logger.warning("Graceful shutdown timed out, killing %d workers", len(self._children))
+                for pid in self._children:
+                    self._kill(pid, signal.SIGKILL)
+                deadline = float('inf')
+
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                time.sleep(_POLL_INTERVAL)
+                continue
+            index, started = self._children.pop(pid, (None, 0.0))
+            if index is None or self._stopping:
+                continue
+
+            logger.warning("Worker %d (pid %d) exited with status %d, restarting", index, pid, os.waitstatus_to_exitcode(status))
+            if time.monotonic() - started < _RESTART_BACKOFF:
+                time.sleep(_RESTART_BACKOFF)
+            self._spawn(config, index)
+
+    @staticmethod
+    def _kill(pid: int, sig: int) -> None:
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+
+def serve(
+    app: str = "main:app",
+    workers: Optional[int] = None,
+    host: Optional[str] = None,
+    port: Optional[int] = None,
+) -> None:
+    """以生产模式启动（供 main.py serve 调用）"""
+    for error in Config.validate():
+        logger.warning("⚠️  %s", error)
+    PreforkServer(app, workers=workers, host=host, port=port).run()
@@ -0,0 +1,112 @@
+"""
+Redis 客户端模块
+Redis Client
+
+提供进程级共享的 Redis 客户端（异步给 API 使用，同步给脚本 / 同步 DAO 使用）。
+Redis 只是缓存层，不可用时调用方应回退到数据库：
+- 连接或命令失败后调用 mark_failed()，在 REDIS_RETRY_INTERVAL 秒内不再尝试
+- 设置 REDIS_CACHE_ENABLED=false 可完全关闭
+"""
+
+import threading
+import time
+from typing import Optional
+
+import redis
+import redis.asyncio
+
+from config import Config
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 视为 Redis 不可用的异常
+REDIS_ERRORS = (redis.RedisError, OSError)
+
+
+class RedisClient:
+    """
+    Redis 客户端（单例，惰性创建）
+
+    用法:
+        client = RedisClient.get_client()
+        if client is not None:
+            try:
+                value = await client.get('key')
+            except REDIS_ERRORS:
+                RedisClient.mark_failed()
+    """
+
+    _client = None
+    _sync_client = None
+    _lock = threading.Lock()
+    _failed_at: Optional[float] = None
+
+    @classmethod
+    def _connection_kwargs(cls) -> dict:
+        return {
+            **Config.get_redis_config(),
+            'socket_timeout': Config.REDIS_SOCKET_TIMEOUT,
+            'socket_connect_timeout': Config.REDIS_SOCKET_TIMEOUT,
+        }
+
+    @classmethod
+    def available(cls) -> bool:
+        """Redis 是否可用（未关闭且不在失败退避期内）"""
+        if not Config.REDIS_CACHE_ENABLED:
+            return False
+        if cls._failed_at is None:
+            return True
+        if time.monotonic() - cls._failed_at >= Config.REDIS_RETRY_INTERVAL:
+            cls._failed_at = None
+            return True
+        return False
+
+    @classmethod
+    def mark_failed(cls, error: Exception = None) -> None:
+        """记录一次失败，退避期内 get_client() 返回 None"""
+        if cls._failed_at is None:
+            logger.warning(
+                "Redis unavailable, falling back for %ss: %s",
+                Config.REDIS_RETRY_INTERVAL, error,
+            )
+        cls._failed_at = time.monotonic()
+
+    @classmethod
+    def get_client(cls):
+        """获取异步客户端，Redis 不可用时返回 None"""
+        if not cls.available():
+            return None
+        if cls._client is None:
+            with cls._lock:
+                if cls._client is None:
+                    cls._client = redis.asyncio.Redis(**cls._connection_kwargs())
+        return cls._client
+
+    @classmethod
+    def get_sync_client(cls):
+        """获取同步客户端（脚本 / 同步 DAO 使用），Redis 不可用时返回 None"""
+        if not cls.available():
+            return None
+        if cls._sync_client is None:
+            with cls._lock:
+                if cls._sync_client is None:
+                    cls._sync_client = redis.Redis(**cls._connection_kwargs())
+        return cls._sync_client
+
+    @classmethod
+    def set_client(cls, client=None, sync_client=None) -> None:
+        """替换客户端（测试时注入假的 Redis）"""
+        cls._client = client
+        cls._sync_client = sync_client
+        cls._failed_at = None
+
+    @classmethod
+    async def close(cls) -> None:
+        """关闭客户端"""
+        client, sync_client = cls._client, cls._sync_client
+        cls._client = cls._sync_client = None
+        if client is not None:
+            await client.aclose()
+        if sync_client is not None:
+            sync_client.close()
@@ -0,0 +1,113 @@
+"""
+JSON 响应工具
+JSON Responses
+
+- 应用默认使用 ORJSONResponse（orjson 编码，比标准库 json 快数倍），编码耗时计入 Server-Timing
+- RawJSONResponse 直接发送已经编码好的字节
+- ResponseSnapshots 缓存字典类数据的响应体：数据对象未变化时直接复用上次编码的字节
+- NDJSONResponse 配合 ndjson_chunks() 流式发送大结果集，每批行编码为一块
+"""
+
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Hashable
+
+import orjson
+from fastapi.responses import ORJSONResponse as _ORJSONResponse
+from starlette.responses import Response, StreamingResponse
+
+from utils.cache import MISSING, LocalCache
+from utils.timing import PHASE_SERIALIZE, timed_phase
+
+__all__ = [
+    'NDJSONResponse', 'ORJSONResponse', 'RawJSONResponse', 'ResponseSnapshots',
+    'dumps', 'ndjson_chunks',
+]
+
+
+def dumps(content: Any) -> bytes:
+    """编码为 JSON 字节（与 ORJSONResponse 的选项一致）"""
+    with timed_phase(PHASE_SERIALIZE):
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ORJSONResponse(_ORJSONResponse):
+    """orjson 编码的 JSON 响应（记录编码耗时）"""
+
+    def render(self, content: Any) -> bytes:
+        with timed_phase(PHASE_SERIALIZE):
+            return super().render(content)
+
+
+class RawJSONResponse(Response):
+    """响应体是已经编码好的 JSON 字节"""
+    media_type = "application/json"
+
+
+class NDJSONResponse(StreamingResponse):
+    """流式 NDJSON 响应（每行一个 JSON 对象）"""
+    media_type = "application/x-ndjson"
+
+
+async def ndjson_chunks(
+    batches: AsyncIterable[list],
+    to_item: Callable[[Any], Any] = lambda item: item,
+) -> AsyncIterator[bytes]:
+    """
+    把分批到达的数据编码为 NDJSON 块
+
+    每批只编码、发送一次（而不是逐行 send），发送完即释放，
+    内存占用只与批大小有关。
+
+    用法:
+        async def body():
+            async with async_db_transaction(readonly=True) as conn:
+                async for chunk in ndjson_chunks(astream_batches(conn, query), to_dict):
+                    yield chunk
+        return NDJSONResponse(body())
+
+    Args:
+        batches: 每次产出一批数据的异步迭代器（例如 astream_batches）
+        to_item: 把每条数据转换为可编码的对象
+    """
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE
+    async for batch in batches:
+        if batch:
+            yield b"".join([orjson.dumps(to_item(item), option=option) for item in batch])
+
+
+class ResponseSnapshots:
+    """
+    已编码响应体的缓存
+
+    以数据对象本身作为有效性依据：缓存层返回的仍是同一个对象（is 判断）时，
+    数据一定没有变化，直接复用上次编码的字节；缓存失效后数据重新加载成新对象，
+    下一次请求自然会重新编码。因此不需要单独的失效逻辑，前提是缓存的数据对象不被修改。
+
+    用法:
+        body = snapshots.get_or_encode(('all', True), contract_types, lambda: {...})
+        return RawJSONResponse(body)
+    """
+
+    def __init__(self, max_size: int = 1000):
+        # 有效性由对象身份决定，TTL 只用于释放长期不用的条目
+        self._cache = LocalCache(ttl=3600, max_size=max_size)
+
+    def get_or_encode(self, key: Hashable, source: Any, build: Callable[[], Any]) -> bytes:
+        """
+        Args:
+            key: 响应的标识（例如 ('code', 'SALES')）
+            source: 生成响应所用的数据对象
+            build: 构造响应内容（只在需要重新编码时调用）
+        """
+        item = self._cache.get(key)
+        if item is not MISSING and item[0] is source:
+            return item[1]
+
+        body = dumps(build())
+        self._cache.set(key, (source, body))  # 同时持有 source，保证其 id 不会被复用
+        return body
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
@@ -0,0 +1,119 @@
+"""
+并发请求合并
+Single Flight
+
+缓存失效或冷启动后，同一时刻到达的一批相同请求全部未命中，各自执行同一条查询（惊群）。
+SingleFlight 按键合并进行中的调用：第一个调用方真正执行，执行期间到达的相同调用
+直接等待并共享同一个结果（或同一个异常）；调用结束后立即移除，不缓存结果。
+
+与 BatchLoader 的区别：BatchLoader 把同一轮中的不同键合并为一次批量查询；
+SingleFlight 合并的是同一个键在执行期间的重复调用，调用本身可以是任意耗时操作
+（查库 + 编码响应体等）。
+
+用法:
+    @single_flight()
+    async def load_contract(contract_id: int) -> bytes:
+        ...
+
+    # 或直接按键调用
+    flights = SingleFlight('contract_types')
+    value = await flights.do(('all', True), lambda: load_all(True))
+
+注意：共享的结果由所有调用方共用，调用方不要修改。
+"""
+
+import asyncio
+import functools
+import inspect
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from starlette.requests import Request
+
+from utils.metrics import metrics
+
+single_flight_calls = metrics.counter(
+    'single_flight_calls_total', 'Coalesced calls (leader = executed, shared = joined an in-flight call)',
+    ('name', 'role'),
+)
+
+
+class SingleFlight:
+    """按键合并进行中的 async 调用"""
+
+    def __init__(self, name: str = 'default'):
+        self.name = name
+        self._calls: dict[Hashable, asyncio.Task] = {}
+        self._leaders = 0
+        self._shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]) -> Any:
+        """
+        执行 fn()，同一个键已有进行中的调用时等待它的结果
+
+        调用在独立任务中执行：发起它的请求被取消（客户端断开）时，其他等待方不受影响。
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(functools.partial(self._forget, key))
+            self._leaders += 1
+            single_flight_calls.labels(self.name, 'leader').inc()
+        else:
+            self._shared += 1
+            single_flight_calls.labels(self.name, 'shared').inc()
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()   # 所有等待方都已取消时避免 "exception was never retrieved"
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def stats(self) -> dict:
+        total = self._leaders + self._shared
+        return {
+            'in_flight': len(self._calls),
+            'executed': self._leaders,
+            'shared': self._shared,
+            'shared_ratio': round(self._shared / total, 4) if total else 0.0,
+        }
+
+
+def single_flight(
+    key: Optional[Callable[..., Hashable]] = None,
+    name: Optional[str] = None,
+) -> Callable:
+    """
+    把 async 函数包装为按参数合并的调用（装饰器，也可用于只读端点）
+
+    Args:
+        key: 由调用参数计算合并键，默认使用全部参数（需可哈希）
+        name: 指标中的名称，默认函数名
+
+    用于端点时放在 @router.get 之下（FastAPI 按原函数签名解析参数）。
+    端点需要 Request（例如条件请求）时必须提供 key，否则每个请求的键都不同：
+
+        @router.get("/contracts/{contract_id}")
+        @single_flight()
+        async def get_contract(contract_id: int): ...
+    """
+    def decorate(func: Callable[..., Awaitable]) -> Callable[..., Awaitable]:
+        if key is None and any(
+            param.annotation is Request for param in inspect.signature(func).parameters.values()
+        ):
+            raise TypeError(f"{func.__qualname__} takes a Request; pass key= to single_flight")
+
+        flights = SingleFlight(name or func.__name__)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            call_key = key(*args, **kwargs) if key else (args, tuple(sorted(kwargs.items())))
+            return await flights.do(call_key, lambda: func(*args, **kwargs))
+
+        wrapper.flights = flights
+        return wrapper
+    return decorate
@@ -0,0 +1,140 @@
+"""
+请求分阶段计时
+Request Phase Timing
+
+请求开始时由 main.py 的中间件 begin_request()，此后连接池借出、DAO 查询、
+响应编码等位置调用 record_phase() 把 perf_counter 计时累加到当前请求，
+最后以 Server-Timing 响应头返回（浏览器开发者工具的 Timing 面板可以直接查看），
+也可以写入访问日志，不需要挂 profiler 就能定位慢请求的时间花在哪里。
+
+计时保存在 ContextVar 中：在请求内创建的任务和线程池调用会继承同一个对象；
+请求之外（后台任务、脚本）调用 record_phase() 没有任何效果。
+BatchLoader 合并的批量查询只计入发起这次批量查询的请求；
+流式响应（NDJSON / CSV 导出）在响应头发出后才读取数据，这部分耗时不在响应头中。
+
+阶段:
+    queue      等待准入名额的时间（见 utils/admission.py）
+    checkout   借出数据库连接的等待时间
+    db         DAO 方法和事务提交
+    serialize  JSON 编码
+    app        call_next 内的其余时间（路由、处理函数、内层中间件）
+    total      中间件看到的总耗时
+"""
+
+import time
+from contextvars import ContextVar, Token
+from typing import Optional
+
+PHASE_QUEUE = 'queue'
+PHASE_CHECKOUT = 'checkout'
+PHASE_DB = 'db'
+PHASE_SERIALIZE = 'serialize'
+PHASE_APP = 'app'
+PHASE_TOTAL = 'total'
+
+_DESCRIPTIONS = {
+    PHASE_QUEUE: 'Admission queue',
+    PHASE_CHECKOUT: 'DB pool checkout',
+    PHASE_DB: 'DB queries',
+    PHASE_SERIALIZE: 'JSON encoding',
+    PHASE_APP: 'Routing and handler',
+    PHASE_TOTAL: 'Total',
+}
+
+
+class RequestTimings:
+    """一个请求的各阶段累计耗时（秒）和次数"""
+
+    __slots__ = ('start', 'phases')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases: dict[str, list] = {}
+
+    def add(self, phase: str, seconds: float) -> None:
+        entry = self.phases.get(phase)
+        if entry is None:
+            self.phases[phase] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+
+    def get(self, phase: str) -> float:
+        entry = self.phases.get(phase)
+        return entry[0] if entry else 0.0
+
+    def finish(self) -> float:
+        """结束计时：记录 total，并把未归入其他阶段的时间记为 app，返回总耗时"""
+        total = time.perf_counter() - self.start
+        accounted = sum(entry[0] for entry in self.phases.values())
+        self.phases[PHASE_APP] = [max(total - accounted, 0.0), 1]
+        self.phases[PHASE_TOTAL] = [total, 1]
+        return total
+
+    def server_timing(self) -> str:
+        """Server-Timing 响应头的值（毫秒）"""
+        return ", ".join(
+            f'{phase};dur={seconds * 1000:.3f};desc="{_describe(phase, count)}"'
+            for phase, (seconds, count) in self.phases.items()
+        )
+
+    def summary(self) -> str:
+        """访问日志中使用的简短格式，例如 checkout=0.2ms db=3.1ms×2"""
+        parts = []
+        for phase, (seconds, count) in self.phases.items():
+            if phase == PHASE_TOTAL:
+                continue
+            suffix = f"×{count}" if count > 1 else ""
+            parts.append(f"{phase}={seconds * 1000:.1f}ms{suffix}")
+        return " ".join(parts)
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar('request_timings', default=None)
+
+
+def begin_request() -> tuple[RequestTimings, Token]:
+    """开始为当前请求计时，返回 (计时对象, 用于 end_request 的 token)"""
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def end_request(token: Token) -> None:
+    _current.reset(token)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+def record_phase(phase: str, seconds: float) -> None:
+    """把一段耗时累加到当前请求（不在请求中时忽略）"""
+    timings = _current.get()
+    if timings is not None:
+        timings.add(phase, seconds)
+
+
+class timed_phase:
+    """
+    计时上下文管理器
+
+    用法:
+        with timed_phase(PHASE_SERIALIZE):
+            body = dumps(content)
+    """
+
+    __slots__ = ('phase', '_start')
+
+    def __init__(self, phase: str):
+        self.phase = phase
+
+    def __enter__(self) -> 'timed_phase':
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        record_phase(self.phase, time.perf_counter() - self._start)
+
+
+def _describe(phase: str, count: int) -> str:
+    description = _DESCRIPTIONS.get(phase, phase)
+    return f"{description} x{count}" if count > 1 else description
@@ -0,0 +1,110 @@
+"""
+启动预热与就绪状态
+Warm-up and Readiness
+
+新 worker 的第一批请求要建立数据库连接、生成执行计划、填充缓存，
+部署或扩容后 p99 会明显升高。lifespan 在开始接收请求前依次执行已注册的预热步骤，
+全部成功后 /health/ready 才返回 200，负载均衡据此决定何时把流量切过来。
+
+某个步骤失败（例如数据库暂时不可用）时不阻止启动：/health/ready 保持 503，
+后台每隔 WARMUP_RETRY_INTERVAL 秒重试失败的步骤，直到全部成功。
+
+用法:
+    @warm_up.step("contract_types")
+    async def preload_contract_types():
+        await contract_type_cache.get_all()
+
+    # lifespan 中
+    await warm_up.run()
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional
+
+from config import Config
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class WarmUp:
+    """按注册顺序执行预热步骤，记录每一步的耗时和错误"""
+
+    def __init__(self):
+        self._steps: dict[str, Callable[[], Awaitable]] = {}
+        self._results: dict[str, dict] = {}
+        self._retry_task: Optional[asyncio.Task] = None
+        self.ready = False
+
+    def step(self, name: str) -> Callable:
+        """注册预热步骤（装饰器），同名步骤后注册的覆盖先注册的"""
+        def decorate(func: Callable[[], Awaitable]) -> Callable[[], Awaitable]:
+            self._steps[name] = func
+            return func
+        return decorate
+
+    async def run(self, timeout: Optional[float] = None) -> bool:
+        """
+        执行尚未成功的步骤；全部成功时标记为就绪，失败时在后台重试
+
+        Args:
+            timeout: 每个步骤的最长执行时间（默认 Config.WARMUP_TIMEOUT）
+
+        Returns:
+            是否已就绪
+        """
+        if await self._run_pending(timeout):
+            return True
+        if self._retry_task is None or self._retry_task.done():
+            self._retry_task = asyncio.create_task(self._retry(timeout))
+        return False
+
+    async def _run_pending(self, timeout: Optional[float]) -> bool:
+        timeout = Config.WARMUP_TIMEOUT if timeout is None else timeout
+        for name, func in self._steps.items():
+            if self._results.get(name, {}).get('ok'):
+                continue
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(func(), timeout)
+            except Exception as e:
+                elapsed = time.perf_counter() - start
+                self._results[name] = {'ok': False, 'seconds': round(elapsed, 4), 'error': str(e) or type(e).__name__}
+                logger.warning("🔥 Warm-up step '%s' failed after %.3fs: %s", name, elapsed, e)
+                continue
+            elapsed = time.perf_counter() - start
+            self._results[name] = {'ok': True, 'seconds': round(elapsed, 4), 'error': None}
+            logger.info("🔥 Warm-up step '%s' done in %.3fs", name, elapsed)
+
+        self.ready = all(result['ok'] for result in self._results.values())
+        if self.ready:
+            logger.info("✅ Warm-up complete, ready for traffic")
+        return self.ready
+
+    async def _retry(self, timeout: Optional[float]) -> None:
+        while not self.ready:
+            await asyncio.sleep(Config.WARMUP_RETRY_INTERVAL)
+            await self._run_pending(timeout)
+
+    async def stop(self) -> None:
+        """关闭时调用：立即标记为未就绪，并停止后台重试"""
+        self.ready = False
+        if self._retry_task is not None:
+            self._retry_task.cancel()
+            try:
+                await self._retry_task
+            except asyncio.CancelledError:
+                pass
+            self._retry_task = None
+
+    def status(self) -> dict:
+        return {
+            'ready': self.ready,
+            'steps': {name: self._results.get(name, {'ok': False, 'seconds': None, 'error': 'pending'})
+                      for name in self._steps},
+        }
+
+
+# 全局实例（步骤在 main.py 中注册）
+warm_up = WarmUp()